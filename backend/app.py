@@ -1,11 +1,12 @@
 import os
 import sys
+import click
 from dotenv import load_dotenv
 from flask import Flask
 from flask_cors import CORS
 from flask_migrate import Migrate
 from sqlalchemy.exc import OperationalError
-from src.infrastructure.db.models import db, Producto, Area, Receta, Ingrediente, MovimientoInventario, Venta, InventarioDiario, ModeloIPV
+from src.infrastructure.db.models import db, Producto, Area, Receta, Ingrediente, MovimientoInventario, Venta, InventarioDiario, ModeloIPV, ConsumoDiario, SaldoActual, VentaDiaria, ImportacionVentas
 from src.presentation.controllers import producto_controller
 from src.presentation.controllers import area_controller
 from src.presentation.controllers import receta_controller
@@ -72,6 +73,32 @@ def create_app() -> Flask:
                 f" Error: {e}"
             )
 
+    @app.cli.command('reconstruir-consumo')
+    @click.option('--desde', type=click.DateTime(formats=['%Y-%m-%d']), default=None, help='Primera fecha (YYYY-MM-DD).')
+    @click.option('--hasta', type=click.DateTime(formats=['%Y-%m-%d']), default=None, help='Última fecha (YYYY-MM-DD).')
+    def reconstruir_consumo(desde, hasta):
+        """Regenera el consumo diario materializado a partir de las ventas."""
+        resultado = container.reconstruir_consumo_diario_uc().execute(
+            desde.date() if desde else None,
+            hasta.date() if hasta else None
+        )
+        click.echo(f"Consumo reconstruido: {resultado}")
+
+    @app.cli.command('reconstruir-ventas-diarias')
+    def reconstruir_ventas_diarias():
+        """Regenera los totales diarios por receta a partir de las ventas."""
+        resultado = container.reconstruir_ventas_diarias_uc().execute()
+        click.echo(f"Totales diarios generados: {resultado['registros']}")
+
+    @app.cli.command('verificar-saldos')
+    @click.option('--reparar', is_flag=True, help='Reconstruye la tabla de saldos si hay discrepancias.')
+    def verificar_saldos(reparar):
+        """Compara la tabla de saldos actuales con el historial del inventario diario."""
+        resultado = container.verificar_saldos_uc().execute(reparar)
+        click.echo(f"Pares verificados: {resultado['registros']}, discrepancias: {len(resultado['discrepancias'])}")
+        if resultado['reparado']:
+            click.echo("Tabla de saldos reconstruida.")
+
     @app.route('/', defaults={'path': ''})
     @app.route('/<path:path>')
     def catch_all(path):
@@ -0,0 +1,103 @@
+# Mide cuánto tarda guardar una hoja IPV completa (alta inicial y regrabación) con el upsert por lotes
+# de SQLiteInventarioDiarioRepository.save_all, comparado con el guardado anterior fila a fila
+# (un SELECT por registro y el unit of work del ORM).
+#
+# Uso, desde la carpeta backend:  python benchmark_guardar_ipv.py [filas ...]
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date
+
+_directorio = tempfile.mkdtemp(prefix='benchmark_ipv_')
+os.environ['DB_URI'] = f"sqlite:///{os.path.join(_directorio, 'inventario.db')}"
+
+from app import create_app
+from src.core.domain.inventario_diario import InventarioDiario
+from src.infrastructure.db.models import db, Area, Producto, InventarioDiario as InventarioDiarioModel
+from src.infrastructure.repositories.sqlite_inventario_diario_repository import SQLiteInventarioDiarioRepository
+
+FILAS_POR_DEFECTO = (100, 1000, 10000)
+
+
+# Reproduce save_all tal como era antes del upsert: busca cada registro y lo actualiza o lo agrega.
+def guardar_fila_a_fila(repositorio: SQLiteInventarioDiarioRepository, inventarios: list[InventarioDiario]):
+    for domain_obj in inventarios:
+        model = db.session.query(InventarioDiarioModel).filter_by(
+            fecha=domain_obj.fecha, area_id=domain_obj.area_id, producto_id=domain_obj.producto_id
+        ).first()
+
+        if model:
+            model.inicio = domain_obj.inicio
+            model.entradas = domain_obj.entradas
+            model.consumo = domain_obj.consumo
+            model.merma = domain_obj.merma
+            model.otras_salidas = domain_obj.otras_salidas
+            model.final_fisico = domain_obj.final_fisico
+            model.final_teorico = domain_obj.final_teorico
+            model.diferencia = domain_obj.diferencia
+            model.comentario = domain_obj.comentario
+        else:
+            db.session.add(repositorio._to_model(domain_obj))
+
+    db.session.commit()
+
+
+# Crea los productos necesarios y devuelve una hoja de `filas` registros para la fecha indicada.
+def preparar_hoja(area_id: str, producto_ids: list[str], filas: int, fecha: date) -> list[InventarioDiario]:
+    nuevos = [
+        Producto(id=str(uuid.uuid4()), nombre=f"producto {i}", unidad_medida='kg')
+        for i in range(len(producto_ids), filas)
+    ]
+    db.session.add_all(nuevos)
+    db.session.commit()
+    producto_ids.extend(producto.id for producto in nuevos)
+
+    return [
+        InventarioDiario(
+            id=str(uuid.uuid4()), fecha=fecha, area_id=area_id, producto_id=producto_id,
+            entradas=10, final_fisico=8
+        ).calcular_diferencias()
+        for producto_id in producto_ids[:filas]
+    ]
+
+
+# Devuelve los segundos que tarda guardar la hoja dos veces: alta inicial y regrabación.
+def medir(guardar, hoja: list[InventarioDiario]) -> tuple[float, float]:
+    tiempos = []
+    for _ in range(2):
+        inicio = time.perf_counter()
+        guardar(hoja)
+        tiempos.append(time.perf_counter() - inicio)
+        db.session.expunge_all()
+    return tiempos[0], tiempos[1]
+
+
+def main(tamanos: list[int]):
+    app = create_app()
+    with app.app_context():
+        repositorio = SQLiteInventarioDiarioRepository(db.session)
+        area_id = str(uuid.uuid4())
+        db.session.add(Area(id=area_id, nombre='cocina'))
+        db.session.commit()
+        producto_ids = []
+
+        print(f"{'filas':>7} | {'antes alta':>10} {'antes regrab.':>13} | {'ahora alta':>10} {'ahora regrab.':>13}")
+        for dia, filas in enumerate(tamanos, start=1):
+            # Cada variante escribe en su propia fecha para partir de una tabla sin esas filas.
+            antes = medir(
+                lambda hoja: guardar_fila_a_fila(repositorio, hoja),
+                preparar_hoja(area_id, producto_ids, filas, date(2025, 1, dia * 2 - 1))
+            )
+            ahora = medir(repositorio.save_all, preparar_hoja(area_id, producto_ids, filas, date(2025, 1, dia * 2)))
+            print(f"{filas:>7} | {antes[0]:>9.3f}s {antes[1]:>12.3f}s | {ahora[0]:>9.3f}s {ahora[1]:>12.3f}s")
+
+        db.session.remove()
+        db.engine.dispose()
+    shutil.rmtree(_directorio, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main([int(valor) for valor in sys.argv[1:]] or list(FILAS_POR_DEFECTO))
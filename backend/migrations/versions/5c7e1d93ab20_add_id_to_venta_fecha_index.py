@@ -0,0 +1,39 @@
+"""Add id to idx_venta_fecha for keyset pagination
+
+Revision ID: 5c7e1d93ab20
+Revises: d41f6b2c9e07
+Create Date: 2026-10-17 13:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c7e1d93ab20'
+down_revision = 'd41f6b2c9e07'
+branch_labels = None
+depends_on = None
+
+
+def _columnas_indice(nombre):
+    for indice in sa.inspect(op.get_bind()).get_indexes('ventas'):
+        if indice['name'] == nombre:
+            return indice['column_names']
+    return None
+
+
+def upgrade():
+    columnas = _columnas_indice('idx_venta_fecha')
+    if columnas == ['fecha', 'id']:
+        return
+    with op.batch_alter_table('ventas', schema=None) as batch_op:
+        if columnas is not None:
+            batch_op.drop_index('idx_venta_fecha')
+        batch_op.create_index('idx_venta_fecha', ['fecha', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ventas', schema=None) as batch_op:
+        batch_op.drop_index('idx_venta_fecha')
+        batch_op.create_index('idx_venta_fecha', ['fecha'], unique=False)
@@ -0,0 +1,28 @@
+"""Add area/producto/fecha index to inventario_diario
+
+Revision ID: 60e2a8ed831c
+Revises: a0d93a8dc442
+Create Date: 2026-10-17 12:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '60e2a8ed831c'
+down_revision = 'a0d93a8dc442'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    indices = {i['name'] for i in sa.inspect(op.get_bind()).get_indexes('inventario_diario')}
+    if 'idx_inventario_area_producto_fecha' not in indices:
+        with op.batch_alter_table('inventario_diario', schema=None) as batch_op:
+            batch_op.create_index('idx_inventario_area_producto_fecha', ['area_id', 'producto_id', 'fecha'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('inventario_diario', schema=None) as batch_op:
+        batch_op.drop_index('idx_inventario_area_producto_fecha')
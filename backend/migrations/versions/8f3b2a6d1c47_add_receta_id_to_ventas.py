@@ -0,0 +1,87 @@
+"""Add receta_id to ventas
+
+Revision ID: 8f3b2a6d1c47
+Revises: 5c7e1d93ab20
+Create Date: 2026-10-17 13:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import unicodedata
+import uuid
+
+
+# revision identifiers, used by Alembic.
+revision = '8f3b2a6d1c47'
+down_revision = '5c7e1d93ab20'
+branch_labels = None
+depends_on = None
+
+
+def _normalizar(nombre):
+    # Same rule as src.core.domain.receta.normalizar_nombre, frozen here for the backfill.
+    sin_acentos = ''.join(c for c in unicodedata.normalize('NFKD', str(nombre)) if not unicodedata.combining(c))
+    return ' '.join(sin_acentos.upper().split())
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    # db.create_all() may already have created the column when the app started.
+    if 'receta_id' not in {c['name'] for c in inspector.get_columns('ventas')}:
+        with op.batch_alter_table('ventas', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('receta_id', sa.String(length=36), nullable=True))
+            batch_op.create_foreign_key('fk_ventas_receta_id', 'recetas', ['receta_id'], ['id'])
+    if 'idx_venta_receta' not in {i['name'] for i in sa.inspect(bind).get_indexes('ventas')}:
+        with op.batch_alter_table('ventas', schema=None) as batch_op:
+            batch_op.create_index('idx_venta_receta', ['receta_id'], unique=False)
+
+    # Backfill: resolve each distinct sale name against the normalized recipe names.
+    indice = {
+        _normalizar(nombre): receta_id
+        for receta_id, nombre in bind.execute(sa.text("SELECT id, nombre FROM recetas")).fetchall()
+    }
+    nombres = bind.execute(sa.text(
+        "SELECT DISTINCT receta_nombre FROM ventas WHERE receta_id IS NULL"
+    )).fetchall()
+    vinculos = [
+        {"receta_id": indice[_normalizar(nombre)], "receta_nombre": nombre}
+        for (nombre,) in nombres
+        if _normalizar(nombre) in indice
+    ]
+    if vinculos:
+        bind.execute(
+            sa.text(
+                "UPDATE ventas SET receta_id = :receta_id "
+                "WHERE receta_nombre = :receta_nombre AND receta_id IS NULL"
+            ),
+            vinculos
+        )
+
+        # consumo_diario was backfilled by exact recipe name; sales linked only after
+        # normalization had no stored consumption, so rebuild it from the linked sales.
+        if sa.inspect(bind).has_table('consumo_diario'):
+            bind.execute(sa.text("DELETE FROM consumo_diario"))
+            filas = bind.execute(sa.text(
+                "SELECT v.fecha, i.producto_id, i.area_id, SUM(v.cantidad * i.cantidad) "
+                "FROM ventas v "
+                "JOIN ingredientes i ON i.receta_id = v.receta_id "
+                "GROUP BY v.fecha, i.producto_id, i.area_id"
+            )).fetchall()
+            if filas:
+                bind.execute(
+                    sa.text(
+                        "INSERT INTO consumo_diario (id, fecha, area_id, producto_id, cantidad) "
+                        "VALUES (:id, :fecha, :area_id, :producto_id, :cantidad)"
+                    ),
+                    [
+                        {"id": str(uuid.uuid4()), "fecha": fecha, "producto_id": producto_id, "area_id": area_id, "cantidad": cantidad}
+                        for fecha, producto_id, area_id, cantidad in filas
+                    ]
+                )
+
+
+def downgrade():
+    with op.batch_alter_table('ventas', schema=None) as batch_op:
+        batch_op.drop_index('idx_venta_receta')
+        batch_op.drop_column('receta_id')
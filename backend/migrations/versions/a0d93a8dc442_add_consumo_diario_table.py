@@ -0,0 +1,65 @@
+"""Add consumo_diario table
+
+Revision ID: a0d93a8dc442
+Revises: b29f7ae8b140
+Create Date: 2026-10-17 12:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import uuid
+
+
+# revision identifiers, used by Alembic.
+revision = 'a0d93a8dc442'
+down_revision = 'b29f7ae8b140'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    # db.create_all() may already have created the table when the app started.
+    if not sa.inspect(bind).has_table('consumo_diario'):
+        op.create_table('consumo_diario',
+            sa.Column('id', sa.String(length=36), nullable=False),
+            sa.Column('fecha', sa.Date(), nullable=False),
+            sa.Column('area_id', sa.String(length=36), nullable=False),
+            sa.Column('producto_id', sa.String(length=36), nullable=False),
+            sa.Column('cantidad', sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(['area_id'], ['areas.id'], ),
+            sa.ForeignKeyConstraint(['producto_id'], ['productos.id'], ),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('fecha', 'area_id', 'producto_id', name='_consumo_fecha_area_producto_uc')
+        )
+        with op.batch_alter_table('consumo_diario', schema=None) as batch_op:
+            batch_op.create_index('idx_consumo_fecha', ['fecha'], unique=False)
+
+    # Backfill the materialized consumption from the existing sales history.
+    if bind.execute(sa.text("SELECT COUNT(*) FROM consumo_diario")).scalar():
+        return
+    filas = bind.execute(sa.text(
+        "SELECT v.fecha, i.producto_id, i.area_id, SUM(v.cantidad * i.cantidad) "
+        "FROM ventas v "
+        "JOIN recetas r ON r.nombre = v.receta_nombre "
+        "JOIN ingredientes i ON i.receta_id = r.id "
+        "GROUP BY v.fecha, i.producto_id, i.area_id"
+    )).fetchall()
+    if filas:
+        bind.execute(
+            sa.text(
+                "INSERT INTO consumo_diario (id, fecha, area_id, producto_id, cantidad) "
+                "VALUES (:id, :fecha, :area_id, :producto_id, :cantidad)"
+            ),
+            [
+                {"id": str(uuid.uuid4()), "fecha": fecha, "producto_id": producto_id, "area_id": area_id, "cantidad": cantidad}
+                for fecha, producto_id, area_id, cantidad in filas
+            ]
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('consumo_diario', schema=None) as batch_op:
+        batch_op.drop_index('idx_consumo_fecha')
+
+    op.drop_table('consumo_diario')
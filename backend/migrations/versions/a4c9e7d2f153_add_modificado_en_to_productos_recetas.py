@@ -0,0 +1,52 @@
+"""Add modificado_en to productos and recetas
+
+Revision ID: a4c9e7d2f153
+Revises: e2d7c3b5a914
+Create Date: 2026-10-17 14:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c9e7d2f153'
+down_revision = 'e2d7c3b5a914'
+branch_labels = None
+depends_on = None
+
+
+TABLAS = (
+    ('productos', 'Producto', 'idx_producto_modificado'),
+    ('recetas', 'Receta', 'idx_receta_modificado'),
+)
+
+
+def upgrade():
+    bind = op.get_bind()
+    for tabla, entidad_tipo, indice in TABLAS:
+        # db.create_all() may already have created the column when the app started.
+        if 'modificado_en' not in {c['name'] for c in sa.inspect(bind).get_columns(tabla)}:
+            with op.batch_alter_table(tabla, schema=None) as batch_op:
+                batch_op.add_column(sa.Column('modificado_en', sa.DateTime(), nullable=True))
+        if indice not in {i['name'] for i in sa.inspect(bind).get_indexes(tabla)}:
+            with op.batch_alter_table(tabla, schema=None) as batch_op:
+                batch_op.create_index(indice, ['modificado_en'], unique=False)
+
+        # Backfill: the latest change recorded in the history for each entity.
+        bind.execute(
+            sa.text(
+                f"UPDATE {tabla} SET modificado_en = ("
+                "SELECT MAX(h.fecha_cambio) FROM historial_cambios h "
+                f"WHERE h.entidad_tipo = :entidad_tipo AND h.entidad_id = {tabla}.id"
+                ") WHERE modificado_en IS NULL"
+            ),
+            {"entidad_tipo": entidad_tipo}
+        )
+
+
+def downgrade():
+    for tabla, _, indice in reversed(TABLAS):
+        with op.batch_alter_table(tabla, schema=None) as batch_op:
+            batch_op.drop_index(indice)
+            batch_op.drop_column('modificado_en')
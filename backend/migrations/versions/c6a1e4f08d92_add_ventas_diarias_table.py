@@ -0,0 +1,62 @@
+"""Add ventas_diarias table
+
+Revision ID: c6a1e4f08d92
+Revises: 8f3b2a6d1c47
+Create Date: 2026-10-17 13:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import uuid
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6a1e4f08d92'
+down_revision = '8f3b2a6d1c47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    # db.create_all() may already have created the table when the app started.
+    if not sa.inspect(bind).has_table('ventas_diarias'):
+        op.create_table('ventas_diarias',
+            sa.Column('id', sa.String(length=36), nullable=False),
+            sa.Column('fecha', sa.Date(), nullable=False),
+            sa.Column('receta_id', sa.String(length=36), nullable=False),
+            sa.Column('cantidad_total', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['receta_id'], ['recetas.id'], ),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('fecha', 'receta_id', name='_venta_diaria_fecha_receta_uc')
+        )
+        with op.batch_alter_table('ventas_diarias', schema=None) as batch_op:
+            batch_op.create_index('idx_venta_diaria_receta', ['receta_id', 'fecha'], unique=False)
+
+    # Backfill the daily totals from the sales already linked to a recipe.
+    if bind.execute(sa.text("SELECT COUNT(*) FROM ventas_diarias")).scalar():
+        return
+    filas = bind.execute(sa.text(
+        "SELECT fecha, receta_id, SUM(cantidad) FROM ventas "
+        "WHERE receta_id IS NOT NULL "
+        "GROUP BY fecha, receta_id"
+    )).fetchall()
+    if filas:
+        bind.execute(
+            sa.text(
+                "INSERT INTO ventas_diarias (id, fecha, receta_id, cantidad_total) "
+                "VALUES (:id, :fecha, :receta_id, :cantidad_total)"
+            ),
+            [
+                {"id": str(uuid.uuid4()), "fecha": fecha, "receta_id": receta_id, "cantidad_total": total}
+                for fecha, receta_id, total in filas
+                if total
+            ]
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('ventas_diarias', schema=None) as batch_op:
+        batch_op.drop_index('idx_venta_diaria_receta')
+
+    op.drop_table('ventas_diarias')
@@ -0,0 +1,60 @@
+"""Add saldo_actual table
+
+Revision ID: d41f6b2c9e07
+Revises: 3881ed41c8a9
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import uuid
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41f6b2c9e07'
+down_revision = '3881ed41c8a9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    # db.create_all() may already have created the table when the app started.
+    if not sa.inspect(bind).has_table('saldo_actual'):
+        op.create_table('saldo_actual',
+            sa.Column('id', sa.String(length=36), nullable=False),
+            sa.Column('area_id', sa.String(length=36), nullable=False),
+            sa.Column('producto_id', sa.String(length=36), nullable=False),
+            sa.Column('fecha', sa.Date(), nullable=False),
+            sa.Column('saldo', sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(['area_id'], ['areas.id'], ),
+            sa.ForeignKeyConstraint(['producto_id'], ['productos.id'], ),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('area_id', 'producto_id', name='_saldo_area_producto_uc')
+        )
+
+    # Backfill each pair with the closing balance of its latest inventory day.
+    if bind.execute(sa.text("SELECT COUNT(*) FROM saldo_actual")).scalar():
+        return
+    filas = bind.execute(sa.text(
+        "SELECT i.area_id, i.producto_id, i.fecha, i.final_fisico "
+        "FROM inventario_diario i "
+        "JOIN (SELECT area_id, producto_id, MAX(fecha) AS fecha FROM inventario_diario "
+        "GROUP BY area_id, producto_id) u "
+        "ON u.area_id = i.area_id AND u.producto_id = i.producto_id AND u.fecha = i.fecha"
+    )).fetchall()
+    if filas:
+        bind.execute(
+            sa.text(
+                "INSERT INTO saldo_actual (id, area_id, producto_id, fecha, saldo) "
+                "VALUES (:id, :area_id, :producto_id, :fecha, :saldo)"
+            ),
+            [
+                {"id": str(uuid.uuid4()), "area_id": area_id, "producto_id": producto_id, "fecha": fecha, "saldo": saldo or 0.0}
+                for area_id, producto_id, fecha, saldo in filas
+            ]
+        )
+
+
+def downgrade():
+    op.drop_table('saldo_actual')
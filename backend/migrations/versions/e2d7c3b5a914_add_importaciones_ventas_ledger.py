@@ -0,0 +1,52 @@
+"""Add importaciones_ventas ledger and importacion_id to ventas
+
+Revision ID: e2d7c3b5a914
+Revises: c6a1e4f08d92
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2d7c3b5a914'
+down_revision = 'c6a1e4f08d92'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    # db.create_all() may already have created the table and column when the app started.
+    if not sa.inspect(bind).has_table('importaciones_ventas'):
+        op.create_table('importaciones_ventas',
+            sa.Column('id', sa.String(length=36), nullable=False),
+            sa.Column('hash_archivo', sa.String(length=64), nullable=False),
+            sa.Column('nombre_archivo', sa.String(length=255), nullable=True),
+            sa.Column('fecha', sa.Date(), nullable=True),
+            sa.Column('filas', sa.Integer(), nullable=False),
+            sa.Column('creado_en', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('importaciones_ventas', schema=None) as batch_op:
+            batch_op.create_index('idx_importacion_hash', ['hash_archivo'], unique=False)
+
+    if 'importacion_id' not in {c['name'] for c in sa.inspect(bind).get_columns('ventas')}:
+        with op.batch_alter_table('ventas', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('importacion_id', sa.String(length=36), nullable=True))
+            batch_op.create_foreign_key('fk_ventas_importacion_id', 'importaciones_ventas', ['importacion_id'], ['id'])
+    if 'idx_venta_importacion' not in {i['name'] for i in sa.inspect(bind).get_indexes('ventas')}:
+        with op.batch_alter_table('ventas', schema=None) as batch_op:
+            batch_op.create_index('idx_venta_importacion', ['importacion_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ventas', schema=None) as batch_op:
+        batch_op.drop_index('idx_venta_importacion')
+        batch_op.drop_column('importacion_id')
+
+    with op.batch_alter_table('importaciones_ventas', schema=None) as batch_op:
+        batch_op.drop_index('idx_importacion_hash')
+
+    op.drop_table('importaciones_ventas')
@@ -1,12 +1,19 @@
-from datetime import date
+from datetime import date, timedelta
 import uuid
 import json
+import re
+import tempfile
+from openpyxl import Workbook
 from src.core.domain.inventario_diario import InventarioDiario
+from src.core.domain.matriz_bom import MatrizBOM
+from src.core.domain.receta import Receta, normalizar_nombre
+from src.core.domain.venta import Venta
 from src.infrastructure.repositories.sqlite_inventario_diario_repository import SQLiteInventarioDiarioRepository
 from src.infrastructure.repositories.sqlite_venta_repository import SQLiteVentaRepository
 from src.infrastructure.repositories.sqlite_receta_repository import SQLiteRecetaRepository
 from src.infrastructure.repositories.sqlite_producto_repository import SQLiteProductoRepository
 from src.infrastructure.repositories.sqlite_area_repository import SQLiteAreaRepository
+from src.infrastructure.repositories.sqlite_consumo_diario_repository import SQLiteConsumoDiarioRepository
 
 # Caso de uso para obtener el estado del inventario para una fecha dada.
 class ObtenerEstadoInventarioDiarioUseCase:
@@ -22,38 +29,23 @@ class ObtenerEstadoInventarioDiarioUseCase:
         if not registros_existentes:
             return self._crear_plantilla_vacia(fecha, areas)
 
+        return self._agrupar_por_area(registros_existentes, areas)
+
+    def _agrupar_por_area(self, registros_existentes: list[InventarioDiario], areas: list) -> dict[str, list[InventarioDiario]]:
         registros_por_area = {area.nombre: [] for area in areas}
         areas_by_id = {area.id: area for area in areas}
 
-        for registro_model in registros_existentes:
-            area = areas_by_id.get(registro_model.area_id)
+        for registro in registros_existentes:
+            area = areas_by_id.get(registro.area_id)
             if area:
-                registro_dominio = InventarioDiario(
-                    id=registro_model.id,
-                    fecha=registro_model.fecha,
-                    area_id=registro_model.area_id,
-                    producto_id=registro_model.producto_id,
-                    inicio=registro_model.inicio,
-                    entradas=registro_model.entradas,
-                    consumo=registro_model.consumo,
-                    merma=registro_model.merma,
-                    otras_salidas=registro_model.otras_salidas,
-                    final_fisico=registro_model.final_fisico,
-                    final_teorico=registro_model.final_teorico,
-                    diferencia=registro_model.diferencia,
-                    producto_nombre=registro_model.producto.nombre if registro_model.producto else "Producto no encontrado",
-                    area_nombre=area.nombre,
-                    comentario=registro_model.comentario
-                )
-                if area.nombre not in registros_por_area:
-                    registros_por_area[area.nombre] = []
-                registros_por_area[area.nombre].append(registro_dominio)
+                registros_por_area.setdefault(area.nombre, []).append(registro)
         
         return registros_por_area
 
     def _crear_plantilla_vacia(self, fecha: date, areas: list) -> dict[str, list[InventarioDiario]]:
         modelos = self.inventario_repository.get_modelos()
         productos_by_id = {p.id: p for p in self.producto_repository.obtener_todos()}
+        finales_anteriores = self.inventario_repository.get_saldos_iniciales(fecha)
         plantilla = {area.nombre: [] for area in areas}
 
         for area in areas:
@@ -62,7 +54,7 @@ class ObtenerEstadoInventarioDiarioUseCase:
                 producto = productos_by_id.get(producto_data['producto_id'])
                 if not producto: continue
 
-                inicio = self.inventario_repository.get_inicio_from_previous_day(fecha, area.id, producto.id)
+                inicio = finales_anteriores.get((str(area.id), str(producto.id)), 0.0)
                 nuevo_registro = InventarioDiario(
                     id=str(uuid.uuid4()),
                     fecha=fecha,
@@ -70,6 +62,7 @@ class ObtenerEstadoInventarioDiarioUseCase:
                     producto_id=producto.id,
                     inicio=inicio,
                     producto_nombre=producto.nombre,
+                    unidad_medida=producto.unidad_medida,
                     area_nombre=area.nombre,
                     comentario=""
                 )
@@ -79,32 +72,158 @@ class ObtenerEstadoInventarioDiarioUseCase:
         
         return plantilla
 
-# Caso de uso para calcular el consumo de productos basado en las ventas.
+# Caso de uso para obtener en una sola consulta el estado del inventario de una fecha y del día anterior.
+class ObtenerEstadoComparadoUseCase(ObtenerEstadoInventarioDiarioUseCase):
+    def execute(self, fecha: date) -> dict[str, dict[str, list[InventarioDiario]]]:
+        fecha_anterior = fecha - timedelta(days=1)
+        registros = self.inventario_repository.find_by_dates([fecha_anterior, fecha])
+        areas = self.area_repository.find_all()
+
+        estado = {}
+        for clave, dia in (("actual", fecha), ("anterior", fecha_anterior)):
+            registros_dia = [r for r in registros if r.fecha == dia]
+            if registros_dia:
+                estado[clave] = self._agrupar_por_area(registros_dia, areas)
+            else:
+                estado[clave] = self._crear_plantilla_vacia(dia, areas)
+        return estado
+
+# Caso de uso para obtener el consumo de productos de una fecha, materializado a partir de las ventas.
 class CalcularConsumoUseCase:
-    def __init__(self, venta_repository: SQLiteVentaRepository, receta_repository: SQLiteRecetaRepository):
+    def __init__(self, consumo_repository: SQLiteConsumoDiarioRepository):
+        self.consumo_repository = consumo_repository
+
+    def execute(self, fecha: date) -> dict[str, float]:
+        return self.consumo_repository.find_by_date(fecha)
+
+# Caso de uso para calcular el consumo de un rango de fechas, total o desglosado por día.
+class CalcularConsumoRangoUseCase:
+    def __init__(self, consumo_repository: SQLiteConsumoDiarioRepository):
+        self.consumo_repository = consumo_repository
+
+    def execute(self, desde: date, hasta: date, por_dia: bool = False) -> dict:
+        if desde > hasta:
+            raise ValueError("La fecha 'desde' no puede ser posterior a 'hasta'.")
+        return self.consumo_repository.find_by_range(desde, hasta, por_dia=por_dia)
+
+# Caso de uso para trasladar al consumo diario materializado el efecto de ventas creadas, modificadas o eliminadas.
+class ActualizarConsumoDiarioUseCase:
+    def __init__(self, consumo_repository: SQLiteConsumoDiarioRepository, receta_repository: SQLiteRecetaRepository):
+        self.consumo_repository = consumo_repository
+        self.receta_repository = receta_repository
+
+    def execute(self, ventas_anteriores: list[Venta] = (), ventas_nuevas: list[Venta] = ()):
+        # Vector de ventas por fecha y receta: las anteriores restan y las nuevas suman.
+        # Las ventas sin receta resuelta no consumen ingredientes.
+        ventas_por_fecha = {}
+        for signo, ventas in ((-1, ventas_anteriores), (1, ventas_nuevas)):
+            for venta in ventas:
+                if not venta.receta_id:
+                    continue
+                fecha = venta.fecha if isinstance(venta.fecha, date) else date.fromisoformat(venta.fecha)
+                vector = ventas_por_fecha.setdefault(fecha, {})
+                vector[venta.receta_id] = vector.get(venta.receta_id, 0) + signo * venta.cantidad
+
+        # aplicar_deltas se llama aunque no haya deltas: confirma también la escritura de las ventas.
+        deltas = {}
+        if ventas_por_fecha:
+            matriz_bom = self.receta_repository.obtener_matriz_bom()
+            deltas = {fecha: matriz_bom.multiplicar(vector) for fecha, vector in ventas_por_fecha.items()}
+        self.consumo_repository.aplicar_deltas(deltas)
+
+# Caso de uso para ajustar el consumo materializado cuando cambian los ingredientes de una receta.
+class RecalcularConsumoRecetaUseCase:
+    def __init__(self, venta_repository: SQLiteVentaRepository, consumo_repository: SQLiteConsumoDiarioRepository):
         self.venta_repository = venta_repository
+        self.consumo_repository = consumo_repository
+
+    def execute(self, receta_anterior: Receta = None, receta_nueva: Receta = None, confirmar: bool = True):
+        # Se descuenta lo que aportaba la versión anterior y se suma la nueva en cada día con ventas.
+        # Antes de sumar la nueva, se le vinculan las ventas sin receta cuyo nombre coincide con el suyo.
+        # La vinculación y el consumo se confirman juntos, con los cambios de la receta pendientes en la
+        # misma sesión, salvo con confirmar=False.
+        deltas = {}
+        for signo, receta in ((-1, receta_anterior), (1, receta_nueva)):
+            if not receta:
+                continue
+            if signo > 0:
+                self.venta_repository.vincular_recetas({normalizar_nombre(receta.nombre): receta.id}, confirmar=False)
+            if not receta.ingredientes:
+                continue
+            matriz_receta = MatrizBOM.desde_ingredientes(
+                (receta.id, i.producto_id, i.area_id, float(i.cantidad)) for i in receta.ingredientes
+            )
+            for fecha, total in self.venta_repository.obtener_totales_por_fecha(receta.id).items():
+                consumo = deltas.setdefault(fecha, {})
+                for clave, cantidad in matriz_receta.multiplicar({receta.id: signo * total}).items():
+                    consumo[clave] = consumo.get(clave, 0) + cantidad
+
+        self.consumo_repository.aplicar_deltas(deltas, confirmar)
+
+# Caso de uso para regenerar el consumo diario materializado de un rango de fechas a partir de las ventas.
+class ReconstruirConsumoDiarioUseCase:
+    def __init__(self, venta_repository: SQLiteVentaRepository, consumo_repository: SQLiteConsumoDiarioRepository, receta_repository: SQLiteRecetaRepository):
+        self.venta_repository = venta_repository
+        self.consumo_repository = consumo_repository
         self.receta_repository = receta_repository
 
-    def execute(self, fecha: date) -> dict[str, float]:
-        ventas = self.venta_repository.find_by_date(fecha)
-        consumo_total = {}
-
-        for venta in ventas:
-            receta = self.receta_repository.find_by_name(venta.receta_nombre)
-            if receta:
-                for ingrediente in receta.ingredientes:
-                    # Clave única para el consumo por producto y área.
-                    clave = f"{ingrediente.producto_id}|{ingrediente.area_id}"
-                    consumo_total[clave] = consumo_total.get(clave, 0) + (venta.cantidad * ingrediente.cantidad)
-        
-        return consumo_total
+    def execute(self, desde: date = None, hasta: date = None, solo_si_vinculadas: bool = False) -> dict:
+        # Las ventas que aún no tienen receta se vinculan antes de recalcular.
+        vinculadas, fechas_vinculadas = self.venta_repository.vincular_recetas(self.receta_repository.obtener_indice_nombres())
+        # Tras crear recetas, el consumo solo cambia en los días de las ventas que pasaron a tener receta.
+        fechas = None
+        if solo_si_vinculadas:
+            if not vinculadas:
+                return {"desde": None, "hasta": None, "registros": 0, "ventas_vinculadas": 0}
+            fechas = fechas_vinculadas
+            desde, hasta = min(fechas), max(fechas)
+        # Sin límites explícitos se regenera todo el historial de ventas.
+        if desde is None or hasta is None:
+            primera, ultima = self.venta_repository.obtener_rango_fechas()
+            if primera is None:
+                return {"desde": None, "hasta": None, "registros": 0, "ventas_vinculadas": vinculadas}
+            desde = desde or primera
+            hasta = hasta or ultima
+        if desde > hasta:
+            raise ValueError("La fecha 'desde' no puede ser posterior a 'hasta'.")
+
+        consumo_por_dia = self.venta_repository.consumo_por_rango(desde, hasta, por_dia=True, fechas=fechas)
+        registros = self.consumo_repository.reemplazar_rango(desde, hasta, consumo_por_dia, fechas=fechas)
+        return {"desde": desde.isoformat(), "hasta": hasta.isoformat(), "registros": registros, "ventas_vinculadas": vinculadas}
+
+# Caso de uso para consultar las existencias actuales de cada producto por área.
+class ObtenerSaldosActualesUseCase:
+    def __init__(self, inventario_repository: SQLiteInventarioDiarioRepository):
+        self.inventario_repository = inventario_repository
+
+    def execute(self, area_id: str = None) -> list[dict]:
+        return self.inventario_repository.get_saldos_actuales(area_id)
+
+# Caso de uso para verificar la tabla de saldos contra el historial y reconstruirla si difiere.
+class VerificarSaldosUseCase:
+    def __init__(self, inventario_repository: SQLiteInventarioDiarioRepository):
+        self.inventario_repository = inventario_repository
+
+    def execute(self, reparar: bool = False) -> dict:
+        return self.inventario_repository.verificar_saldos(reparar)
+
+# Caso de uso para propagar el cierre de un día a los días posteriores del inventario.
+class PropagarCierreInventarioUseCase:
+    def __init__(self, inventario_repository: SQLiteInventarioDiarioRepository):
+        self.inventario_repository = inventario_repository
+
+    def execute(self, fecha: date, claves: list[tuple[str, str]] = None, confirmar: bool = True) -> dict:
+        resumen = self.inventario_repository.propagar_desde(fecha, claves, confirmar)
+        resumen["fecha"] = fecha.isoformat()
+        return resumen
 
 # Caso de uso para guardar el estado completo del inventario diario.
 class GuardarInventarioDiarioUseCase:
-    def __init__(self, inventario_repository: SQLiteInventarioDiarioRepository):
+    def __init__(self, inventario_repository: SQLiteInventarioDiarioRepository, propagar_cierre_uc: PropagarCierreInventarioUseCase):
         self.inventario_repository = inventario_repository
+        self.propagar_cierre_uc = propagar_cierre_uc
 
-    def execute(self, data: list[dict]) -> list[InventarioDiario]:
+    def execute(self, data: list[dict]) -> tuple[list[InventarioDiario], dict[str, int]]:
         inventarios_a_guardar = []
         for item in data:
             registro = InventarioDiario(
@@ -128,8 +247,94 @@ class GuardarInventarioDiarioUseCase:
             registro.calcular_diferencias()
             inventarios_a_guardar.append(registro)
         
-        self.inventario_repository.save_all(inventarios_a_guardar)
-        return inventarios_a_guardar
+        # Los días posteriores ya guardados toman como inicio el nuevo final físico. El guardado y la
+        # propagación forman una sola transacción, que confirma la propagación de la última fecha.
+        fechas = sorted({registro.fecha for registro in inventarios_a_guardar})
+        resumen = self.inventario_repository.save_all(inventarios_a_guardar, confirmar=not fechas)
+        resumen["propagacion"] = [
+            self.propagar_cierre_uc.execute(fecha, confirmar=fecha == fechas[-1]) for fecha in fechas
+        ]
+        # Las filas que ya existían conservan su id y tienen otra versión: se devuelven tal como quedaron.
+        claves = list(dict.fromkeys((r.fecha, r.area_id, r.producto_id) for r in inventarios_a_guardar))
+        return self.inventario_repository.find_by_keys(claves), resumen
+
+# Error lanzado cuando alguna fila fue modificada por otro terminal después de que el cliente la leyera.
+class ConflictoVersionError(Exception):
+    def __init__(self, conflictos: list[InventarioDiario]):
+        super().__init__("Algunos registros fueron modificados por otro usuario. Recargue los datos.")
+        self.conflictos = conflictos
+
+# Caso de uso para guardar únicamente las celdas modificadas del inventario diario.
+class GuardarCambiosInventarioDiarioUseCase:
+    CAMPOS_NUMERICOS = ('inicio', 'entradas', 'consumo', 'merma', 'otras_salidas', 'final_fisico')
+
+    def __init__(self, inventario_repository: SQLiteInventarioDiarioRepository, propagar_cierre_uc: PropagarCierreInventarioUseCase):
+        self.inventario_repository = inventario_repository
+        self.propagar_cierre_uc = propagar_cierre_uc
+
+    def execute(self, cambios: list[dict]) -> list[InventarioDiario]:
+        # Agrupa los cambios por fila; si una fila aparece varias veces se combinan sus campos.
+        cambios_por_clave = {}
+        for cambio in cambios:
+            clave = (date.fromisoformat(cambio['fecha']), cambio['area_id'], cambio['producto_id'])
+            cambios_por_clave.setdefault(clave, {}).update(cambio)
+
+        existentes = {
+            (r.fecha, r.area_id, r.producto_id): r
+            for r in self.inventario_repository.find_by_keys(list(cambios_por_clave.keys()))
+        }
+
+        actualizados, nuevos, conflictos = [], [], []
+        for clave, cambio in cambios_por_clave.items():
+            registro = existentes.get(clave)
+            if registro is None:
+                fecha, area_id, producto_id = clave
+                registro = InventarioDiario(
+                    id=cambio.get('id') or str(uuid.uuid4()),
+                    fecha=fecha,
+                    area_id=area_id,
+                    producto_id=producto_id,
+                    producto_nombre=cambio.get('producto_nombre'),
+                    area_nombre=cambio.get('area_nombre')
+                )
+                nuevos.append(registro)
+            elif cambio.get('version') is None or int(cambio['version']) != registro.version:
+                conflictos.append(registro)
+                continue
+            else:
+                actualizados.append(registro)
+
+            self._aplicar_cambios(registro, cambio)
+            # Solo se recalculan las filas tocadas.
+            registro.calcular_diferencias()
+
+        if conflictos:
+            raise ConflictoVersionError(conflictos)
+
+        # Solo un cambio en el final físico (o una fila nueva) altera el inicio de los días siguientes.
+        pares_por_fecha = {}
+        for (fecha, area_id, producto_id), cambio in cambios_por_clave.items():
+            if 'final_fisico' in cambio or (fecha, area_id, producto_id) not in existentes:
+                pares_por_fecha.setdefault(fecha, []).append((area_id, producto_id))
+
+        # Los cambios y su propagación forman una sola transacción, que confirma la última propagación.
+        if not self.inventario_repository.save_changes(actualizados, nuevos, confirmar=not pares_por_fecha):
+            raise ConflictoVersionError(self.inventario_repository.find_by_keys(list(cambios_por_clave.keys())))
+        fechas = sorted(pares_por_fecha)
+        for fecha in fechas:
+            self.propagar_cierre_uc.execute(fecha, pares_por_fecha[fecha], confirmar=fecha == fechas[-1])
+
+        # La propagación puede haber cambiado la versión de filas guardadas en fechas posteriores.
+        return self.inventario_repository.find_by_keys(list(cambios_por_clave.keys()))
+
+    def _aplicar_cambios(self, registro: InventarioDiario, cambio: dict):
+        for campo in self.CAMPOS_NUMERICOS:
+            if campo in cambio:
+                setattr(registro, campo, float(cambio[campo]))
+        if 'comentarios' in cambio:
+            registro.comentario = json.dumps(cambio['comentarios'])
+        elif 'comentario' in cambio:
+            registro.comentario = cambio['comentario']
 
 # Caso de uso para obtener los modelos de IPV.
 class ObtenerModelosIPVUseCase:
@@ -235,3 +440,111 @@ class GenerarReporteIPVUseCase:
                     reporte["notas"].append(nota)
 
         return reporte
+
+# Caso de uso para generar el reporte de IPV de un periodo (semana, mes o rango libre) con
+# los faltantes, sobrantes y mermas acumulados por área y producto.
+class GenerarReportePeriodoIPVUseCase:
+    PERIODOS = ('semana', 'mes')
+
+    def __init__(self, inventario_repository: SQLiteInventarioDiarioRepository):
+        self.inventario_repository = inventario_repository
+
+    # Calcula el rango de la semana (lunes a domingo) o del mes que contiene una fecha.
+    @classmethod
+    def rango_de_periodo(cls, periodo: str, fecha: date) -> tuple[date, date]:
+        if periodo == 'semana':
+            desde = fecha - timedelta(days=fecha.weekday())
+            return desde, desde + timedelta(days=6)
+        if periodo == 'mes':
+            desde = fecha.replace(day=1)
+            siguiente = (desde + timedelta(days=32)).replace(day=1)
+            return desde, siguiente - timedelta(days=1)
+        raise ValueError(f"Periodo no válido: {periodo}. Use uno de {', '.join(cls.PERIODOS)}.")
+
+    def execute(self, desde: date, hasta: date) -> dict:
+        if desde > hasta:
+            raise ValueError("La fecha 'desde' no puede ser posterior a 'hasta'.")
+
+        filas = self.inventario_repository.resumen_por_periodo(desde, hasta)
+        if not filas:
+            raise ValueError("No se encontraron registros para el periodo especificado.")
+
+        reporte = {
+            "desde": desde.isoformat(),
+            "hasta": hasta.isoformat(),
+            "areas": {},
+            "totales": {}
+        }
+        for fila in filas:
+            area_nombre = fila.pop("area")
+            reporte["areas"].setdefault(area_nombre, []).append(fila)
+            totales = reporte["totales"].setdefault(area_nombre, {"faltante": 0.0, "sobrante": 0.0, "merma": 0.0})
+            for campo in totales:
+                totales[campo] += fila[campo]
+        return reporte
+
+# Caso de uso para exportar a Excel el reporte de IPV de una fecha o de un rango: una hoja de
+# resumen y una hoja por área. Usa un libro en modo de solo escritura, que vuelca las filas a
+# disco a medida que se agregan, para que exportar varios meses no cargue todo en memoria.
+class ExportarReporteIPVExcel:
+    ENCABEZADOS = [
+        "Fecha", "Producto", "UM", "Inicio", "Entradas", "Consumo", "Merma",
+        "Otras salidas", "Final teórico", "Final físico", "Diferencia", "Comentario"
+    ]
+
+    def __init__(self, inventario_repository: SQLiteInventarioDiarioRepository):
+        self.inventario_repository = inventario_repository
+
+    def execute(self, desde: date, hasta: date):
+        if desde > hasta:
+            raise ValueError("La fecha 'desde' no puede ser posterior a 'hasta'.")
+
+        resumen = self.inventario_repository.resumen_por_periodo(desde, hasta)
+        if not resumen:
+            raise ValueError("No se encontraron registros para el periodo especificado.")
+
+        libro = Workbook(write_only=True)
+        hoja_resumen = libro.create_sheet("Resumen")
+        hoja_resumen.append(["Desde", desde, "Hasta", hasta])
+        hoja_resumen.append([])
+        hoja_resumen.append(["Área", "Producto", "UM", "Días", "Faltante", "Sobrante", "Merma"])
+        for fila in resumen:
+            hoja_resumen.append([
+                fila["area"], fila["producto"], fila["um"], fila["dias"],
+                fila["faltante"], fila["sobrante"], fila["merma"]
+            ])
+
+        hojas = {}
+        for registro in self.inventario_repository.iterar_rango(desde, hasta):
+            hoja = hojas.get(registro.area_nombre)
+            if hoja is None:
+                hoja = libro.create_sheet(self._nombre_hoja(registro.area_nombre, hojas))
+                hoja.append(self.ENCABEZADOS)
+                hojas[registro.area_nombre] = hoja
+            comentarios = registro.obtener_comentarios()
+            if comentarios:
+                comentario = "; ".join(f"{campo}: {texto}" for campo, texto in comentarios.items() if texto)
+            else:
+                comentario = registro.comentario or ""
+            hoja.append([
+                registro.fecha, registro.producto_nombre, registro.unidad_medida,
+                registro.inicio, registro.entradas, registro.consumo, registro.merma,
+                registro.otras_salidas, registro.final_teorico, registro.final_fisico,
+                registro.diferencia, comentario
+            ])
+
+        # El libro se guarda en un archivo temporal que se elimina al cerrarlo tras enviar la respuesta.
+        archivo = tempfile.TemporaryFile(suffix='.xlsx')
+        libro.save(archivo)
+        archivo.seek(0)
+        return archivo
+
+    # Excel limita los nombres de hoja a 31 caracteres y no admite algunos símbolos.
+    def _nombre_hoja(self, area_nombre: str, hojas: dict) -> str:
+        base = re.sub(r'[\\/*?:\[\]]', '_', area_nombre or "Sin área")[:31] or "Sin área"
+        nombre, sufijo = base, 1
+        usados = {"Resumen"} | {hoja.title for hoja in hojas.values()}
+        while nombre in usados:
+            sufijo += 1
+            nombre = f"{base[:28]}_{sufijo}"
+        return nombre
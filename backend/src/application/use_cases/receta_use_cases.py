@@ -1,34 +1,37 @@
 from abc import ABC, abstractmethod
-from src.core.domain import Receta, Ingrediente
+from src.core.domain import Receta, Ingrediente, normalizar_nombre
+from src.core.domain.matriz_bom import MatrizBOM
 from src.application.use_cases.historial_use_cases import RegistrarCambioUseCase
 import pandas as pd
-import io
+import tempfile
+import uuid
+from openpyxl import Workbook
 
 # Interfaz abstracta para el repositorio de recetas, definiendo los métodos obligatorios
 class IRecetaRepository(ABC):
     @abstractmethod
-    def crear(self, receta: Receta) -> Receta:
-        """Crea una nueva receta en el repositorio."""
+    def crear(self, receta: Receta, confirmar: bool = True) -> Receta:
+        """Crea una nueva receta en el repositorio; con confirmar=False no confirma la transacción."""
         pass
     
     @abstractmethod
-    def obtener_todos(self, sort_by: str = 'nombre', filter_by: str = None) -> list[Receta]:
-        """Obtiene todas las recetas del repositorio."""
+    def obtener_todos(self, sort_by: str = 'nombre', filter_by: str = None, detallar: bool = False) -> list[Receta]:
+        """Obtiene todas las recetas del repositorio, con los nombres de producto y área si se pide detallar."""
         pass
     
     @abstractmethod
-    def obtener_por_id(self, id: str) -> Receta:
-        """Obtiene una receta por su ID."""
+    def obtener_por_id(self, id: str, detallar: bool = False) -> Receta:
+        """Obtiene una receta por su ID, con los nombres de producto y área si se pide detallar."""
         pass
     
     @abstractmethod
-    def actualizar(self, receta: Receta) -> Receta:
-        """Actualiza una receta existente."""
+    def actualizar(self, receta: Receta, confirmar: bool = True) -> tuple[Receta, list[tuple[Ingrediente, Ingrediente]]]:
+        """Actualiza una receta existente (sin confirmar con confirmar=False) y devuelve la receta guardada con los pares (anterior, nuevo) de ingredientes cambiados."""
         pass
     
     @abstractmethod
-    def eliminar(self, id: str) -> bool:
-        """Elimina una receta por su ID."""
+    def eliminar(self, id: str, confirmar: bool = True) -> bool:
+        """Elimina una receta por su ID; con confirmar=False no confirma la transacción."""
         pass
 
     @abstractmethod
@@ -41,12 +44,43 @@ class IRecetaRepository(ABC):
         """Crea múltiples recetas en el repositorio."""
         pass
 
+    @abstractmethod
+    def crear_lote(self, recetas: list[Receta], productos_nuevos: list = None, areas_nuevas: list = None) -> int:
+        """Crea en bloque recetas con sus ingredientes, junto con los productos y áreas nuevos."""
+        pass
+
+    @abstractmethod
+    def iterar_filas_exportacion(self, bloque: int = 1000):
+        """Recorre el recetario como filas (receta, producto, unidad de medida, cantidad, área)."""
+        pass
+
+    @abstractmethod
+    def obtener_matriz_bom(self) -> MatrizBOM:
+        """Obtiene la matriz de materiales compilada de todas las recetas, indexada por ID de receta."""
+        pass
+
+    @abstractmethod
+    def obtener_indice_nombres(self) -> dict[str, str]:
+        """Obtiene el índice {nombre normalizado: id} para resolver nombres de receta."""
+        pass
+
+    @abstractmethod
+    def invalidar_cache(self):
+        """Descarta la matriz BOM y el índice de nombres compilados."""
+        pass
+
+
+# Describe un ingrediente detallado para el historial, por ejemplo "ARROZ (COCINA): 0.2 KG".
+def _describir_ingrediente(ingrediente: Ingrediente) -> str:
+    return f"{ingrediente.producto_nombre} ({ingrediente.area_nombre}): {ingrediente.cantidad:g} {ingrediente.unidad_medida}"
+
 
 # Caso de uso para crear una nueva receta
 class CrearRecetaUseCase:
-    def __init__(self, repository: IRecetaRepository, registrar_cambio_uc: RegistrarCambioUseCase):
+    def __init__(self, repository: IRecetaRepository, registrar_cambio_uc: RegistrarCambioUseCase, recalcular_consumo_uc):
         self.repository = repository
         self.registrar_cambio_uc = registrar_cambio_uc
+        self.recalcular_consumo_uc = recalcular_consumo_uc
         
     def execute(self, receta_data: dict) -> Receta:
         """
@@ -61,7 +95,12 @@ class CrearRecetaUseCase:
         receta.ingredientes = [
             Ingrediente.from_dict(ing) for ing in receta_data.get("ingredientes", [])
         ]
-        nueva_receta = self.repository.crear(receta)
+        nueva_receta = self.repository.crear(receta, confirmar=False)
+
+        # Las ventas previas con este nombre pasan a consumir los ingredientes de la receta. El ajuste
+        # del consumo confirma la receta, la vinculación de ventas y el consumo en una transacción.
+        self.recalcular_consumo_uc.execute(receta_nueva=nueva_receta)
+        self.repository.invalidar_cache()
 
         self.registrar_cambio_uc.execute(
             entidad_tipo='Receta',
@@ -78,9 +117,9 @@ class ObtenerRecetasUseCase:
     def __init__(self, repository: IRecetaRepository):
         self.repository = repository
         
-    def execute(self, sort_by: str = 'nombre', filter_by: str = None) -> list[Receta]:
+    def execute(self, sort_by: str = 'nombre', filter_by: str = None, detallar: bool = False) -> list[Receta]:
         """Ejecuta la obtención de todas las recetas."""
-        return self.repository.obtener_todos(sort_by=sort_by, filter_by=filter_by)
+        return self.repository.obtener_todos(sort_by=sort_by, filter_by=filter_by, detallar=detallar)
 
 # Caso de uso para obtener una receta por su ID
 class ObtenerRecetaPorIdUseCase:
@@ -93,9 +132,10 @@ class ObtenerRecetaPorIdUseCase:
 
 # Caso de uso para actualizar una receta
 class ActualizarRecetaUseCase:
-    def __init__(self, repository: IRecetaRepository, registrar_cambio_uc: RegistrarCambioUseCase):
+    def __init__(self, repository: IRecetaRepository, registrar_cambio_uc: RegistrarCambioUseCase, recalcular_consumo_uc):
         self.repository = repository
         self.registrar_cambio_uc = registrar_cambio_uc
+        self.recalcular_consumo_uc = recalcular_consumo_uc
         
     def execute(self, id: str, receta_data: dict) -> Receta:
         """
@@ -103,8 +143,7 @@ class ActualizarRecetaUseCase:
         Combina los datos nuevos con el ID para crear un objeto Receta y actualizarlo.
         """
         receta_data['nombre'] = receta_data.get('nombre').upper()
-        receta = Receta.from_dict({**receta_data, "id": id})
-        receta_actual = self.repository.obtener_por_id(id)
+        receta_actual = self.repository.obtener_por_id(id, detallar=True)
         if not receta_actual:
             return None
 
@@ -121,24 +160,35 @@ class ActualizarRecetaUseCase:
                 valor_anterior=receta_actual.nombre,
                 valor_nuevo=receta_actualizada.nombre
             )
-        
-        # Simplificado para el ejemplo, se puede expandir para los ingredientes
-        if len(receta_actual.ingredientes) != len(receta_actualizada.ingredientes):
-             self.registrar_cambio_uc.execute(
+
+        resultado, cambios = self.repository.actualizar(receta_actualizada, confirmar=False)
+        if resultado:
+            # La receta y el ajuste del consumo se confirman en la misma transacción.
+            self.recalcular_consumo_uc.execute(receta_anterior=receta_actual, receta_nueva=resultado)
+            self.repository.invalidar_cache()
+            self._registrar_cambios_ingredientes(id, cambios)
+        return resultado
+
+    def _registrar_cambios_ingredientes(self, receta_id: str, cambios: list[tuple[Ingrediente, Ingrediente]]):
+        """
+        Registra en el historial una entrada por cada ingrediente agregado, quitado o con otra
+        cantidad, a partir de los pares (anterior, nuevo) que calculó el repositorio al guardar.
+        """
+        for anterior, nuevo in cambios:
+            self.registrar_cambio_uc.execute(
                 entidad_tipo='Receta',
-                entidad_id=id,
-                campo_modificado='ingredientes',
-                valor_anterior=f"Receta '{receta_actual.nombre}' tenía {len(receta_actual.ingredientes)} ingredientes",
-                valor_nuevo=f"Receta '{receta_actualizada.nombre}' ahora tiene {len(receta_actualizada.ingredientes)} ingredientes"
+                entidad_id=receta_id,
+                campo_modificado='ingrediente',
+                valor_anterior=_describir_ingrediente(anterior) if anterior else '',
+                valor_nuevo=_describir_ingrediente(nuevo) if nuevo else ''
             )
 
-        return self.repository.actualizar(receta_actualizada)
-
 # Caso de uso para eliminar una receta
 class EliminarRecetaUseCase:
-    def __init__(self, repository: IRecetaRepository, registrar_cambio_uc: RegistrarCambioUseCase):
+    def __init__(self, repository: IRecetaRepository, registrar_cambio_uc: RegistrarCambioUseCase, recalcular_consumo_uc):
         self.repository = repository
         self.registrar_cambio_uc = registrar_cambio_uc
+        self.recalcular_consumo_uc = recalcular_consumo_uc
         
     def execute(self, id: str) -> bool:
         """Ejecuta la eliminación de una receta por su ID."""
@@ -155,7 +205,12 @@ class EliminarRecetaUseCase:
             valor_nuevo=''
         )
         
-        return self.repository.eliminar(id)
+        eliminada = self.repository.eliminar(id, confirmar=False)
+        if eliminada:
+            # La eliminación y el descuento del consumo se confirman en la misma transacción.
+            self.recalcular_consumo_uc.execute(receta_anterior=receta)
+            self.repository.invalidar_cache()
+        return eliminada
 
 # Caso de uso para importar recetas desde una lista de diccionarios
 class ImportarRecetasUseCase:
@@ -195,95 +250,143 @@ from src.application.use_cases.producto_use_cases import IProductoRepository
 from src.application.use_cases.area_use_cases import IAreaRepository
 from src.core.domain import Area, Producto
 
-# Caso de uso para exportar recetas a Excel
+# Caso de uso para exportar recetas a Excel, con una fila por ingrediente. Las filas salen de una
+# sola consulta y se escriben en un libro de solo escritura, que las vuelca a disco a medida que se
+# agregan, para que exportar todo el recetario no lo cargue en memoria.
 class ExportRecetasExcel:
-    def __init__(self, repository: IRecetaRepository, producto_repository: IProductoRepository, area_repository: IAreaRepository):
+    ENCABEZADOS = ["receta_nombre", "producto_nombre", "unidad_medida", "cantidad", "area_nombre"]
+
+    def __init__(self, repository: IRecetaRepository):
         self.repository = repository
-        self.producto_repository = producto_repository
-        self.area_repository = area_repository
 
     def execute(self):
-        recetas = self.repository.obtener_todos()
-        
-        recetas_data = []
-        for r in recetas:
-            if not r.ingredientes:
-                recetas_data.append({
-                    "receta_nombre": r.nombre,
-                    "producto_nombre": "",
-                    "unidad_medida": "",
-                    "cantidad": "",
-                    "area_nombre": ""
-                })
+        libro = Workbook(write_only=True)
+        hoja = libro.create_sheet('Recetas')
+        hoja.append(self.ENCABEZADOS)
+        for receta, producto, unidad_medida, cantidad, area in self.repository.iterar_filas_exportacion():
+            if producto is None:
+                hoja.append([receta, "", "", "", ""])
             else:
-                for i in r.ingredientes:
-                    producto = self.producto_repository.obtener_por_id(i.producto_id)
-                    area = self.area_repository.obtener_por_id(i.area_id)
-                    recetas_data.append({
-                        "receta_nombre": r.nombre,
-                        "producto_nombre": producto.nombre if producto else "Producto no encontrado",
-                        "unidad_medida": producto.unidad_medida if producto else "",
-                        "cantidad": i.cantidad,
-                        "area_nombre": area.nombre if area else "Área no encontrada"
-                    })
-        
-        df = pd.DataFrame(recetas_data)
-        
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Recetas')
-        
-        output.seek(0)
-        return output
+                hoja.append([receta, producto, unidad_medida, cantidad, area])
+
+        # El libro se guarda en un archivo temporal que se elimina al cerrarlo tras enviar la respuesta.
+        archivo = tempfile.TemporaryFile(suffix='.xlsx')
+        libro.save(archivo)
+        archivo.seek(0)
+        return archivo
 
 # Caso de uso para importar recetas desde Excel
 class ImportRecetasExcel:
-    def __init__(self, repository: IRecetaRepository, producto_repository: IProductoRepository, area_repository: IAreaRepository):
+    def __init__(self, repository: IRecetaRepository, producto_repository: IProductoRepository,
+                 area_repository: IAreaRepository, reconstruir_consumo_uc):
         self.repository = repository
         self.producto_repository = producto_repository
         self.area_repository = area_repository
+        self.reconstruir_consumo_uc = reconstruir_consumo_uc
 
-    def execute(self, file):
+    def execute(self, file) -> dict:
+        """
+        Importa un recetario desde Excel, con una fila por ingrediente (o una fila sin producto
+        para una receta sin ingredientes).
+        Los nombres de recetas, productos y áreas se resuelven contra índices {nombre normalizado: id}
+        cargados una sola vez; las recetas existentes se omiten y los productos y áreas que no
+        existen se crean. Una receta con alguna fila inválida no se importa. Todo lo nuevo se
+        inserta en bloque en una sola transacción y, si alguna venta pasa a tener receta, se
+        recalcula el consumo diario. Retorna un resumen de la importación.
+        """
         df = pd.read_excel(file).fillna('')
         
         required_columns = ["receta_nombre", "producto_nombre", "unidad_medida", "cantidad", "area_nombre"]
         if not all(col in df.columns for col in required_columns):
             raise ValueError(f"El archivo Excel debe contener las columnas: {', '.join(required_columns)}")
 
-        recetas_a_crear = {}
-        for _, row in df.iterrows():
-            receta_nombre = row["receta_nombre"]
+        indice_recetas = self.repository.obtener_indice_nombres()
+        productos = {normalizar_nombre(p.nombre): p.id for p in self.producto_repository.obtener_todos()}
+        areas = {normalizar_nombre(a.nombre): a.id for a in self.area_repository.find_all()}
+
+        recetas_nuevas = {}
+        productos_nuevos = {}
+        areas_nuevas = {}
+        omitidas = {}
+        con_errores = set()
+        errores = []
+        cantidades = pd.to_numeric(df["cantidad"], errors='coerce')
+        filas = df[["receta_nombre", "producto_nombre", "unidad_medida", "area_nombre"]].astype(str).itertuples(index=False, name=None)
+        # La fila 1 del archivo es el encabezado.
+        for fila, (receta_nombre, producto_nombre, unidad_medida, area_nombre), cantidad in zip(
+            range(2, len(df) + 2), filas, cantidades.tolist()
+        ):
+            receta_nombre, producto_nombre = receta_nombre.strip(), producto_nombre.strip()
+            unidad_medida, area_nombre = unidad_medida.strip(), area_nombre.strip()
             if not receta_nombre:
                 continue
+            clave_receta = normalizar_nombre(receta_nombre)
+            if clave_receta in indice_recetas:
+                omitidas.setdefault(clave_receta, receta_nombre.upper())
+                continue
+            receta = recetas_nuevas.get(clave_receta)
+            if receta is None:
+                receta = Receta(nombre=receta_nombre.upper(), id=str(uuid.uuid4()))
+                recetas_nuevas[clave_receta] = receta
+            if not producto_nombre:
+                continue
+
+            clave_producto = normalizar_nombre(producto_nombre)
+            clave_area = normalizar_nombre(area_nombre)
+            producto_id = productos.get(clave_producto)
+            area_id = areas.get(clave_area)
+            motivos = []
+            if producto_id is None and not unidad_medida:
+                motivos.append("Unidad de medida vacía para un producto nuevo")
+            if not area_nombre:
+                motivos.append("Área vacía")
+            if pd.isna(cantidad):
+                motivos.append("Cantidad no numérica")
+            elif cantidad <= 0:
+                motivos.append("Cantidad debe ser positiva")
+            if not motivos and producto_id is not None and area_id is not None and any(
+                i.producto_id == producto_id and i.area_id == area_id for i in receta.ingredientes
+            ):
+                motivos.append("Ingrediente duplicado en la receta")
+            if motivos:
+                con_errores.add(clave_receta)
+                errores.append({"fila": fila, "receta": receta.nombre, "errores": motivos})
+                continue
+
+            if producto_id is None:
+                producto = Producto(nombre=producto_nombre.upper(), unidad_medida=unidad_medida.upper(), id=str(uuid.uuid4()))
+                productos_nuevos[producto.id] = producto
+                productos[clave_producto] = producto_id = producto.id
+            if area_id is None:
+                area = Area(id=str(uuid.uuid4()), nombre=area_nombre.upper())
+                areas_nuevas[area.id] = area
+                areas[clave_area] = area_id = area.id
+            receta.ingredientes.append(
+                Ingrediente(producto_id=producto_id, area_id=area_id, cantidad=float(cantidad), receta_id=receta.id)
+            )
+
+        recetas = [receta for clave, receta in recetas_nuevas.items() if clave not in con_errores]
+        # Solo se crean los productos y áreas que usan las recetas que sí se importan.
+        productos_en_uso = {i.producto_id for receta in recetas for i in receta.ingredientes}
+        areas_en_uso = {i.area_id for receta in recetas for i in receta.ingredientes}
+        productos_creados = [p for p in productos_nuevos.values() if p.id in productos_en_uso]
+        areas_creadas = [a for a in areas_nuevas.values() if a.id in areas_en_uso]
+
+        ingredientes_creados = 0
+        consumo = None
+        if recetas:
+            ingredientes_creados = self.repository.crear_lote(recetas, productos_creados, areas_creadas)
+            # Las ventas previas con el nombre de alguna receta nueva pasan a consumir sus ingredientes.
+            consumo = self.reconstruir_consumo_uc.execute(solo_si_vinculadas=True)
 
-            if receta_nombre not in recetas_a_crear:
-                if not self.repository.find_by_name(receta_nombre):
-                    recetas_a_crear[receta_nombre] = {"nombre": receta_nombre, "ingredientes": []}
-
-            if receta_nombre in recetas_a_crear and row["producto_nombre"]:
-                producto = self.producto_repository.find_by_name(row["producto_nombre"])
-                if not producto:
-                    producto_data = {
-                        "nombre": row["producto_nombre"],
-                        "unidad_medida": row["unidad_medida"]
-                    }
-                    producto = self.producto_repository.crear(Producto.from_dict(producto_data))
-
-                area = self.area_repository.find_by_name(row["area_nombre"])
-                if not area:
-                    area_data = {"nombre": row["area_nombre"]}
-                    area = self.area_repository.crear(Area.from_dict(area_data))
-                
-                recetas_a_crear[receta_nombre]["ingredientes"].append({
-                    "producto_id": producto.id,
-                    "area_id": area.id,
-                    "cantidad": row["cantidad"]
-                })
-
-        for receta_data in recetas_a_crear.values():
-            if not self.repository.find_by_name(receta_data["nombre"]):
-                receta = Receta.from_dict(receta_data)
-                receta.ingredientes = [
-                    Ingrediente.from_dict(ing) for ing in receta_data.get("ingredientes", [])
-                ]
-                self.repository.crear(receta)
+        return {
+            "importadas": len(recetas),
+            "omitidas": len(omitidas),
+            "recetas_omitidas": sorted(omitidas.values()),
+            "recetas_con_errores": len(con_errores),
+            "productos_creados": [p.nombre for p in productos_creados],
+            "areas_creadas": [a.nombre for a in areas_creadas],
+            "ingredientes_creados": ingredientes_creados,
+            "errores": errores,
+            "consumo": consumo
+        }
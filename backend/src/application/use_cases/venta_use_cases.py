@@ -1,13 +1,18 @@
 from abc import ABC, abstractmethod
 from src.core.domain.venta import Venta
+from src.core.domain.receta import normalizar_nombre
 import pandas as pd
+import io
+import hashlib
+import uuid
 from datetime import datetime
+from openpyxl import Workbook, load_workbook
 
 # Interfaz abstracta para el repositorio de ventas
 class IVentaRepository(ABC):
     @abstractmethod
-    def crear(self, venta: Venta) -> Venta:
-        """Crea una nueva venta."""
+    def crear(self, venta: Venta, confirmar: bool = True) -> Venta:
+        """Crea una nueva venta; con confirmar=False no confirma la transacción."""
         pass
     
     @abstractmethod
@@ -15,24 +20,36 @@ class IVentaRepository(ABC):
         """Obtiene todas las ventas."""
         pass
     
+    @abstractmethod
+    def buscar(self, fecha: datetime.date = None, desde: datetime.date = None, hasta: datetime.date = None,
+               receta: str = None, limite: int = None, despues_de: tuple = None) -> list[Venta]:
+        """Obtiene una página de ventas filtradas, ordenadas por (fecha, id) descendente."""
+        pass
+
+    @abstractmethod
+    def contar(self, fecha: datetime.date = None, desde: datetime.date = None, hasta: datetime.date = None,
+               receta: str = None) -> int:
+        """Cuenta las ventas que cumplen los filtros."""
+        pass
+
     @abstractmethod
     def obtener_por_id(self, id: str) -> Venta:
         """Obtiene una venta por su ID."""
         pass
     
     @abstractmethod
-    def actualizar(self, venta: Venta) -> Venta:
-        """Actualiza una venta existente."""
+    def actualizar(self, venta: Venta, confirmar: bool = True) -> Venta:
+        """Actualiza una venta existente; con confirmar=False no confirma la transacción."""
         pass
     
     @abstractmethod
-    def eliminar(self, id: str) -> bool:
-        """Elimina una venta por su ID."""
+    def eliminar(self, id: str, confirmar: bool = True) -> bool:
+        """Elimina una venta por su ID; con confirmar=False no confirma la transacción."""
         pass
 
     @abstractmethod
-    def eliminar_multiples(self, ids: list[str]) -> bool:
-        """Elimina múltiples ventas por sus IDs."""
+    def eliminar_multiples(self, ids: list[str], confirmar: bool = True) -> bool:
+        """Elimina múltiples ventas por sus IDs; con confirmar=False no confirma la transacción."""
         pass
 
     @abstractmethod
@@ -40,29 +57,194 @@ class IVentaRepository(ABC):
         """Crea múltiples ventas."""
         pass
 
+    @abstractmethod
+    def insertar_lote(self, filas: list[dict], importacion_id: str = None, recetas_nuevas: list[dict] = None,
+                      confirmar: bool = True) -> int:
+        """Inserta y confirma (salvo con confirmar=False) un lote de ventas dadas como diccionarios."""
+        pass
+
+    @abstractmethod
+    def registrar_importacion(self, hash_archivo: str, nombre_archivo: str, fecha: datetime.date,
+                              confirmar: bool = True) -> dict:
+        """Registra la importación de un archivo de ventas; con confirmar=False no confirma la transacción."""
+        pass
+
+    @abstractmethod
+    def buscar_importacion(self, hash_archivo: str) -> dict:
+        """Obtiene la importación más reciente de un archivo con ese contenido."""
+        pass
+
+    @abstractmethod
+    def obtener_importaciones(self) -> list[dict]:
+        """Obtiene el registro de importaciones de ventas."""
+        pass
+
+    @abstractmethod
+    def eliminar_importacion(self, id: str, confirmar: bool = True) -> dict:
+        """Elimina una importación junto con todas sus ventas; con confirmar=False no confirma la transacción."""
+        pass
+
     @abstractmethod
     def find_by_date(self, fecha: datetime.date) -> list[Venta]:
         """Obtiene todas las ventas para una fecha específica."""
         pass
 
+    @abstractmethod
+    def obtener_totales_por_receta(self, fecha: datetime.date) -> dict[str, int]:
+        """Obtiene la cantidad total vendida de cada receta en una fecha, indexada por ID de receta."""
+        pass
+
+    @abstractmethod
+    def obtener_por_ids(self, ids: list[str]) -> list[Venta]:
+        """Obtiene las ventas correspondientes a una lista de IDs."""
+        pass
+
+    @abstractmethod
+    def obtener_totales_por_fecha(self, receta_id: str) -> dict[datetime.date, int]:
+        """Obtiene la cantidad vendida de una receta en cada fecha con ventas."""
+        pass
+
+    @abstractmethod
+    def vincular_recetas(self, indice_nombres: dict[str, str], confirmar: bool = True) -> tuple[int, set]:
+        """Asigna receta a las ventas sin receta según el índice {nombre normalizado: id}; devuelve cuántas y en qué fechas."""
+        pass
+
+    @abstractmethod
+    def resumen_diario(self, desde: datetime.date, hasta: datetime.date) -> list[dict]:
+        """Obtiene el total vendido de cada receta por día en un rango de fechas."""
+        pass
+
+    @abstractmethod
+    def reconstruir_diarias(self) -> int:
+        """Regenera los totales diarios por receta a partir de las ventas."""
+        pass
+
+    @abstractmethod
+    def obtener_rango_fechas(self) -> tuple:
+        """Obtiene la primera y la última fecha con ventas registradas."""
+        pass
+
+    @abstractmethod
+    def consumo_por_rango(self, desde: datetime.date, hasta: datetime.date, por_dia: bool = False,
+                          fechas: set = None) -> dict:
+        """Calcula el consumo de productos por área derivado de las ventas de un rango de fechas (o solo de esas fechas)."""
+        pass
+
+# Resuelve la receta de una venta a partir de su nombre normalizado.
+def _resolver_receta(venta: Venta, receta_repository) -> Venta:
+    venta.receta_id = receta_repository.obtener_indice_nombres().get(normalizar_nombre(venta.receta_nombre))
+    return venta
+
 # Caso de uso para crear una venta
 class CrearVentaUseCase:
-    def __init__(self, repository: IVentaRepository):
+    def __init__(self, repository: IVentaRepository, receta_repository, actualizar_consumo_uc):
         self.repository = repository
+        self.receta_repository = receta_repository
+        self.actualizar_consumo_uc = actualizar_consumo_uc
         
     def execute(self, venta_data: dict) -> Venta:
-        """Ejecuta la creación de una venta."""
-        venta = Venta.from_dict(venta_data)
-        return self.repository.crear(venta)
+        """
+        Ejecuta la creación de una venta y suma su consumo al día correspondiente. La venta y el
+        consumo se confirman en la misma transacción.
+        """
+        venta = _resolver_receta(Venta.from_dict(venta_data), self.receta_repository)
+        nueva_venta = self.repository.crear(venta, confirmar=False)
+        self.actualizar_consumo_uc.execute(ventas_nuevas=[nueva_venta])
+        return nueva_venta
 
 # Caso de uso para obtener todas las ventas
 class ObtenerVentasUseCase:
     def __init__(self, repository: IVentaRepository):
         self.repository = repository
         
-    def execute(self) -> list[Venta]:
-        """Ejecuta la obtención de todas las ventas."""
-        return self.repository.obtener_todos()
+    def execute(self, filtros: dict = None, limite: int = None, cursor: str = None):
+        """
+        Ejecuta la obtención de ventas. Sin filtros ni límite devuelve todas las ventas. Con límite
+        devuelve una página {"ventas", "siguiente_cursor"}; el cursor es "fecha|id" de la última venta.
+        """
+        filtros = filtros or {}
+        if limite is None:
+            if cursor:
+                raise ValueError("El cursor de paginación requiere un límite.")
+            if not any(filtros.values()):
+                return self.repository.obtener_todos()
+            return self.repository.buscar(**filtros)
+
+        if limite <= 0:
+            raise ValueError("El límite debe ser un número entero positivo.")
+        despues_de = None
+        if cursor:
+            try:
+                fecha_cursor, id_cursor = cursor.split('|', 1)
+                despues_de = (datetime.strptime(fecha_cursor, '%Y-%m-%d').date(), id_cursor)
+            except ValueError:
+                raise ValueError("Cursor de paginación inválido.")
+
+        # Se pide una venta de más para saber si existe una página siguiente.
+        ventas = self.repository.buscar(**filtros, limite=limite + 1, despues_de=despues_de)
+        siguiente_cursor = None
+        if len(ventas) > limite:
+            ventas = ventas[:limite]
+            siguiente_cursor = f"{ventas[-1].fecha}|{ventas[-1].id}"
+        return {"ventas": ventas, "siguiente_cursor": siguiente_cursor}
+
+# Caso de uso para contar las ventas que cumplen unos filtros
+class ContarVentasUseCase:
+    def __init__(self, repository: IVentaRepository):
+        self.repository = repository
+
+    def execute(self, filtros: dict = None) -> int:
+        """Ejecuta el conteo de ventas filtradas."""
+        return self.repository.contar(**(filtros or {}))
+
+# Caso de uso para consultar el registro de importaciones de ventas
+class ObtenerImportacionesVentasUseCase:
+    def __init__(self, repository: IVentaRepository):
+        self.repository = repository
+
+    def execute(self) -> list[dict]:
+        """Ejecuta la obtención de las importaciones registradas."""
+        return self.repository.obtener_importaciones()
+
+# Caso de uso para deshacer una importación completa de ventas
+class DeshacerImportacionVentasUseCase:
+    def __init__(self, repository: IVentaRepository, actualizar_consumo_uc):
+        self.repository = repository
+        self.actualizar_consumo_uc = actualizar_consumo_uc
+
+    def execute(self, id: str) -> dict:
+        """
+        Ejecuta la eliminación de todas las ventas de una importación y descuenta su consumo, que
+        solo depende del total de cada receta por día. Devuelve None si la importación no existe.
+        """
+        resultado = self.repository.eliminar_importacion(id, confirmar=False)
+        if resultado is None:
+            return None
+        self.actualizar_consumo_uc.execute(ventas_anteriores=[
+            Venta(receta_nombre='', receta_id=receta_id, cantidad=total, fecha=fecha)
+            for fecha, receta_id, total in resultado["totales"]
+        ])
+        return {"importacion_id": id, "ventas_eliminadas": resultado["ventas_eliminadas"]}
+
+# Caso de uso para obtener el total vendido de cada receta por día
+class ObtenerVentasDiariasUseCase:
+    def __init__(self, repository: IVentaRepository):
+        self.repository = repository
+
+    def execute(self, desde: datetime.date, hasta: datetime.date) -> list[dict]:
+        """Ejecuta la consulta de los totales diarios por receta de un rango de fechas."""
+        if desde > hasta:
+            raise ValueError("La fecha 'desde' no puede ser posterior a 'hasta'.")
+        return self.repository.resumen_diario(desde, hasta)
+
+# Caso de uso para regenerar los totales diarios por receta a partir de las ventas
+class ReconstruirVentasDiariasUseCase:
+    def __init__(self, repository: IVentaRepository):
+        self.repository = repository
+
+    def execute(self) -> dict:
+        """Ejecuta la reconstrucción completa de la tabla ventas_diarias."""
+        return {"registros": self.repository.reconstruir_diarias()}
 
 # Caso de uso para obtener una venta por su ID
 class ObtenerVentaPorIdUseCase:
@@ -75,89 +257,463 @@ class ObtenerVentaPorIdUseCase:
 
 # Caso de uso para actualizar una venta
 class ActualizarVentaUseCase:
-    def __init__(self, repository: IVentaRepository):
+    def __init__(self, repository: IVentaRepository, receta_repository, actualizar_consumo_uc):
         self.repository = repository
+        self.receta_repository = receta_repository
+        self.actualizar_consumo_uc = actualizar_consumo_uc
         
     def execute(self, id: str, venta_data: dict) -> Venta:
-        """Ejecuta la actualización de una venta."""
-        venta = Venta.from_dict({**venta_data, "id": id})
-        return self.repository.actualizar(venta)
+        """
+        Ejecuta la actualización de una venta y ajusta el consumo de los días afectados, ambos en
+        la misma transacción.
+        """
+        venta_anterior = self.repository.obtener_por_id(id)
+        venta = _resolver_receta(Venta.from_dict({**venta_data, "id": id}), self.receta_repository)
+        venta_actualizada = self.repository.actualizar(venta, confirmar=False)
+        if venta_actualizada:
+            self.actualizar_consumo_uc.execute(ventas_anteriores=[venta_anterior], ventas_nuevas=[venta_actualizada])
+        return venta_actualizada
 
 # Caso de uso para eliminar una venta
 class EliminarVentaUseCase:
-    def __init__(self, repository: IVentaRepository):
+    def __init__(self, repository: IVentaRepository, actualizar_consumo_uc):
         self.repository = repository
+        self.actualizar_consumo_uc = actualizar_consumo_uc
         
     def execute(self, id: str) -> bool:
-        """Ejecuta la eliminación de una venta."""
-        return self.repository.eliminar(id)
+        """Ejecuta la eliminación de una venta y descuenta su consumo en la misma transacción."""
+        venta = self.repository.obtener_por_id(id)
+        eliminada = self.repository.eliminar(id, confirmar=False)
+        if eliminada:
+            self.actualizar_consumo_uc.execute(ventas_anteriores=[venta])
+        return eliminada
 
 # Caso de uso para eliminar múltiples ventas
 class EliminarVentasMultiplesUseCase:
-    def __init__(self, repository: IVentaRepository):
+    def __init__(self, repository: IVentaRepository, actualizar_consumo_uc):
         self.repository = repository
+        self.actualizar_consumo_uc = actualizar_consumo_uc
         
     def execute(self, ids: list[str]) -> bool:
-        """Ejecuta la eliminación de múltiples ventas."""
-        return self.repository.eliminar_multiples(ids)
+        """Ejecuta la eliminación de múltiples ventas y descuenta su consumo en la misma transacción."""
+        ventas = self.repository.obtener_por_ids(ids)
+        eliminadas = self.repository.eliminar_multiples(ids, confirmar=False)
+        if eliminadas:
+            self.actualizar_consumo_uc.execute(ventas_anteriores=ventas)
+        return eliminadas
 
 from src.core.domain.receta import Receta
 
+# Error de validación del archivo de ventas. errores contiene una entrada por fila inválida
+# ({"fila", "nombre", "cantidad", "errores"}); reanudar_desde indica cuántas filas de datos ya
+# quedaron guardadas y deben omitirse al volver a importar.
+class ImportacionVentasError(ValueError):
+    def __init__(self, errores: list[dict], reanudar_desde: int):
+        super().__init__(f"Se encontraron {len(errores)} filas con errores en el archivo de ventas")
+        self.errores = errores
+        self.reanudar_desde = reanudar_desde
+
+# Error en mitad de una importación: los bloques anteriores quedaron guardados. reanudar_desde es el
+# número de filas de datos ya confirmadas, que se omiten al reanudar la importación del mismo archivo.
+class ImportacionVentasInterrumpidaError(Exception):
+    def __init__(self, causa: Exception, reanudar_desde: int, importacion_id: str, ventas_importadas: int):
+        super().__init__(f"La importación se interrumpió tras {reanudar_desde} filas: {causa}")
+        self.reanudar_desde = reanudar_desde
+        self.importacion_id = importacion_id
+        self.ventas_importadas = ventas_importadas
+
+# Error de archivo ya importado: su contenido coincide con el de una importación registrada.
+class ImportacionDuplicadaError(ValueError):
+    def __init__(self, importacion: dict):
+        super().__init__(
+            f"El archivo ya se importó el {importacion['creado_en']} ({importacion['filas']} ventas)"
+        )
+        self.importacion = importacion
+
+# Calcula la huella SHA-256 del contenido de un archivo leyéndolo por bloques y lo rebobina.
+def _hash_archivo(file_stream) -> str:
+    hasher = hashlib.sha256()
+    for bloque in iter(lambda: file_stream.read(1 << 20), b''):
+        hasher.update(bloque)
+    file_stream.seek(0)
+    return hasher.hexdigest()
+
+# Lee un archivo .xlsx en modo de solo lectura y produce DataFrames de a lo sumo tamano_bloque filas,
+# sin cargar la hoja completa en memoria.
+def _leer_bloques_excel(file_stream, tamano_bloque: int):
+    libro = load_workbook(file_stream, read_only=True, data_only=True)
+    try:
+        filas = libro.worksheets[0].iter_rows(values_only=True)
+        encabezados = next(filas, None)
+        if encabezados is None:
+            return
+        columnas = [str(c).strip() if c is not None else "" for c in encabezados]
+        bloque = []
+        for fila in filas:
+            bloque.append(fila)
+            if len(bloque) == tamano_bloque:
+                yield pd.DataFrame(bloque, columns=columnas)
+                bloque = []
+        if bloque:
+            yield pd.DataFrame(bloque, columns=columnas)
+    finally:
+        libro.close()
+
+# Lee un archivo CSV (separado por comas o punto y coma) en bloques de tamano_bloque filas.
+def _leer_bloques_csv(file_stream, tamano_bloque: int):
+    texto = io.TextIOWrapper(file_stream, encoding='utf-8-sig', newline='')
+    try:
+        primera_linea = texto.readline()
+        texto.seek(0)
+        separador = ';' if primera_linea.count(';') > primera_linea.count(',') else ','
+        for bloque in pd.read_csv(texto, sep=separador, chunksize=tamano_bloque, dtype=str, skipinitialspace=True):
+            bloque.columns = [str(c).strip() for c in bloque.columns]
+            yield bloque
+    finally:
+        # Se separa el envoltorio de texto para que no cierre el archivo subido, que puede releerse.
+        texto.detach()
+
+# Elige el lector según la extensión del archivo. El formato .xls antiguo no admite lectura en streaming.
+def _leer_bloques(file_stream, nombre_archivo: str, tamano_bloque: int):
+    if nombre_archivo.lower().endswith('.csv'):
+        return _leer_bloques_csv(file_stream, tamano_bloque)
+    if nombre_archivo.lower().endswith('.xls'):
+        df = pd.read_excel(file_stream)
+        return (df.iloc[i:i + tamano_bloque] for i in range(0, len(df), tamano_bloque))
+    return _leer_bloques_excel(file_stream, tamano_bloque)
+
+# Convierte la columna Fecha a fechas sin hora. Admite fechas de Excel (celdas de fecha o número
+# de serie), texto ISO (AAAA-MM-DD) y texto día/mes/año. Las celdas vacías o ilegibles quedan NaT.
+def _parsear_fechas(serie: pd.Series) -> pd.Series:
+    texto = serie.astype('string').str.strip().replace('', pd.NA)
+    fechas = pd.to_datetime(pd.to_numeric(texto, errors='coerce'), unit='D', origin='1899-12-30', errors='coerce')
+    for opciones in ({'format': 'ISO8601'}, {'format': 'mixed', 'dayfirst': True}):
+        resto = fechas.isna() & texto.notna()
+        if not resto.any():
+            break
+        fechas = fechas.where(~resto, pd.to_datetime(texto.where(resto), errors='coerce', **opciones))
+    return fechas.dt.normalize()
+
+# Valida un bloque del archivo con operaciones por columna: nombre vacío, cantidad no numérica,
+# no positiva o no entera y fecha vacía o inválida (si el archivo tiene columna Fecha). Las celdas
+# de fecha vacías toman fecha_defecto si se indica. Las líneas repetidas (mismo nombre, cantidad y
+# fecha) son ventas legítimas del TPV: se importan igual y solo se señalan como advertencia.
+# primeras_filas acumula entre bloques la fila en la que apareció cada línea por primera vez.
+# Devuelve (nombres, cantidades, fechas) de las filas válidas, con fechas None si el archivo no
+# tiene columna Fecha, la lista de errores por fila y la de advertencias por fila.
+def _validar_bloque(df: pd.DataFrame, fila_inicial: int, primeras_filas: dict, fecha_defecto=None) -> tuple:
+    df = df.reset_index(drop=True)
+    filas = pd.RangeIndex(fila_inicial, fila_inicial + len(df))
+    nombres = df['Nombre'].astype('string').str.strip()
+    cantidades = pd.to_numeric(df['Cantidad'], errors='coerce')
+
+    nombre_vacio = nombres.isna() | nombres.eq('')
+    no_numerica = cantidades.isna()
+    no_positiva = ~no_numerica & (cantidades <= 0)
+    no_entera = ~no_numerica & (cantidades % 1 != 0)
+
+    fechas = None
+    fecha_vacia = fecha_invalida = pd.Series(False, index=df.index)
+    if 'Fecha' in df.columns:
+        fechas = _parsear_fechas(df['Fecha'])
+        sin_valor = df['Fecha'].astype('string').str.strip().replace('', pd.NA).isna()
+        if fecha_defecto is not None:
+            fechas = fechas.where(~sin_valor, pd.Timestamp(fecha_defecto))
+        else:
+            fecha_vacia = sin_valor
+        fecha_invalida = fechas.isna() & ~sin_valor
+
+    # Duplicados contra bloques anteriores y dentro del propio bloque.
+    claves = nombres.fillna('') + '\x1f' + cantidades.astype('Float64').astype('string').fillna('')
+    if fechas is not None:
+        claves = claves + '\x1f' + fechas.dt.strftime('%Y-%m-%d').fillna('')
+    primera_fila = claves.map(primeras_filas)
+    primera_en_bloque = pd.Series(filas, index=claves.index).groupby(claves).transform('first')
+    primera_fila = primera_fila.fillna(primera_en_bloque.where(claves.duplicated(), other=pd.NA))
+    duplicada = primera_fila.notna() & ~nombre_vacio & ~no_numerica
+    nuevas = ~claves.duplicated() & primera_fila.isna()
+    primeras_filas.update(zip(claves[nuevas].tolist(), filas[nuevas.to_numpy()].tolist()))
+
+    motivos = pd.DataFrame({
+        "Nombre vacío": nombre_vacio,
+        "Cantidad no numérica": no_numerica,
+        "Cantidad debe ser positiva": no_positiva,
+        "Cantidad debe ser entera": no_entera,
+        "Fecha vacía": fecha_vacia,
+        "Fecha inválida": fecha_invalida
+    })
+    invalidas = motivos.any(axis=1)
+
+    errores = []
+    if invalidas.any():
+        posiciones = invalidas.to_numpy().nonzero()[0]
+        etiquetas = list(motivos.columns)
+        matriz = motivos.to_numpy()[posiciones]
+        originales = df[['Nombre', 'Cantidad']].iloc[posiciones].astype(object)
+        originales = originales.where(originales.notna(), None).to_numpy()
+        for posicion, marcas, (nombre, cantidad) in zip(posiciones, matriz, originales):
+            errores.append({
+                "fila": int(filas[posicion]),
+                "nombre": None if nombre is None else str(nombre),
+                "cantidad": None if cantidad is None else str(cantidad),
+                "errores": [etiqueta for etiqueta, marca in zip(etiquetas, marcas) if marca]
+            })
+
+    validas = ~invalidas
+    advertencias = []
+    repetidas = duplicada & validas
+    if repetidas.any():
+        posiciones = repetidas.to_numpy().nonzero()[0]
+        originales = df[['Nombre', 'Cantidad']].iloc[posiciones].astype(object).to_numpy()
+        for posicion, (nombre, cantidad), origen in zip(posiciones, originales, primera_fila.to_numpy()[posiciones]):
+            advertencias.append({
+                "fila": int(filas[posicion]),
+                "nombre": str(nombre),
+                "cantidad": str(cantidad),
+                "advertencias": [f"Línea duplicada (igual a la fila {int(origen)})"]
+            })
+
+    if fechas is not None:
+        fechas = fechas[validas].dt.date
+    return nombres[validas].astype(str), cantidades[validas].astype(int), fechas, errores, advertencias
+
+# Recorre el archivo por bloques y devuelve el número de filas leídas, los errores y las advertencias.
+def _validar_archivo(file_stream, nombre_archivo: str, tamano_bloque: int, reanudar_desde: int = 0,
+                     fecha_defecto=None) -> tuple[int, list[dict], list[dict]]:
+    filas_leidas = 0
+    errores = []
+    advertencias = []
+    primeras_filas = {}
+    for df in _leer_bloques(file_stream, nombre_archivo, tamano_bloque):
+        _comprobar_columnas(df)
+        inicio_bloque = filas_leidas
+        filas_leidas += len(df)
+        if filas_leidas <= reanudar_desde:
+            continue
+        if inicio_bloque < reanudar_desde:
+            df = df.iloc[reanudar_desde - inicio_bloque:]
+            inicio_bloque = reanudar_desde
+        # La fila 1 del archivo es el encabezado.
+        _, _, _, errores_bloque, advertencias_bloque = _validar_bloque(df, inicio_bloque + 2, primeras_filas, fecha_defecto)
+        errores.extend(errores_bloque)
+        advertencias.extend(advertencias_bloque)
+    return filas_leidas, errores, advertencias
+
+def _comprobar_columnas(df: pd.DataFrame):
+    if 'Nombre' not in df.columns or 'Cantidad' not in df.columns:
+        raise ValueError("El archivo debe contener las columnas 'Nombre' y 'Cantidad'")
+
+# Caso de uso para validar un archivo de ventas sin importarlo y obtener el reporte de errores.
+class ValidarImportacionVentasUseCase:
+    TAMANO_BLOQUE = 5000
+
+    def execute(self, file_stream, nombre_archivo: str = '', fecha=None) -> dict:
+        """
+        Ejecuta la validación y devuelve {"filas_leidas", "filas_validas", "errores", "advertencias"}.
+        Las advertencias (líneas repetidas) no impiden importar la fila. La fecha, si se indica,
+        completa las celdas vacías de la columna Fecha.
+        """
+        fecha = datetime.strptime(fecha, '%Y-%m-%d').date() if fecha else None
+        filas_leidas, errores, advertencias = _validar_archivo(file_stream, nombre_archivo, self.TAMANO_BLOQUE, fecha_defecto=fecha)
+        return {
+            "filas_leidas": filas_leidas,
+            "filas_validas": filas_leidas - len(errores),
+            "errores": errores,
+            "advertencias": advertencias
+        }
+
+    def exportar_errores(self, errores: list[dict], advertencias: list[dict] = None):
+        """
+        Genera un archivo Excel con una fila por cada fila inválida del archivo de ventas y, si las
+        hay, una hoja con las advertencias.
+        """
+        libro = Workbook(write_only=True)
+        hoja = libro.create_sheet("Errores")
+        hoja.append(["Fila", "Nombre", "Cantidad", "Errores"])
+        for error in errores:
+            hoja.append([error["fila"], error["nombre"], error["cantidad"], "; ".join(error["errores"])])
+        if advertencias:
+            hoja = libro.create_sheet("Advertencias")
+            hoja.append(["Fila", "Nombre", "Cantidad", "Advertencias"])
+            for advertencia in advertencias:
+                hoja.append([advertencia["fila"], advertencia["nombre"], advertencia["cantidad"], "; ".join(advertencia["advertencias"])])
+        output = io.BytesIO()
+        libro.save(output)
+        output.seek(0)
+        return output
+
 # Caso de uso para importar ventas desde un archivo
 class ImportarVentasUseCase:
-    def __init__(self, repository: IVentaRepository, receta_repository):
+    TAMANO_BLOQUE = 5000
+
+    def __init__(self, repository: IVentaRepository, receta_repository, actualizar_consumo_uc, reconstruir_consumo_uc):
         """
         Inicializa el caso de uso con los repositorios necesarios.
         
         Args:
             repository (IVentaRepository): Repositorio para acceder a los datos de ventas.
             receta_repository: Repositorio para acceder a los datos de recetas.
+            actualizar_consumo_uc: Caso de uso que mantiene el consumo diario materializado.
+            reconstruir_consumo_uc: Caso de uso que recalcula el consumo de un rango de fechas.
         """
         self.repository = repository
         self.receta_repository = receta_repository
+        self.actualizar_consumo_uc = actualizar_consumo_uc
+        self.reconstruir_consumo_uc = reconstruir_consumo_uc
         
-    def execute(self, file_stream, fecha=None):
+    def execute(self, file_stream, fecha=None, nombre_archivo: str = '', reanudar_desde: int = 0,
+                importar_validas: bool = False, forzar: bool = False, recalcular_consumo: bool = False) -> dict:
         """
-        Ejecuta la importación de ventas desde un archivo Excel.
-        Si las recetas no existen, las crea automáticamente.
+        Ejecuta la importación de ventas desde un archivo Excel (.xlsx) o CSV, leyéndolo por bloques.
+        Cada bloque se valida con operaciones por columna, se inserta con una sola sentencia
+        executemany y se confirma por separado, de modo que la memoria no depende del tamaño del
+        archivo. Con reanudar_desde se omiten las primeras filas de datos, ya importadas en un
+        intento anterior. Cada venta se vincula a su receta mediante el índice de nombres
+        normalizados, que se consulta una sola vez (solo id y nombre) y se mantiene en memoria
+        durante toda la importación. Las recetas que no existen se crean automáticamente con una
+        inserción en bloque, en la misma transacción que las ventas del bloque que las usa.
+
+        Sin importar_validas, el archivo se valida completo antes de insertar nada y cualquier error
+        cancela la importación. Con importar_validas se importan las filas válidas y los errores se
+        devuelven en el resumen. Las líneas repetidas se importan siempre y se devuelven como
+        advertencias.
+
+        Cada importación queda registrada con la huella de su contenido y todas sus ventas llevan su
+        importacion_id. Si el archivo ya se importó, se rechaza salvo que se indique forzar; al
+        reanudar, las ventas se añaden a la importación interrumpida del mismo archivo. Si un bloque
+        falla después de haberse confirmado otros, se lanza ImportacionVentasInterrumpidaError con
+        el número de filas de datos ya confirmadas, que es el valor de reanudar_desde para continuar.
+
+        Si el archivo tiene una columna Fecha, cada venta toma la fecha de su fila (las celdas vacías
+        toman la fecha indicada) y todos los días se importan en la misma pasada; si no, todas las
+        ventas toman la fecha indicada o la del día. El resumen incluye los totales de cada día y,
+        con recalcular_consumo, el consumo de las fechas importadas se recalcula desde las ventas.
         """
-        df = pd.read_excel(file_stream)
-        
-        if 'Nombre' not in df.columns or 'Cantidad' not in df.columns:
-            raise ValueError("El archivo debe contener las columnas 'Nombre' y 'Cantidad'")
-            
-        nombres_recetas_archivo = set(df['Nombre'].unique())
-        recetas_existentes = self.receta_repository.obtener_todos()
-        nombres_recetas_db = {r.nombre for r in recetas_existentes}
-        
-        recetas_faltantes = nombres_recetas_archivo - nombres_recetas_db
+        fecha_indicada = datetime.strptime(fecha, '%Y-%m-%d').date() if fecha else None
+        fecha = fecha_indicada or datetime.now().date()
+
+        hash_archivo = _hash_archivo(file_stream)
+        importacion = self.repository.buscar_importacion(hash_archivo)
+        if importacion and not forzar and not reanudar_desde:
+            raise ImportacionDuplicadaError(importacion)
+
+        if not importar_validas:
+            _, errores, _ = _validar_archivo(file_stream, nombre_archivo, self.TAMANO_BLOQUE, reanudar_desde, fecha_indicada)
+            if errores:
+                raise ImportacionVentasError(errores, reanudar_desde)
+            file_stream.seek(0)
+        # La importación se registra al insertar el primer bloque, salvo al reanudar una existente.
+        if not reanudar_desde:
+            importacion = None
+
+        indice_recetas = dict(self.receta_repository.obtener_indice_nombres())
         nuevas_recetas_creadas = []
-        if recetas_faltantes:
-            for nombre_receta in recetas_faltantes:
-                nueva_receta = Receta(nombre=nombre_receta, activa=True)
-                self.receta_repository.crear(nueva_receta)
-                nuevas_recetas_creadas.append(nueva_receta)
-            
-        ventas_a_crear = []
+        filas_leidas = 0
+        ventas_importadas = 0
         errores = []
-        
-        for idx, row in df.iterrows():
-            nombre_receta = row['Nombre']
-            cantidad = row['Cantidad']
-            
-            if not isinstance(cantidad, (int, float)) or cantidad <= 0:
-                errores.append(f"Fila {idx+2}: Cantidad inválida ({cantidad}) para la receta '{nombre_receta}'")
-                continue
-            
-            venta = Venta(
-                receta_nombre=nombre_receta,
-                cantidad=int(cantidad),
-                fecha=fecha or datetime.now().strftime('%Y-%m-%d')
-            )
-            ventas_a_crear.append(venta)
-            
-        if errores:
-            raise ValueError("\n".join(errores))
-            
-        ventas_creadas = self.repository.crear_multiples(ventas_a_crear)
-        return ventas_creadas, nuevas_recetas_creadas
+        advertencias = []
+        totales_por_dia = {}
+        primeras_filas = {}
+        columnas_validadas = False
+        # Filas de datos del archivo, ventas e importación ya confirmadas antes del bloque en curso.
+        filas_confirmadas, ventas_confirmadas, importacion_confirmada = reanudar_desde, 0, importacion
+
+        try:
+            for df in _leer_bloques(file_stream, nombre_archivo, self.TAMANO_BLOQUE):
+                # Todos los bloques anteriores ya se confirmaron.
+                filas_confirmadas = max(filas_leidas, reanudar_desde)
+                ventas_confirmadas, importacion_confirmada = ventas_importadas, importacion
+                if not columnas_validadas:
+                    _comprobar_columnas(df)
+                    columnas_validadas = True
+
+                inicio_bloque = filas_leidas
+                filas_leidas += len(df)
+                if filas_leidas <= reanudar_desde:
+                    continue
+                if inicio_bloque < reanudar_desde:
+                    df = df.iloc[reanudar_desde - inicio_bloque:]
+                    inicio_bloque = reanudar_desde
+
+                nombres, cantidades, fechas, errores_bloque, advertencias_bloque = _validar_bloque(
+                    df, inicio_bloque + 2, primeras_filas, fecha_indicada
+                )
+                errores.extend(errores_bloque)
+                advertencias.extend(advertencias_bloque)
+                if nombres.empty:
+                    continue
+                if fechas is None:
+                    fechas = pd.Series(fecha, index=nombres.index)
+
+                # Solo se normalizan los nombres distintos del bloque, no cada fila.
+                receta_por_nombre = {}
+                recetas_bloque = []
+                for nombre_receta in nombres.unique():
+                    clave = normalizar_nombre(nombre_receta)
+                    if clave not in indice_recetas:
+                        nueva_receta = Receta(nombre=nombre_receta, activa=True, id=str(uuid.uuid4()))
+                        recetas_bloque.append(nueva_receta)
+                        indice_recetas[clave] = nueva_receta.id
+                    receta_por_nombre[nombre_receta] = indice_recetas[clave]
+                receta_ids = nombres.map(receta_por_nombre)
+
+                filas = [
+                    {"receta_nombre": nombre, "receta_id": receta_id, "cantidad": cantidad, "fecha": fecha_venta}
+                    for nombre, receta_id, cantidad, fecha_venta
+                    in zip(nombres.tolist(), receta_ids.tolist(), cantidades.tolist(), fechas.tolist())
+                ]
+                if importacion is None:
+                    # Un archivo con columna Fecha no tiene una única fecha de destino. El registro se
+                    # confirma junto con el primer bloque: si este falla, no queda una importación vacía.
+                    fecha_importacion = fecha if 'Fecha' not in df.columns else fecha_indicada
+                    importacion = self.repository.registrar_importacion(
+                        hash_archivo, nombre_archivo, fecha_importacion, confirmar=False
+                    )
+                ventas_importadas += self.repository.insertar_lote(
+                    filas, importacion["id"], [{"id": r.id, "nombre": r.nombre} for r in recetas_bloque], confirmar=False
+                )
+
+                # El consumo solo depende del total vendido de cada receta en cada fecha. Se aplica en la
+                # misma transacción que el lote, que queda confirmado junto con él.
+                bloque = pd.DataFrame({"fecha": fechas.to_numpy(), "receta_id": receta_ids.to_numpy(), "cantidad": cantidades.to_numpy()})
+                totales = bloque.groupby(["fecha", "receta_id"])["cantidad"].sum()
+                self.actualizar_consumo_uc.execute(ventas_nuevas=[
+                    Venta(receta_nombre='', receta_id=receta_id, cantidad=int(total), fecha=fecha_venta)
+                    for (fecha_venta, receta_id), total in totales.items()
+                ])
+                if recetas_bloque:
+                    # Las recetas ya confirmadas deben verse en el índice compartido de nombres.
+                    self.receta_repository.invalidar_cache()
+                    nuevas_recetas_creadas.extend(recetas_bloque)
+                for fecha_venta, dia in bloque.groupby("fecha")["cantidad"].agg(["size", "sum"]).iterrows():
+                    total_dia = totales_por_dia.setdefault(fecha_venta, {"ventas": 0, "cantidad": 0})
+                    total_dia["ventas"] += int(dia["size"])
+                    total_dia["cantidad"] += int(dia["sum"])
+        except Exception as e:
+            # Los errores de formato anteriores a cualquier bloque confirmado se informan tal cual.
+            if isinstance(e, ValueError) and filas_confirmadas == reanudar_desde:
+                raise
+            raise ImportacionVentasInterrumpidaError(
+                e, filas_confirmadas, importacion_confirmada["id"] if importacion_confirmada else None, ventas_confirmadas
+            ) from e
+
+        if not columnas_validadas:
+            raise ValueError("El archivo no contiene filas")
+
+        consumo_recalculado = None
+        if recalcular_consumo and totales_por_dia:
+            consumo_recalculado = self.reconstruir_consumo_uc.execute(min(totales_por_dia), max(totales_por_dia))
+
+        return {
+            "importacion_id": importacion["id"] if importacion else None,
+            "filas_leidas": filas_leidas,
+            "ventas_importadas": ventas_importadas,
+            "nuevas_recetas": nuevas_recetas_creadas,
+            "errores": errores,
+            "advertencias": advertencias,
+            "dias": [
+                {"fecha": fecha_venta.isoformat(), **totales_por_dia[fecha_venta]}
+                for fecha_venta in sorted(totales_por_dia)
+            ],
+            "consumo_recalculado": consumo_recalculado
+        }
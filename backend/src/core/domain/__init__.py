@@ -1,10 +1,11 @@
 from .area import Area
 from .producto import Producto
-from .receta import Receta, Ingrediente
+from .receta import Receta, Ingrediente, normalizar_nombre
 
 __all__ = [
     "Area",
     "Producto",
     "Receta",
-    "Ingrediente"
+    "Ingrediente",
+    "normalizar_nombre"
 ]
@@ -1,4 +1,5 @@
 from datetime import date
+import json
 
 # Representa un registro del inventario diario para un producto en un área específica.
 class InventarioDiario:
@@ -6,7 +7,8 @@ class InventarioDiario:
                  inicio: float = 0.0, entradas: float = 0.0, consumo: float = 0.0,
                  merma: float = 0.0, otras_salidas: float = 0.0, final_fisico: float = 0.0,
                  final_teorico: float = 0.0, diferencia: float = 0.0,
-                 producto_nombre: str = None, area_nombre: str = None, comentario: str = None):
+                 producto_nombre: str = None, area_nombre: str = None, comentario: str = None,
+                 version: int = 1, unidad_medida: str = None):
         self.id = id
         self.fecha = fecha
         self.area_id = area_id
@@ -21,7 +23,9 @@ class InventarioDiario:
         self.diferencia = diferencia if diferencia is not None else 0.0
         self.producto_nombre = producto_nombre
         self.area_nombre = area_nombre
+        self.unidad_medida = unidad_medida
         self.comentario = comentario
+        self.version = version if version is not None else 1
 
     # Calcula el inventario final teórico y la diferencia con el conteo físico.
     def calcular_diferencias(self):
@@ -29,9 +33,19 @@ class InventarioDiario:
         self.diferencia = self.final_fisico - self.final_teorico
         return self
 
+    # Interpreta el JSON de comentarios por campo; un valor vacío o inválido equivale a sin comentarios.
+    def obtener_comentarios(self) -> dict:
+        if not self.comentario:
+            return {}
+        try:
+            comentarios = json.loads(self.comentario)
+        except (json.JSONDecodeError, TypeError):
+            return {}
+        return comentarios if isinstance(comentarios, dict) else {}
+
     # Convierte el objeto de dominio a un diccionario para la serialización.
-    def to_dict(self):
-        return {
+    def to_dict(self, incluir_comentarios: bool = False):
+        datos = {
             "id": self.id,
             "fecha": self.fecha.isoformat(),
             "area_id": self.area_id,
@@ -46,5 +60,10 @@ class InventarioDiario:
             "diferencia": self.diferencia,
             "producto_nombre": self.producto_nombre,
             "area_nombre": self.area_nombre,
-            "comentario": self.comentario
+            "unidad_medida": self.unidad_medida,
+            "comentario": self.comentario,
+            "version": self.version
         }
+        if incluir_comentarios:
+            datos["comentarios"] = self.obtener_comentarios()
+        return datos
@@ -0,0 +1,35 @@
+# Matriz dispersa de materiales (BOM) de las recetas: receta × (producto, área).
+class MatrizBOM:
+    def __init__(self, filas: dict[str, list[tuple[str, float]]] = None):
+        """
+        Inicializa la matriz a partir de sus filas ya compiladas.
+
+        Args:
+            filas (dict): Para cada ID de receta, la lista de pares
+                (clave "producto_id|area_id", cantidad por unidad vendida).
+        """
+        self.filas = filas or {}
+
+    @classmethod
+    def desde_ingredientes(cls, ingredientes):
+        """
+        Compila la matriz a partir de tuplas (receta, producto_id, area_id, cantidad).
+        Las entradas repetidas para una misma clave se acumulan en una sola celda.
+        """
+        celdas = {}
+        for receta, producto_id, area_id, cantidad in ingredientes:
+            fila = celdas.setdefault(receta, {})
+            clave = f"{producto_id}|{area_id}"
+            fila[clave] = fila.get(clave, 0) + cantidad
+        return cls({receta: list(fila.items()) for receta, fila in celdas.items()})
+
+    def multiplicar(self, ventas_por_receta: dict[str, float]) -> dict[str, float]:
+        """
+        Multiplica el vector de ventas agrupadas por receta por la matriz.
+        Devuelve el consumo total indexado por "producto_id|area_id".
+        """
+        consumo = {}
+        for receta, cantidad_vendida in ventas_por_receta.items():
+            for clave, cantidad in self.filas.get(receta, ()):
+                consumo[clave] = consumo.get(clave, 0) + cantidad_vendida * cantidad
+        return consumo
@@ -1,14 +1,16 @@
 class Producto:
-    def __init__(self, nombre: str, unidad_medida: str, id: str = None):
+    def __init__(self, nombre: str, unidad_medida: str, id: str = None, modificado_en=None):
         self.id = id
         self.nombre = nombre
         self.unidad_medida = unidad_medida
+        self.modificado_en = modificado_en
         
     def to_dict(self):
         return {
             "id": self.id,
             "nombre": self.nombre,
-            "unidad_medida": self.unidad_medida
+            "unidad_medida": self.unidad_medida,
+            "modificado_en": self.modificado_en.isoformat() if self.modificado_en else None
         }
         
     @classmethod
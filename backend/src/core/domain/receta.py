@@ -1,6 +1,18 @@
+import unicodedata
+
+def normalizar_nombre(nombre: str) -> str:
+    """
+    Normaliza un nombre de receta para compararlo sin distinguir mayúsculas, acentos ni espacios.
+    Por ejemplo, "  Café   con leche" y "CAFE CON LECHE" producen la misma clave.
+    """
+    sin_acentos = ''.join(
+        c for c in unicodedata.normalize('NFKD', str(nombre)) if not unicodedata.combining(c)
+    )
+    return ' '.join(sin_acentos.upper().split())
+
 # Define el modelo de dominio para una Receta
 class Receta:
-    def __init__(self, nombre: str, activa: bool = True, id: str = None):
+    def __init__(self, nombre: str, activa: bool = True, id: str = None, modificado_en=None):
         """
         Inicializa una instancia de Receta.
         
@@ -8,10 +20,12 @@ class Receta:
             nombre (str): El nombre de la receta.
             activa (bool): Indica si la receta está activa. Por defecto es True.
             id (str, optional): El identificador único de la receta. Se genera automáticamente.
+            modificado_en (datetime, optional): Fecha de la última creación o modificación. La asigna la base de datos.
         """
         self.id = id
         self.nombre = nombre
         self.activa = activa
+        self.modificado_en = modificado_en
         self.ingredientes = []  # Lista para almacenar objetos de tipo Ingrediente
 
     def to_dict(self):
@@ -20,6 +34,7 @@ class Receta:
             "id": self.id,
             "nombre": self.nombre,
             "activa": self.activa,
+            "modificado_en": self.modificado_en.isoformat() if self.modificado_en else None,
             "ingredientes": [ing.to_dict() for ing in self.ingredientes]
         }
 
@@ -37,7 +52,8 @@ class Receta:
 
 # Define el modelo de dominio para un Ingrediente
 class Ingrediente:
-    def __init__(self, producto_id: str, area_id: str, cantidad: float, id: str = None, receta_id: str = None):
+    def __init__(self, producto_id: str, area_id: str, cantidad: float, id: str = None, receta_id: str = None,
+                 producto_nombre: str = None, unidad_medida: str = None, area_nombre: str = None):
         """
         Inicializa una instancia de Ingrediente.
         
@@ -47,21 +63,36 @@ class Ingrediente:
             cantidad (float): La cantidad de producto utilizada.
             id (str, optional): El identificador único del ingrediente. Se genera automáticamente.
             receta_id (str, optional): El ID de la receta a la que pertenece.
+            producto_nombre (str, optional): Nombre del producto, si se cargó junto con la receta.
+            unidad_medida (str, optional): Unidad de medida del producto, si se cargó junto con la receta.
+            area_nombre (str, optional): Nombre del área, si se cargó junto con la receta.
         """
         self.id = id
         self.producto_id = producto_id
         self.area_id = area_id
         self.cantidad = cantidad
         self.receta_id = receta_id
+        self.producto_nombre = producto_nombre
+        self.unidad_medida = unidad_medida
+        self.area_nombre = area_nombre
 
     def to_dict(self):
-        """Convierte la instancia de Ingrediente a un diccionario."""
-        return {
+        """
+        Convierte la instancia de Ingrediente a un diccionario.
+        Los nombres del producto y del área solo se incluyen si se cargaron.
+        """
+        data = {
             "id": self.id,
             "producto_id": self.producto_id,
             "area_id": self.area_id,
             "cantidad": self.cantidad
         }
+        if self.producto_nombre is not None:
+            data["producto_nombre"] = self.producto_nombre
+            data["unidad_medida"] = self.unidad_medida
+        if self.area_nombre is not None:
+            data["area_nombre"] = self.area_nombre
+        return data
 
     @classmethod
     def from_dict(cls, data: dict):
@@ -1,14 +1,17 @@
 class Venta:
-    def __init__(self, receta_nombre: str, cantidad: int, fecha: str, id: str = None):
+    def __init__(self, receta_nombre: str, cantidad: int, fecha: str, id: str = None, receta_id: str = None):
         self.id = id
         self.receta_nombre = receta_nombre
         self.cantidad = cantidad
         self.fecha = fecha
+        # Receta a la que se resolvió el nombre; None si ninguna receta coincide.
+        self.receta_id = receta_id
         
     def to_dict(self):
         return {
             "id": self.id,
             "receta_nombre": self.receta_nombre,
+            "receta_id": self.receta_id,
             "cantidad": self.cantidad,
             "fecha": self.fecha
         }
@@ -19,5 +22,6 @@ class Venta:
             receta_nombre=data["receta_nombre"],
             cantidad=data["cantidad"],
             fecha=data.get("fecha"),
-            id=data.get("id")
+            id=data.get("id"),
+            receta_id=data.get("receta_id")
         )
@@ -33,6 +33,12 @@ from src.infrastructure.repositories.sqlite_venta_repository import SQLiteVentaR
 from src.application.use_cases.venta_use_cases import (
     CrearVentaUseCase,
     ObtenerVentasUseCase,
+    ContarVentasUseCase,
+    ObtenerVentasDiariasUseCase,
+    ReconstruirVentasDiariasUseCase,
+    ObtenerImportacionesVentasUseCase,
+    DeshacerImportacionVentasUseCase,
+    ValidarImportacionVentasUseCase,
     ObtenerVentaPorIdUseCase,
     ActualizarVentaUseCase,
     EliminarVentaUseCase,
@@ -42,13 +48,25 @@ from src.application.use_cases.venta_use_cases import (
 from src.infrastructure.repositories.sqlite_inventario_diario_repository import SQLiteInventarioDiarioRepository
 from src.application.use_cases.inventario_diario_use_cases import (
     ObtenerEstadoInventarioDiarioUseCase,
+    ObtenerEstadoComparadoUseCase,
     CalcularConsumoUseCase,
+    CalcularConsumoRangoUseCase,
+    ActualizarConsumoDiarioUseCase,
+    RecalcularConsumoRecetaUseCase,
+    ReconstruirConsumoDiarioUseCase,
+    ObtenerSaldosActualesUseCase,
+    VerificarSaldosUseCase,
+    PropagarCierreInventarioUseCase,
     GuardarInventarioDiarioUseCase,
+    GuardarCambiosInventarioDiarioUseCase,
     ObtenerModelosIPVUseCase,
     GuardarModeloIPVUseCase,
     ObtenerRegistrosIPVUseCase,
-    GenerarReporteIPVUseCase
+    GenerarReporteIPVUseCase,
+    GenerarReportePeriodoIPVUseCase,
+    ExportarReporteIPVExcel
 )
+from src.infrastructure.repositories.sqlite_consumo_diario_repository import SQLiteConsumoDiarioRepository
 from src.infrastructure.repositories.sqlite_historial_repository import SQLiteHistorialRepository
 from src.application.use_cases.historial_use_cases import (
     RegistrarCambioUseCase,
@@ -88,10 +106,35 @@ class Container(containers.DeclarativeContainer):
         db_session=db_session
     )
 
+    consumo_diario_repository = providers.Factory(
+        SQLiteConsumoDiarioRepository,
+        db_session=db_session
+    )
+
     historial_repository = providers.Factory(
         SQLiteHistorialRepository,
         db_session=db_session
     )
+
+    # Casos de uso para el consumo diario materializado
+    actualizar_consumo_diario_uc = providers.Factory(
+        ActualizarConsumoDiarioUseCase,
+        consumo_repository=consumo_diario_repository,
+        receta_repository=receta_repository
+    )
+
+    recalcular_consumo_receta_uc = providers.Factory(
+        RecalcularConsumoRecetaUseCase,
+        venta_repository=venta_repository,
+        consumo_repository=consumo_diario_repository
+    )
+
+    reconstruir_consumo_diario_uc = providers.Factory(
+        ReconstruirConsumoDiarioUseCase,
+        venta_repository=venta_repository,
+        consumo_repository=consumo_diario_repository,
+        receta_repository=receta_repository
+    )
     
     # Casos de uso para Productos
     crear_producto_uc = providers.Factory(
@@ -162,7 +205,8 @@ class Container(containers.DeclarativeContainer):
     crear_receta_uc = providers.Factory(
         CrearRecetaUseCase,
         repository=receta_repository,
-        registrar_cambio_uc=providers.Factory(RegistrarCambioUseCase, repository=providers.Factory(SQLiteHistorialRepository, db_session=db_session))
+        registrar_cambio_uc=providers.Factory(RegistrarCambioUseCase, repository=providers.Factory(SQLiteHistorialRepository, db_session=db_session)),
+        recalcular_consumo_uc=recalcular_consumo_receta_uc
     )
 
     obtener_recetas_uc = providers.Factory(
@@ -178,13 +222,15 @@ class Container(containers.DeclarativeContainer):
     actualizar_receta_uc = providers.Factory(
         ActualizarRecetaUseCase,
         repository=receta_repository,
-        registrar_cambio_uc=providers.Factory(RegistrarCambioUseCase, repository=providers.Factory(SQLiteHistorialRepository, db_session=db_session))
+        registrar_cambio_uc=providers.Factory(RegistrarCambioUseCase, repository=providers.Factory(SQLiteHistorialRepository, db_session=db_session)),
+        recalcular_consumo_uc=recalcular_consumo_receta_uc
     )
 
     eliminar_receta_uc = providers.Factory(
         EliminarRecetaUseCase,
         repository=receta_repository,
-        registrar_cambio_uc=providers.Factory(RegistrarCambioUseCase, repository=providers.Factory(SQLiteHistorialRepository, db_session=db_session))
+        registrar_cambio_uc=providers.Factory(RegistrarCambioUseCase, repository=providers.Factory(SQLiteHistorialRepository, db_session=db_session)),
+        recalcular_consumo_uc=recalcular_consumo_receta_uc
     )
 
     importar_recetas_uc = providers.Factory(
@@ -194,22 +240,23 @@ class Container(containers.DeclarativeContainer):
 
     export_recetas_excel = providers.Factory(
         ExportRecetasExcel,
-        repository=receta_repository,
-        producto_repository=producto_repository,
-        area_repository=area_repository
+        repository=receta_repository
     )
 
     import_recetas_excel = providers.Factory(
         ImportRecetasExcel,
         repository=receta_repository,
         producto_repository=producto_repository,
-        area_repository=area_repository
+        area_repository=area_repository,
+        reconstruir_consumo_uc=reconstruir_consumo_diario_uc
     )
 
     # Casos de uso para Ventas
     crear_venta_uc = providers.Factory(
         CrearVentaUseCase,
-        repository=venta_repository
+        repository=venta_repository,
+        receta_repository=receta_repository,
+        actualizar_consumo_uc=actualizar_consumo_diario_uc
     )
 
     obtener_ventas_uc = providers.Factory(
@@ -217,6 +264,21 @@ class Container(containers.DeclarativeContainer):
         repository=venta_repository
     )
 
+    contar_ventas_uc = providers.Factory(
+        ContarVentasUseCase,
+        repository=venta_repository
+    )
+
+    obtener_ventas_diarias_uc = providers.Factory(
+        ObtenerVentasDiariasUseCase,
+        repository=venta_repository
+    )
+
+    reconstruir_ventas_diarias_uc = providers.Factory(
+        ReconstruirVentasDiariasUseCase,
+        repository=venta_repository
+    )
+
     obtener_venta_por_id_uc = providers.Factory(
         ObtenerVentaPorIdUseCase,
         repository=venta_repository
@@ -224,23 +286,44 @@ class Container(containers.DeclarativeContainer):
 
     actualizar_venta_uc = providers.Factory(
         ActualizarVentaUseCase,
-        repository=venta_repository
+        repository=venta_repository,
+        receta_repository=receta_repository,
+        actualizar_consumo_uc=actualizar_consumo_diario_uc
     )
 
     eliminar_venta_uc = providers.Factory(
         EliminarVentaUseCase,
-        repository=venta_repository
+        repository=venta_repository,
+        actualizar_consumo_uc=actualizar_consumo_diario_uc
+    )
+
+    validar_importacion_ventas_uc = providers.Factory(
+        ValidarImportacionVentasUseCase
     )
 
     importar_ventas_uc = providers.Factory(
         ImportarVentasUseCase,
         repository=venta_repository,
-        receta_repository=receta_repository
+        receta_repository=receta_repository,
+        actualizar_consumo_uc=actualizar_consumo_diario_uc,
+        reconstruir_consumo_uc=reconstruir_consumo_diario_uc
+    )
+
+    obtener_importaciones_ventas_uc = providers.Factory(
+        ObtenerImportacionesVentasUseCase,
+        repository=venta_repository
+    )
+
+    deshacer_importacion_ventas_uc = providers.Factory(
+        DeshacerImportacionVentasUseCase,
+        repository=venta_repository,
+        actualizar_consumo_uc=actualizar_consumo_diario_uc
     )
 
     eliminar_ventas_multiples_uc = providers.Factory(
         EliminarVentasMultiplesUseCase,
-        repository=venta_repository
+        repository=venta_repository,
+        actualizar_consumo_uc=actualizar_consumo_diario_uc
     )
 
     # Casos de uso para Inventario Diario
@@ -251,15 +334,48 @@ class Container(containers.DeclarativeContainer):
         area_repository=area_repository
     )
 
+    obtener_estado_comparado_uc = providers.Factory(
+        ObtenerEstadoComparadoUseCase,
+        inventario_repository=inventario_diario_repository,
+        producto_repository=producto_repository,
+        area_repository=area_repository
+    )
+
     calcular_consumo_uc = providers.Factory(
         CalcularConsumoUseCase,
-        venta_repository=venta_repository,
-        receta_repository=receta_repository
+        consumo_repository=consumo_diario_repository
+    )
+
+    calcular_consumo_rango_uc = providers.Factory(
+        CalcularConsumoRangoUseCase,
+        consumo_repository=consumo_diario_repository
+    )
+
+    obtener_saldos_actuales_uc = providers.Factory(
+        ObtenerSaldosActualesUseCase,
+        inventario_repository=inventario_diario_repository
+    )
+
+    verificar_saldos_uc = providers.Factory(
+        VerificarSaldosUseCase,
+        inventario_repository=inventario_diario_repository
+    )
+
+    propagar_cierre_inventario_uc = providers.Factory(
+        PropagarCierreInventarioUseCase,
+        inventario_repository=inventario_diario_repository
     )
 
     guardar_inventario_diario_uc = providers.Factory(
         GuardarInventarioDiarioUseCase,
-        inventario_repository=inventario_diario_repository
+        inventario_repository=inventario_diario_repository,
+        propagar_cierre_uc=propagar_cierre_inventario_uc
+    )
+
+    guardar_cambios_inventario_diario_uc = providers.Factory(
+        GuardarCambiosInventarioDiarioUseCase,
+        inventario_repository=inventario_diario_repository,
+        propagar_cierre_uc=propagar_cierre_inventario_uc
     )
 
     obtener_modelos_ipv_uc = providers.Factory(
@@ -284,6 +400,16 @@ class Container(containers.DeclarativeContainer):
         producto_repository=producto_repository
     )
 
+    generar_reporte_periodo_ipv_uc = providers.Factory(
+        GenerarReportePeriodoIPVUseCase,
+        inventario_repository=inventario_diario_repository
+    )
+
+    exportar_reporte_ipv_excel = providers.Factory(
+        ExportarReporteIPVExcel,
+        inventario_repository=inventario_diario_repository
+    )
+
     # Casos de uso para Historial
     registrar_cambio_uc = providers.Factory(
         RegistrarCambioUseCase,
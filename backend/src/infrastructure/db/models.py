@@ -14,6 +14,10 @@ class Producto(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
     nombre = db.Column(db.String(100), unique=True, nullable=False)
     unidad_medida = db.Column(db.String(10), nullable=False)  # Ej: kg, g, l, unidades
+    # Fecha de la última creación o modificación, para ordenar por recencia sin consultar el historial.
+    modificado_en = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+    __table_args__ = (db.Index('idx_producto_modificado', 'modificado_en'),)
 
 # Modelo para las áreas del restaurante (ej: Cocina, Bar).
 class Area(db.Model):
@@ -28,9 +32,13 @@ class Receta(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
     nombre = db.Column(db.String(100), unique=True, nullable=False)
     activa = db.Column(db.Boolean, default=True)
+    # Fecha de la última creación o modificación, para ordenar por recencia sin consultar el historial.
+    modificado_en = db.Column(db.DateTime, default=db.func.current_timestamp())
     # Relación uno a muchos con los ingredientes de la receta.
     ingredientes = db.relationship('Ingrediente', back_populates='receta', cascade="all, delete-orphan")
 
+    __table_args__ = (db.Index('idx_receta_modificado', 'modificado_en'),)
+
 # Modelo para los ingredientes que componen una receta.
 class Ingrediente(db.Model):
     __tablename__ = 'ingredientes'
@@ -62,11 +70,66 @@ class Venta(db.Model):
     __tablename__ = 'ventas'
     id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
     receta_nombre = db.Column(db.String(100), nullable=False)
+    # Receta resuelta a partir del nombre normalizado; el consumo se calcula a través de esta clave.
+    receta_id = db.Column(db.String(36), db.ForeignKey('recetas.id'), nullable=True)
     cantidad = db.Column(db.Integer, nullable=False)
     fecha = db.Column(db.Date, nullable=False, default=db.func.current_date())
+    # Importación de la que proviene la venta; None si se registró manualmente.
+    importacion_id = db.Column(db.String(36), db.ForeignKey('importaciones_ventas.id'), nullable=True)
     
-    # Índice para acelerar las búsquedas por fecha.
-    __table_args__ = (db.Index('idx_venta_fecha', 'fecha'),)
+    # Índice para acelerar las búsquedas por fecha y la paginación ordenada por (fecha, id).
+    __table_args__ = (
+        db.Index('idx_venta_fecha', 'fecha', 'id'),
+        db.Index('idx_venta_receta', 'receta_id'),
+        db.Index('idx_venta_importacion', 'importacion_id'),
+    )
+
+# Modelo para el registro de cada archivo de ventas importado.
+class ImportacionVentas(db.Model):
+    __tablename__ = 'importaciones_ventas'
+    id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
+    # Huella SHA-256 del contenido del archivo, para detectar archivos ya importados.
+    hash_archivo = db.Column(db.String(64), nullable=False)
+    nombre_archivo = db.Column(db.String(255))
+    fecha = db.Column(db.Date, nullable=True)
+    filas = db.Column(db.Integer, nullable=False, default=0)
+    creado_en = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+    # Índice para buscar importaciones por el contenido del archivo.
+    __table_args__ = (db.Index('idx_importacion_hash', 'hash_archivo'),)
+
+# Modelo para el total vendido de cada receta por día, acumulado a partir de las ventas.
+class VentaDiaria(db.Model):
+    __tablename__ = 'ventas_diarias'
+    id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
+    fecha = db.Column(db.Date, nullable=False)
+    receta_id = db.Column(db.String(36), db.ForeignKey('recetas.id'), nullable=False)
+    cantidad_total = db.Column(db.Integer, nullable=False, default=0)
+
+    # Restricciones y índices de la tabla.
+    __table_args__ = (
+        # Un único total por fecha y receta; también sirve para las búsquedas por rango de fechas.
+        db.UniqueConstraint('fecha', 'receta_id', name='_venta_diaria_fecha_receta_uc'),
+        # Índice para acelerar los totales por fecha de una receta.
+        db.Index('idx_venta_diaria_receta', 'receta_id', 'fecha'),
+    )
+
+# Modelo para el consumo diario de productos por área, materializado a partir de las ventas.
+class ConsumoDiario(db.Model):
+    __tablename__ = 'consumo_diario'
+    id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
+    fecha = db.Column(db.Date, nullable=False)
+    area_id = db.Column(db.String(36), db.ForeignKey('areas.id'), nullable=False)
+    producto_id = db.Column(db.String(36), db.ForeignKey('productos.id'), nullable=False)
+    cantidad = db.Column(db.Float, nullable=False, default=0.0)
+
+    # Restricciones y índices de la tabla.
+    __table_args__ = (
+        # Un único acumulado por producto, área y fecha.
+        db.UniqueConstraint('fecha', 'area_id', 'producto_id', name='_consumo_fecha_area_producto_uc'),
+        # Índice para acelerar las búsquedas por fecha.
+        db.Index('idx_consumo_fecha', 'fecha'),
+    )
 
 # Modelo para el registro del inventario diario (IPV).
 class InventarioDiario(db.Model):
@@ -84,6 +147,8 @@ class InventarioDiario(db.Model):
     final_teorico = db.Column(db.Float, default=0.0)
     diferencia = db.Column(db.Float, default=0.0)
     comentario = db.Column(db.Text, nullable=True)
+    # Versión de la fila, incrementada en cada escritura para detectar ediciones concurrentes.
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
 
     # Relaciones para acceder al área y producto asociados.
     area = db.relationship('Area')
@@ -95,6 +160,22 @@ class InventarioDiario(db.Model):
         db.UniqueConstraint('fecha', 'area_id', 'producto_id', name='_fecha_area_producto_uc'),
         # Índice para acelerar las búsquedas por fecha.
         db.Index('idx_inventario_fecha', 'fecha'),
+        # Índice para localizar el último cierre de cada producto y área anterior a una fecha.
+        db.Index('idx_inventario_area_producto_fecha', 'area_id', 'producto_id', 'fecha'),
+    )
+
+# Modelo para el saldo actual de cada producto por área: el final físico del último día registrado.
+class SaldoActual(db.Model):
+    __tablename__ = 'saldo_actual'
+    id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
+    area_id = db.Column(db.String(36), db.ForeignKey('areas.id'), nullable=False)
+    producto_id = db.Column(db.String(36), db.ForeignKey('productos.id'), nullable=False)
+    fecha = db.Column(db.Date, nullable=False)
+    saldo = db.Column(db.Float, nullable=False, default=0.0)
+
+    # Un único saldo por producto y área.
+    __table_args__ = (
+        db.UniqueConstraint('area_id', 'producto_id', name='_saldo_area_producto_uc'),
     )
 
 # Modelo para definir qué productos se incluyen en el inventario de cada área.
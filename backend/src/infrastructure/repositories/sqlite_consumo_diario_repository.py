@@ -0,0 +1,118 @@
+from datetime import date
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from src.infrastructure.db.models import ConsumoDiario as ConsumoDiarioModel, generate_uuid
+
+# Diferencia por debajo de la cual un acumulado se considera cero y se elimina.
+_TOLERANCIA_CERO = 1e-9
+
+# Repositorio para la tabla materializada de consumo diario por producto y área.
+class SQLiteConsumoDiarioRepository:
+    def __init__(self, db_session: Session):
+        self.db_session = db_session
+
+    # Confirma la transacción en curso o, con confirmar=False, solo envía los cambios a la base de datos.
+    def _confirmar(self, confirmar: bool):
+        if confirmar:
+            self.db_session.commit()
+        else:
+            self.db_session.flush()
+
+    # Obtiene el consumo de una fecha indexado por "producto_id|area_id".
+    def find_by_date(self, fecha: date) -> dict[str, float]:
+        filas = self.db_session.query(
+            ConsumoDiarioModel.producto_id,
+            ConsumoDiarioModel.area_id,
+            ConsumoDiarioModel.cantidad
+        ).filter(ConsumoDiarioModel.fecha == fecha).all()
+        return {f"{producto_id}|{area_id}": cantidad for producto_id, area_id, cantidad in filas}
+
+    # Obtiene el consumo de un rango de fechas, total o desglosado por día.
+    def find_by_range(self, desde: date, hasta: date, por_dia: bool = False) -> dict:
+        if por_dia:
+            filas = self.db_session.query(
+                ConsumoDiarioModel.fecha,
+                ConsumoDiarioModel.producto_id,
+                ConsumoDiarioModel.area_id,
+                ConsumoDiarioModel.cantidad
+            ).filter(ConsumoDiarioModel.fecha >= desde, ConsumoDiarioModel.fecha <= hasta).all()
+            consumo_por_dia = {}
+            for fecha, producto_id, area_id, cantidad in filas:
+                consumo_por_dia.setdefault(fecha.isoformat(), {})[f"{producto_id}|{area_id}"] = cantidad
+            return consumo_por_dia
+
+        filas = self.db_session.query(
+            ConsumoDiarioModel.producto_id,
+            ConsumoDiarioModel.area_id,
+            func.sum(ConsumoDiarioModel.cantidad)
+        ).filter(
+            ConsumoDiarioModel.fecha >= desde, ConsumoDiarioModel.fecha <= hasta
+        ).group_by(ConsumoDiarioModel.producto_id, ConsumoDiarioModel.area_id).all()
+        return {f"{producto_id}|{area_id}": cantidad for producto_id, area_id, cantidad in filas}
+
+    # Suma los incrementos de consumo {fecha: {"producto_id|area_id": delta}} a los acumulados existentes
+    # y confirma la transacción, incluidas las escrituras pendientes en la misma sesión (ventas, recetas).
+    # Con confirmar=False los cambios solo se envían a la base de datos y la transacción queda abierta.
+    def aplicar_deltas(self, deltas: dict[date, dict[str, float]], confirmar: bool = True):
+        filas = [
+            {
+                "id": generate_uuid(),
+                "fecha": fecha,
+                "producto_id": clave.split('|')[0],
+                "area_id": clave.split('|')[1],
+                "cantidad": delta
+            }
+            for fecha, consumo in deltas.items()
+            for clave, delta in consumo.items()
+            if delta
+        ]
+        try:
+            if not filas:
+                self._confirmar(confirmar)
+                return
+
+            stmt = sqlite_insert(ConsumoDiarioModel.__table__)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['fecha', 'area_id', 'producto_id'],
+                set_={"cantidad": ConsumoDiarioModel.cantidad + stmt.excluded.cantidad}
+            )
+            self.db_session.execute(stmt, filas)
+            # Los acumulados que vuelven a cero (p. ej. al eliminar ventas) no se conservan.
+            self.db_session.query(ConsumoDiarioModel).filter(
+                ConsumoDiarioModel.fecha.in_(list(deltas.keys())),
+                func.abs(ConsumoDiarioModel.cantidad) < _TOLERANCIA_CERO
+            ).delete(synchronize_session=False)
+            self._confirmar(confirmar)
+        except Exception as e:
+            self.db_session.rollback()
+            raise e
+
+    # Sustituye el consumo materializado de un rango de fechas (o solo de esas fechas) por el consumo recalculado.
+    def reemplazar_rango(self, desde: date, hasta: date, consumo_por_dia: dict[str, dict[str, float]], fechas: set = None):
+        try:
+            query = self.db_session.query(ConsumoDiarioModel).filter(
+                ConsumoDiarioModel.fecha >= desde, ConsumoDiarioModel.fecha <= hasta
+            )
+            if fechas:
+                query = query.filter(ConsumoDiarioModel.fecha.in_(fechas))
+            query.delete(synchronize_session=False)
+
+            filas = [
+                {
+                    "id": generate_uuid(),
+                    "fecha": date.fromisoformat(fecha),
+                    "producto_id": clave.split('|')[0],
+                    "area_id": clave.split('|')[1],
+                    "cantidad": cantidad
+                }
+                for fecha, consumo in consumo_por_dia.items()
+                for clave, cantidad in consumo.items()
+            ]
+            if filas:
+                self.db_session.execute(ConsumoDiarioModel.__table__.insert(), filas)
+            self.db_session.commit()
+            return len(filas)
+        except Exception as e:
+            self.db_session.rollback()
+            raise e
@@ -1,15 +1,42 @@
-from datetime import date, timedelta
-from sqlalchemy.orm import Session, joinedload, lazyload
+from datetime import date
+from sqlalchemy import and_, bindparam, case, func, select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
 from src.core.domain.inventario_diario import InventarioDiario
 from src.infrastructure.db.models import InventarioDiario as InventarioDiarioModel, ModeloIPV as ModeloIPVModel
+from src.infrastructure.db.models import SaldoActual as SaldoActualModel, generate_uuid
 from src.infrastructure.db.models import Producto as ProductoModel
 from src.infrastructure.db.models import Area as AreaModel
 
+# Filas por lote en los upserts; cada lote se envía como un executemany de una sentencia precompilada.
+_UPSERT_CHUNK = 500
+
+# Diferencia mínima para considerar desactualizado el inicio de un registro.
+_TOLERANCIA = 1e-9
+
+# Columnas que se sobrescriben cuando el registro ya existe.
+_CAMPOS_ACTUALIZABLES = (
+    'inicio', 'entradas', 'consumo', 'merma', 'otras_salidas',
+    'final_fisico', 'final_teorico', 'diferencia', 'comentario'
+)
+
+# Columnas propias que se leen al construir objetos de dominio.
+_CAMPOS_LECTURA = ('id', 'fecha', 'area_id', 'producto_id', 'version') + _CAMPOS_ACTUALIZABLES
+
 # Repositorio para gestionar los datos del inventario diario en la base de datos SQLite.
 class SQLiteInventarioDiarioRepository:
     def __init__(self, db_session: Session):
         self.db_session = db_session
 
+    # Confirma la transacción en curso o, con confirmar=False, solo envía los cambios a la base de datos
+    # para que el paso siguiente (la propagación a los días posteriores) los confirme junto con los suyos.
+    def _confirmar(self, confirmar: bool):
+        if confirmar:
+            self.db_session.commit()
+        else:
+            self.db_session.flush()
+
     # Busca un registro de inventario por fecha, área y producto.
     def find_by_date_area_producto(self, fecha: date, area_id: str, producto_id: str) -> InventarioDiario | None:
         model = self.db_session.query(InventarioDiarioModel).filter_by(
@@ -17,49 +44,405 @@ class SQLiteInventarioDiarioRepository:
         ).first()
         return self._to_domain(model) if model else None
 
-    # Obtiene todos los registros de inventario para una fecha específica.
-    def find_by_date(self, fecha: date) -> list[InventarioDiarioModel]:
-        return self.db_session.query(InventarioDiarioModel).options(
-            lazyload(InventarioDiarioModel.producto),
-            lazyload(InventarioDiarioModel.area)
-        ).filter_by(fecha=fecha).all()
+    # Obtiene todos los registros de inventario para una fecha específica, con los nombres
+    # de producto y área resueltos en la misma consulta.
+    def find_by_date(self, fecha: date) -> list[InventarioDiario]:
+        return self.find_by_dates([fecha])
+
+    # Obtiene con una sola consulta todos los registros de inventario de varias fechas.
+    def find_by_dates(self, fechas: list[date]) -> list[InventarioDiario]:
+        filas = self._consulta_con_nombres().filter(InventarioDiarioModel.fecha.in_(fechas)).all()
+        return [self._fila_a_dominio(fila) for fila in filas]
 
     # Encuentra todas las fechas únicas de los registros de inventario.
     def find_all_dates(self) -> list[date]:
         return [result[0] for result in self.db_session.query(InventarioDiarioModel.fecha).distinct().order_by(InventarioDiarioModel.fecha.desc()).all()]
 
-    # Obtiene el inventario físico final del día anterior para un producto y área.
-    def get_inicio_from_previous_day(self, fecha: date, area_id: str, producto_id: str) -> float:
-        dia_anterior = fecha - timedelta(days=1)
-        model = self.db_session.query(InventarioDiarioModel).filter_by(
-            fecha=dia_anterior, area_id=area_id, producto_id=producto_id
-        ).first()
-        return model.final_fisico if model else 0.0
-
-    # Guarda o actualiza una lista de registros de inventario diario.
-    def save_all(self, inventarios: list[InventarioDiario]):
-        for domain_obj in inventarios:
-            model = self.db_session.query(InventarioDiarioModel).filter_by(
-                fecha=domain_obj.fecha, area_id=domain_obj.area_id, producto_id=domain_obj.producto_id
-            ).first()
-
-            if model:
-                # Actualiza el modelo existente.
-                model.inicio = domain_obj.inicio
-                model.entradas = domain_obj.entradas
-                model.consumo = domain_obj.consumo
-                model.merma = domain_obj.merma
-                model.otras_salidas = domain_obj.otras_salidas
-                model.final_fisico = domain_obj.final_fisico
-                model.final_teorico = domain_obj.final_teorico
-                model.diferencia = domain_obj.diferencia
-                model.comentario = domain_obj.comentario
-            else:
-                # Crea un nuevo modelo si no existe.
-                model = self._to_model(domain_obj)
-                self.db_session.add(model)
-        
-        self.db_session.commit()
+    # Obtiene, con una sola consulta, el inventario físico final más reciente anterior a una fecha
+    # para cada par (área, producto). Si falta el día anterior se arrastra el último cierre registrado.
+    def get_finales_anteriores(self, fecha: date) -> dict[tuple[str, str], float]:
+        return {
+            (str(area_id), str(producto_id)): final_fisico or 0.0
+            for area_id, producto_id, _, final_fisico in self._ultimos_cierres(fecha)
+        }
+
+    # Obtiene los saldos iniciales para una fecha nueva. Si la fecha es posterior a todos los saldos
+    # registrados basta con leer la tabla saldo_actual; al editar el pasado se consulta el historial.
+    def get_saldos_iniciales(self, fecha: date) -> dict[tuple[str, str], float]:
+        ultima_fecha = self.db_session.query(func.max(SaldoActualModel.fecha)).scalar()
+        if ultima_fecha is None or ultima_fecha >= fecha:
+            return self.get_finales_anteriores(fecha)
+        return {
+            (str(area_id), str(producto_id)): saldo
+            for area_id, producto_id, saldo in self.db_session.query(
+                SaldoActualModel.area_id, SaldoActualModel.producto_id, SaldoActualModel.saldo
+            ).all()
+        }
+
+    # Obtiene las existencias actuales de cada producto por área, opcionalmente filtradas por área.
+    def get_saldos_actuales(self, area_id: str = None) -> list[dict]:
+        query = self.db_session.query(
+            SaldoActualModel.area_id,
+            AreaModel.nombre,
+            SaldoActualModel.producto_id,
+            ProductoModel.nombre,
+            ProductoModel.unidad_medida,
+            SaldoActualModel.fecha,
+            SaldoActualModel.saldo
+        ).join(AreaModel, AreaModel.id == SaldoActualModel.area_id).join(
+            ProductoModel, ProductoModel.id == SaldoActualModel.producto_id
+        )
+        if area_id:
+            query = query.filter(SaldoActualModel.area_id == area_id)
+        return [
+            {
+                "area_id": area_id,
+                "area_nombre": area_nombre,
+                "producto_id": producto_id,
+                "producto_nombre": producto_nombre,
+                "unidad_medida": unidad_medida,
+                "fecha": fecha.isoformat(),
+                "saldo": saldo
+            }
+            for area_id, area_nombre, producto_id, producto_nombre, unidad_medida, fecha, saldo
+            in query.order_by(AreaModel.nombre, ProductoModel.nombre).all()
+        ]
+
+    # Compara la tabla saldo_actual con el último cierre del historial y, si se pide, la reconstruye.
+    def verificar_saldos(self, reparar: bool = False) -> dict:
+        esperados = {
+            (str(area_id), str(producto_id)): (fecha, final_fisico or 0.0)
+            for area_id, producto_id, fecha, final_fisico in self._ultimos_cierres()
+        }
+        actuales = {
+            (str(area_id), str(producto_id)): (fecha, saldo)
+            for area_id, producto_id, fecha, saldo in self.db_session.query(
+                SaldoActualModel.area_id, SaldoActualModel.producto_id, SaldoActualModel.fecha, SaldoActualModel.saldo
+            ).all()
+        }
+
+        discrepancias = []
+        for clave in esperados.keys() | actuales.keys():
+            esperado, actual = esperados.get(clave), actuales.get(clave)
+            if esperado and actual and esperado[0] == actual[0] and abs(esperado[1] - actual[1]) <= _TOLERANCIA:
+                continue
+            discrepancias.append({
+                "area_id": clave[0],
+                "producto_id": clave[1],
+                "esperado": {"fecha": esperado[0].isoformat(), "saldo": esperado[1]} if esperado else None,
+                "actual": {"fecha": actual[0].isoformat(), "saldo": actual[1]} if actual else None
+            })
+
+        if reparar and discrepancias:
+            try:
+                self.db_session.query(SaldoActualModel).delete(synchronize_session=False)
+                if esperados:
+                    self.db_session.execute(SaldoActualModel.__table__.insert(), [
+                        {"id": generate_uuid(), "area_id": area_id, "producto_id": producto_id, "fecha": fecha, "saldo": saldo}
+                        for (area_id, producto_id), (fecha, saldo) in esperados.items()
+                    ])
+                self.db_session.commit()
+            except Exception as e:
+                self.db_session.rollback()
+                raise e
+
+        return {
+            "registros": len(esperados),
+            "discrepancias": discrepancias,
+            "reparado": bool(reparar and discrepancias)
+        }
+
+    # Recorre los registros de un rango de fechas ordenados por área, fecha y producto, leyendo la
+    # consulta por bloques para que la memoria no crezca con el tamaño del rango.
+    def iterar_rango(self, desde: date, hasta: date, bloque: int = 1000):
+        consulta = self._consulta_con_nombres().filter(
+            InventarioDiarioModel.fecha >= desde, InventarioDiarioModel.fecha <= hasta
+        ).order_by(AreaModel.nombre, InventarioDiarioModel.fecha, ProductoModel.nombre).yield_per(bloque)
+        for fila in consulta:
+            yield self._fila_a_dominio(fila)
+
+    # Agrega en SQL los faltantes (diferencias negativas), sobrantes (diferencias positivas) y mermas
+    # de cada producto por área en un rango de fechas.
+    def resumen_por_periodo(self, desde: date, hasta: date) -> list[dict]:
+        diferencia = InventarioDiarioModel.diferencia
+        filas = self.db_session.query(
+            InventarioDiarioModel.area_id,
+            AreaModel.nombre,
+            InventarioDiarioModel.producto_id,
+            ProductoModel.nombre,
+            ProductoModel.unidad_medida,
+            func.sum(case((diferencia < 0, -diferencia), else_=0.0)),
+            func.sum(case((diferencia > 0, diferencia), else_=0.0)),
+            func.sum(InventarioDiarioModel.merma),
+            func.count(InventarioDiarioModel.id)
+        ).join(
+            AreaModel, AreaModel.id == InventarioDiarioModel.area_id
+        ).join(
+            ProductoModel, ProductoModel.id == InventarioDiarioModel.producto_id
+        ).filter(
+            InventarioDiarioModel.fecha >= desde, InventarioDiarioModel.fecha <= hasta
+        ).group_by(
+            InventarioDiarioModel.area_id, InventarioDiarioModel.producto_id
+        ).order_by(AreaModel.nombre, ProductoModel.nombre).all()
+
+        return [
+            {
+                "area_id": area_id,
+                "area": area_nombre,
+                "producto_id": producto_id,
+                "producto": producto_nombre,
+                "um": unidad_medida,
+                "faltante": faltante or 0.0,
+                "sobrante": sobrante or 0.0,
+                "merma": merma or 0.0,
+                "dias": dias
+            }
+            for area_id, area_nombre, producto_id, producto_nombre, unidad_medida, faltante, sobrante, merma, dias in filas
+        ]
+
+    # Obtiene el último cierre (área, producto, fecha, final físico) de cada par, anterior a una fecha si se indica.
+    def _ultimos_cierres(self, fecha: date = None) -> list[tuple]:
+        ultimas_fechas = self.db_session.query(
+            InventarioDiarioModel.area_id,
+            InventarioDiarioModel.producto_id,
+            func.max(InventarioDiarioModel.fecha).label('fecha')
+        )
+        if fecha is not None:
+            ultimas_fechas = ultimas_fechas.filter(InventarioDiarioModel.fecha < fecha)
+        ultimas_fechas = ultimas_fechas.group_by(InventarioDiarioModel.area_id, InventarioDiarioModel.producto_id).subquery()
+
+        return self.db_session.query(
+            InventarioDiarioModel.area_id,
+            InventarioDiarioModel.producto_id,
+            InventarioDiarioModel.fecha,
+            InventarioDiarioModel.final_fisico
+        ).join(
+            ultimas_fechas,
+            and_(
+                InventarioDiarioModel.area_id == ultimas_fechas.c.area_id,
+                InventarioDiarioModel.producto_id == ultimas_fechas.c.producto_id,
+                InventarioDiarioModel.fecha == ultimas_fechas.c.fecha
+            )
+        ).all()
+
+    # Actualiza, dentro de la transacción en curso, el saldo de los pares cuyos registros son
+    # iguales o más recientes que el saldo guardado. No confirma la transacción.
+    def _actualizar_saldos(self, filas: list[dict]):
+        if not filas:
+            return
+        tabla = SaldoActualModel.__table__
+        upsert = sqlite_insert(tabla)
+        upsert = upsert.on_conflict_do_update(
+            index_elements=['area_id', 'producto_id'],
+            set_={"fecha": upsert.excluded.fecha, "saldo": upsert.excluded.saldo},
+            where=tabla.c.fecha <= upsert.excluded.fecha
+        )
+        # Si el lote trae varias fechas de un mismo par solo interesa la más reciente.
+        ultimas = {}
+        for fila in sorted(filas, key=lambda f: f["fecha"]):
+            ultimas[(fila["area_id"], fila["producto_id"])] = fila
+        self.db_session.execute(upsert, [
+            {
+                "id": generate_uuid(),
+                "area_id": fila["area_id"],
+                "producto_id": fila["producto_id"],
+                "fecha": fila["fecha"],
+                "saldo": fila["final_fisico"] or 0.0
+            }
+            for fila in ultimas.values()
+        ])
+
+    # Guarda o actualiza una lista de registros de inventario diario con upserts por lotes
+    # (INSERT ... ON CONFLICT sobre _fecha_area_producto_uc) dentro de una única transacción, que con
+    # confirmar=False queda abierta.
+    def save_all(self, inventarios: list[InventarioDiario], confirmar: bool = True) -> dict[str, int]:
+        # Un mismo lote no puede tocar dos veces la misma fila: prevalece la última aparición.
+        por_clave = {(i.fecha, i.area_id, i.producto_id): i for i in inventarios}
+        filas = [self._to_row(i) for i in por_clave.values()]
+        claves = list(por_clave.keys())
+
+        upsert = sqlite_insert(InventarioDiarioModel.__table__)
+        upsert = upsert.on_conflict_do_update(
+            index_elements=['fecha', 'area_id', 'producto_id'],
+            set_={
+                **{campo: upsert.excluded[campo] for campo in _CAMPOS_ACTUALIZABLES},
+                "version": InventarioDiarioModel.__table__.c.version + 1
+            }
+        )
+
+        insertados = 0
+        actualizados = 0
+        try:
+            for inicio in range(0, len(filas), _UPSERT_CHUNK):
+                lote = filas[inicio:inicio + _UPSERT_CHUNK]
+                existentes = self.db_session.query(func.count(InventarioDiarioModel.id)).filter(
+                    tuple_(
+                        InventarioDiarioModel.fecha,
+                        InventarioDiarioModel.area_id,
+                        InventarioDiarioModel.producto_id
+                    ).in_(claves[inicio:inicio + _UPSERT_CHUNK])
+                ).scalar()
+
+                self.db_session.execute(upsert, lote)
+
+                actualizados += existentes
+                insertados += len(lote) - existentes
+
+            self._actualizar_saldos(filas)
+            self._confirmar(confirmar)
+        except Exception as e:
+            self.db_session.rollback()
+            raise e
+
+        return {"insertados": insertados, "actualizados": actualizados}
+
+    # Obtiene con una sola consulta los registros identificados por (fecha, área, producto).
+    def find_by_keys(self, claves: list[tuple[date, str, str]]) -> list[InventarioDiario]:
+        registros = []
+        for inicio in range(0, len(claves), _UPSERT_CHUNK):
+            filas = self._consulta_con_nombres().filter(
+                tuple_(
+                    InventarioDiarioModel.fecha,
+                    InventarioDiarioModel.area_id,
+                    InventarioDiarioModel.producto_id
+                ).in_(claves[inicio:inicio + _UPSERT_CHUNK])
+            ).all()
+            registros.extend(self._fila_a_dominio(fila) for fila in filas)
+        return registros
+
+    # Aplica cambios parciales con bloqueo optimista: cada fila solo se actualiza si conserva la
+    # versión leída. Si alguna fila cambió entretanto no se guarda nada y se devuelve False. Con
+    # confirmar=False la transacción queda abierta.
+    def save_changes(self, actualizados: list[InventarioDiario], nuevos: list[InventarioDiario],
+                     confirmar: bool = True) -> bool:
+        tabla = InventarioDiarioModel.__table__
+        update = tabla.update().where(
+            tabla.c.id == bindparam('b_id'),
+            tabla.c.version == bindparam('b_version')
+        ).values(
+            **{campo: bindparam(f"b_{campo}") for campo in _CAMPOS_ACTUALIZABLES},
+            version=tabla.c.version + 1
+        )
+        try:
+            if actualizados:
+                filas = [
+                    {
+                        "b_id": r.id,
+                        "b_version": r.version,
+                        **{f"b_{campo}": getattr(r, campo) for campo in _CAMPOS_ACTUALIZABLES}
+                    }
+                    for r in actualizados
+                ]
+                resultado = self.db_session.execute(update, filas)
+                if resultado.rowcount != len(filas):
+                    self.db_session.rollback()
+                    return False
+            if nuevos:
+                self.db_session.execute(tabla.insert(), [self._to_row(r) for r in nuevos])
+            self._actualizar_saldos([self._to_row(r) for r in actualizados + nuevos])
+            self._confirmar(confirmar)
+        except IntegrityError:
+            # Otro terminal creó la misma fila (fecha, área, producto) mientras tanto.
+            self.db_session.rollback()
+            return False
+        except Exception as e:
+            self.db_session.rollback()
+            raise e
+
+        for registro in actualizados:
+            registro.version += 1
+        for registro in nuevos:
+            registro.version = 1
+        return True
+
+    # Recalcula hacia adelante, con sentencias masivas, los días posteriores a una fecha: el inicio de cada
+    # registro pasa a ser el final físico del registro anterior del mismo producto y área, y se recalculan
+    # el final teórico y la diferencia. Sin claves se propagan todos los pares registrados en esa fecha.
+    # Con confirmar=True (por defecto) confirma la transacción en curso, incluidos los cambios que el
+    # guardado del día dejó pendientes; con confirmar=False la deja abierta.
+    def propagar_desde(self, fecha: date, claves: list[tuple[str, str]] = None, confirmar: bool = True) -> dict:
+        tabla = InventarioDiarioModel.__table__
+        previo = tabla.alias('previo')
+
+        final_anterior = select(previo.c.final_fisico).where(
+            previo.c.area_id == tabla.c.area_id,
+            previo.c.producto_id == tabla.c.producto_id,
+            previo.c.fecha < tabla.c.fecha
+        ).order_by(previo.c.fecha.desc()).limit(1).scalar_subquery()
+
+        if claves is None:
+            pares = select(previo.c.area_id, previo.c.producto_id).where(previo.c.fecha == fecha)
+        else:
+            pares = [tuple(clave) for clave in claves]
+
+        condicion = and_(
+            tabla.c.fecha > fecha,
+            tuple_(tabla.c.area_id, tabla.c.producto_id).in_(pares),
+            func.abs(tabla.c.inicio - final_anterior) > _TOLERANCIA
+        )
+
+        try:
+            dias = []
+            if claves is None or pares:
+                dias = self.db_session.execute(
+                    select(tabla.c.fecha, func.count()).where(condicion).group_by(tabla.c.fecha).order_by(tabla.c.fecha)
+                ).all()
+            if not dias:
+                self._confirmar(confirmar)
+                return {"dias_afectados": [], "registros_actualizados": 0}
+
+            final_teorico = final_anterior + tabla.c.entradas - tabla.c.consumo - tabla.c.merma - tabla.c.otras_salidas
+            resultado = self.db_session.execute(
+                tabla.update().where(condicion).values(
+                    inicio=final_anterior,
+                    final_teorico=final_teorico,
+                    diferencia=tabla.c.final_fisico - final_teorico,
+                    version=tabla.c.version + 1
+                )
+            )
+            self._confirmar(confirmar)
+        except Exception as e:
+            self.db_session.rollback()
+            raise e
+
+        return {
+            "dias_afectados": [{"fecha": dia.isoformat(), "registros": total} for dia, total in dias],
+            "registros_actualizados": resultado.rowcount
+        }
+
+    # Consulta por columnas de los registros junto con el nombre y la unidad del producto y el nombre del
+    # área; evita cargar instancias ORM y las consultas perezosas por cada relación.
+    def _consulta_con_nombres(self):
+        return self.db_session.query(
+            *(InventarioDiarioModel.__table__.c[campo] for campo in _CAMPOS_LECTURA),
+            ProductoModel.nombre.label('producto_nombre'),
+            ProductoModel.unidad_medida.label('unidad_medida'),
+            AreaModel.nombre.label('area_nombre')
+        ).outerjoin(
+            ProductoModel, ProductoModel.id == InventarioDiarioModel.producto_id
+        ).outerjoin(
+            AreaModel, AreaModel.id == InventarioDiarioModel.area_id
+        )
+
+    # Convierte una fila de _consulta_con_nombres en un objeto de dominio.
+    def _fila_a_dominio(self, fila) -> InventarioDiario:
+        return InventarioDiario(
+            **{campo: getattr(fila, campo) for campo in _CAMPOS_LECTURA},
+            producto_nombre=fila.producto_nombre or "Producto no encontrado",
+            unidad_medida=fila.unidad_medida,
+            area_nombre=fila.area_nombre or "Área no encontrada"
+        )
+
+    # Convierte un objeto de dominio en los valores de una fila para inserciones por lotes.
+    def _to_row(self, domain_obj: InventarioDiario) -> dict:
+        fila = {campo: getattr(domain_obj, campo) for campo in _CAMPOS_ACTUALIZABLES}
+        fila.update(
+            id=domain_obj.id,
+            fecha=domain_obj.fecha,
+            area_id=domain_obj.area_id,
+            producto_id=domain_obj.producto_id
+        )
+        return fila
 
     # Convierte un modelo de base de datos a un objeto de dominio.
     def _to_domain(self, model: InventarioDiarioModel) -> InventarioDiario:
@@ -79,6 +462,7 @@ class SQLiteInventarioDiarioRepository:
             final_teorico=model.final_teorico,
             diferencia=model.diferencia,
             comentario=model.comentario,
+            version=model.version,
             producto_nombre=model.producto.nombre if model.producto else "Producto no encontrado",
             area_nombre=model.area.nombre if model.area else "Área no encontrada"
         )
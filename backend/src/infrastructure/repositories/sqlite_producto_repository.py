@@ -7,6 +7,16 @@ class SQLiteProductoRepository(IProductoRepository):
     def __init__(self, db_session):
         """Inicializa el repositorio con una sesión de base de datos."""
         self.db_session = db_session
+
+    @staticmethod
+    def _a_dominio(producto_db) -> Producto:
+        """Mapea un modelo de producto a objeto de dominio."""
+        return Producto(
+            id=str(producto_db.id),
+            nombre=producto_db.nombre,
+            unidad_medida=producto_db.unidad_medida,
+            modificado_en=producto_db.modificado_en
+        )
         
     def crear(self, producto: Producto) -> Producto:
         """Crea un nuevo producto en la base de datos."""
@@ -18,11 +28,7 @@ class SQLiteProductoRepository(IProductoRepository):
             self.db_session.add(producto_db)
             self.db_session.commit()
             # Retorna el objeto de dominio con el ID asignado por la BD
-            return Producto(
-                id=str(producto_db.id),
-                nombre=producto_db.nombre,
-                unidad_medida=producto_db.unidad_medida
-            )
+            return self._a_dominio(producto_db)
         except Exception as e:
             self.db_session.rollback()
             raise e
@@ -32,16 +38,12 @@ class SQLiteProductoRepository(IProductoRepository):
         producto_db = self.db_session.query(db_models.Producto).filter_by(nombre=nombre).first()
         if not producto_db:
             return None
-        return Producto(
-            id=str(producto_db.id),
-            nombre=producto_db.nombre,
-            unidad_medida=producto_db.unidad_medida
-        )
+        return self._a_dominio(producto_db)
 
     def obtener_todos(self, sort_by: str = 'nombre') -> list[Producto]:
         """Obtiene todos los productos de la base de datos."""
         if sort_by == 'modificado':
-            query = self.db_session.query(db_models.Producto).outerjoin(db_models.HistorialCambios, db_models.Producto.id == db_models.HistorialCambios.entidad_id).order_by(db_models.HistorialCambios.fecha_cambio.desc())
+            query = self.db_session.query(db_models.Producto).order_by(db_models.Producto.modificado_en.desc())
         elif sort_by == 'nombre':
             query = self.db_session.query(db_models.Producto).order_by(db_models.Producto.nombre)
         else:
@@ -49,13 +51,7 @@ class SQLiteProductoRepository(IProductoRepository):
 
         productos_db = query.all()
         # Mapea los resultados de la BD a objetos de dominio
-        return [
-            Producto(
-                id=str(p.id),
-                nombre=p.nombre,
-                unidad_medida=p.unidad_medida
-            ) for p in productos_db
-        ]
+        return [self._a_dominio(p) for p in productos_db]
     
     def obtener_por_id(self, id: str) -> Producto:
         """Obtiene un producto por su ID."""
@@ -63,11 +59,7 @@ class SQLiteProductoRepository(IProductoRepository):
         if not producto_db:
             return None
         # Mapea el resultado a un objeto de dominio
-        return Producto(
-            id=str(producto_db.id),
-            nombre=producto_db.nombre,
-            unidad_medida=producto_db.unidad_medida
-        )
+        return self._a_dominio(producto_db)
     
     def actualizar(self, producto: Producto) -> Producto:
         """Actualiza un producto existente en la base de datos."""
@@ -78,13 +70,10 @@ class SQLiteProductoRepository(IProductoRepository):
                 
             producto_db.nombre = producto.nombre
             producto_db.unidad_medida = producto.unidad_medida
+            producto_db.modificado_en = db_models.db.func.current_timestamp()
             self.db_session.commit()
             # Retorna el objeto de dominio actualizado
-            return Producto(
-                id=str(producto_db.id),
-                nombre=producto_db.nombre,
-                unidad_medida=producto_db.unidad_medida
-            )
+            return self._a_dominio(producto_db)
         except Exception as e:
             self.db_session.rollback()
             raise e
@@ -1,17 +1,98 @@
-from src.core.domain import Receta, Ingrediente
+import threading
+from sqlalchemy.orm import selectinload
+from src.core.domain import Area, Producto, Receta, Ingrediente, normalizar_nombre
+from src.core.domain.matriz_bom import MatrizBOM
 from src.application.use_cases.receta_use_cases import IRecetaRepository
 from src.infrastructure.db import models as db_models
 
 # Implementación del repositorio de recetas para SQLite
 class SQLiteRecetaRepository(IRecetaRepository):
+    # Matriz BOM compilada, compartida entre instancias y descartada al modificar recetas.
+    _matriz_bom = None
+    # Índice {nombre normalizado: id de receta}, con el mismo ciclo de vida que la matriz BOM.
+    _indice_nombres = None
+    # La caché se comparte entre los hilos del servidor: el candado protege su lectura y escritura,
+    # y la versión, que aumenta con cada invalidación, evita guardar una caché construida con
+    # datos anteriores a la última modificación.
+    _cache_lock = threading.Lock()
+    _cache_version = 0
+
     def __init__(self, db_session):
         """Inicializa el repositorio con una sesión de base de datos."""
         self.db_session = db_session
+
+    @classmethod
+    def _invalidar_matriz_bom(cls):
+        """Descarta la matriz BOM y el índice de nombres para que se reconstruyan en la próxima consulta."""
+        with cls._cache_lock:
+            cls._cache_version += 1
+            cls._matriz_bom = None
+            cls._indice_nombres = None
+
+    @classmethod
+    def _leer_cache(cls, atributo: str) -> tuple:
+        """Devuelve el valor en caché (o None) junto con la versión de la caché en que se leyó."""
+        with cls._cache_lock:
+            return getattr(cls, atributo), cls._cache_version
+
+    @classmethod
+    def _guardar_cache(cls, atributo: str, valor, version: int):
+        """Guarda un valor recién construido solo si la caché no se invalidó mientras se construía."""
+        with cls._cache_lock:
+            if cls._cache_version == version:
+                setattr(cls, atributo, valor)
+
+    def invalidar_cache(self):
+        """Descarta la matriz BOM y el índice de nombres tras cambios hechos fuera del repositorio."""
+        self._invalidar_matriz_bom()
+
+    def _confirmar(self, confirmar: bool):
+        """
+        Confirma la transacción y descarta la caché o, con confirmar=False, solo envía los cambios a la
+        base de datos: quien confirma la transacción debe llamar después a invalidar_cache.
+        """
+        if confirmar:
+            self.db_session.commit()
+            self._invalidar_matriz_bom()
+        else:
+            self.db_session.flush()
+
+    @staticmethod
+    def _a_dominio(receta_db, detallar: bool = False) -> Receta:
+        """
+        Mapea un modelo de receta a objeto de dominio. Con detallar, cada ingrediente incluye el
+        nombre y la unidad del producto y el nombre del área (deben venir precargados).
+        """
+        receta = Receta(
+            nombre=receta_db.nombre,
+            activa=receta_db.activa,
+            id=str(receta_db.id),
+            modificado_en=receta_db.modificado_en
+        )
+        receta.ingredientes = [
+            SQLiteRecetaRepository._ingrediente_a_dominio(ing, detallar) for ing in receta_db.ingredientes
+        ]
+        return receta
+
+    @staticmethod
+    def _ingrediente_a_dominio(ing, detallar: bool = False) -> Ingrediente:
+        """Mapea un modelo de ingrediente a objeto de dominio, con los nombres si se pide detallar."""
+        return Ingrediente(
+            producto_id=str(ing.producto_id),
+            area_id=str(ing.area_id),
+            cantidad=ing.cantidad,
+            id=str(ing.id),
+            receta_id=str(ing.receta_id),
+            producto_nombre=ing.producto.nombre if detallar else None,
+            unidad_medida=ing.producto.unidad_medida if detallar else None,
+            area_nombre=ing.area.nombre if detallar else None
+        )
         
-    def crear(self, receta: Receta) -> Receta:
+    def crear(self, receta: Receta, confirmar: bool = True) -> Receta:
         """
         Crea una nueva receta en la base de datos.
-        Maneja la creación de la receta y sus ingredientes asociados de forma transaccional.
+        Maneja la creación de la receta y sus ingredientes asociados de forma transaccional; con
+        confirmar=False la transacción queda abierta.
         """
         try:
             # Mapeo del objeto de dominio a modelo de base de datos
@@ -32,10 +113,11 @@ class SQLiteRecetaRepository(IRecetaRepository):
                 )
                 self.db_session.add(ingrediente_db)
                 
-            self.db_session.commit()
+            self._confirmar(confirmar)
             
             # Actualiza el objeto de dominio con los IDs generados por la base de datos
             receta.id = str(receta_db.id)
+            receta.modificado_en = receta_db.modificado_en
             for i, ingrediente_db in enumerate(receta_db.ingredientes):
                 receta.ingredientes[i].id = str(ingrediente_db.id)
                 
@@ -44,43 +126,33 @@ class SQLiteRecetaRepository(IRecetaRepository):
             self.db_session.rollback()  # Revertir cambios en caso de error
             raise e
     
-    def obtener_todos(self, sort_by: str = 'nombre', filter_by: str = None) -> list[Receta]:
+    def obtener_todos(self, sort_by: str = 'nombre', filter_by: str = None, detallar: bool = False) -> list[Receta]:
         """
         Obtiene todas las recetas de la base de datos y las convierte a objetos de dominio.
+        Los ingredientes (y, con detallar, sus productos y áreas) se cargan con una consulta
+        adicional por relación en lugar de una por receta.
         """
         try:
-            query = self.db_session.query(db_models.Receta)
+            carga_ingredientes = selectinload(db_models.Receta.ingredientes)
+            opciones = [carga_ingredientes]
+            if detallar:
+                opciones = [
+                    carga_ingredientes.selectinload(db_models.Ingrediente.producto),
+                    carga_ingredientes.selectinload(db_models.Ingrediente.area)
+                ]
+            query = self.db_session.query(db_models.Receta).options(*opciones)
 
             if filter_by == 'sin_ingredientes':
                 query = query.outerjoin(db_models.Ingrediente).filter(db_models.Ingrediente.id == None)
 
             if sort_by == 'modificado':
-                query = query.outerjoin(db_models.HistorialCambios, db_models.Receta.id == db_models.HistorialCambios.entidad_id).order_by(db_models.HistorialCambios.fecha_cambio.desc())
+                query = query.order_by(db_models.Receta.modificado_en.desc())
             elif sort_by == 'nombre':
                 query = query.order_by(db_models.Receta.nombre)
             else:
                 query = query.order_by(db_models.Receta.id.desc())
 
-            recetas_db = query.all()
-            recetas = []
-            for receta_db in recetas_db:
-                # Mapeo del modelo de base de datos a objeto de dominio
-                receta = Receta(
-                    nombre=receta_db.nombre,
-                    activa=receta_db.activa,
-                    id=str(receta_db.id)
-                )
-                receta.ingredientes = [
-                    Ingrediente(
-                        producto_id=str(ing.producto_id),
-                        area_id=str(ing.area_id),
-                        cantidad=ing.cantidad,
-                        id=str(ing.id),
-                        receta_id=str(ing.receta_id)
-                    ) for ing in receta_db.ingredientes
-                ]
-                recetas.append(receta)
-            return recetas
+            return [self._a_dominio(receta_db, detallar) for receta_db in query.all()]
         except Exception as e:
             raise e
 
@@ -99,6 +171,7 @@ class SQLiteRecetaRepository(IRecetaRepository):
             
             self.db_session.add_all(recetas_db)
             self.db_session.commit()
+            self._invalidar_matriz_bom()
             
             for i, receta_db in enumerate(recetas_db):
                 recetas[i].id = str(receta_db.id)
@@ -107,9 +180,51 @@ class SQLiteRecetaRepository(IRecetaRepository):
         except Exception as e:
             self.db_session.rollback()
             raise e
-    def obtener_por_id(self, id: str) -> Receta:
+
+    def crear_lote(self, recetas: list[Receta], productos_nuevos: list[Producto] = None,
+                   areas_nuevas: list[Area] = None) -> int:
+        """
+        Inserta en bloque, con una sentencia executemany por tabla y en una sola transacción, los
+        productos y áreas nuevos y las recetas con sus ingredientes. Todos los objetos deben traer
+        su ID asignado. Devuelve el número de ingredientes insertados.
+        """
+        ingredientes = [
+            {
+                "id": db_models.generate_uuid(),
+                "receta_id": receta.id,
+                "producto_id": ingrediente.producto_id,
+                "area_id": ingrediente.area_id,
+                "cantidad": ingrediente.cantidad
+            }
+            for receta in recetas
+            for ingrediente in receta.ingredientes
+        ]
+        try:
+            if productos_nuevos:
+                self.db_session.execute(db_models.Producto.__table__.insert(), [
+                    {"id": p.id, "nombre": p.nombre, "unidad_medida": p.unidad_medida} for p in productos_nuevos
+                ])
+            if areas_nuevas:
+                self.db_session.execute(db_models.Area.__table__.insert(), [
+                    {"id": a.id, "nombre": a.nombre, "codigo": a.codigo} for a in areas_nuevas
+                ])
+            if recetas:
+                self.db_session.execute(db_models.Receta.__table__.insert(), [
+                    {"id": r.id, "nombre": r.nombre, "activa": r.activa} for r in recetas
+                ])
+            if ingredientes:
+                self.db_session.execute(db_models.Ingrediente.__table__.insert(), ingredientes)
+            self.db_session.commit()
+            self._invalidar_matriz_bom()
+            return len(ingredientes)
+        except Exception as e:
+            self.db_session.rollback()
+            raise e
+
+    def obtener_por_id(self, id: str, detallar: bool = False) -> Receta:
         """
         Obtiene una receta específica por su ID y la convierte a un objeto de dominio.
+        Con detallar, cada ingrediente incluye los nombres de su producto y su área.
         """
         try:
             receta_db = self.db_session.query(db_models.Receta).get(id)
@@ -117,60 +232,75 @@ class SQLiteRecetaRepository(IRecetaRepository):
                 return None
                 
             # Mapeo del modelo de base de datos a objeto de dominio
-            receta = Receta(
-                nombre=receta_db.nombre,
-                activa=receta_db.activa,
-                id=str(receta_db.id)
-            )
-            receta.ingredientes = [
-                Ingrediente(
-                    producto_id=str(ing.producto_id),
-                    area_id=str(ing.area_id),
-                    cantidad=ing.cantidad,
-                    id=str(ing.id),
-                    receta_id=str(ing.receta_id)
-                ) for ing in receta_db.ingredientes
-            ]
-            return receta
+            return self._a_dominio(receta_db, detallar)
         except Exception as e:
             raise e
     
-    def actualizar(self, receta: Receta) -> Receta:
+    def actualizar(self, receta: Receta, confirmar: bool = True) -> tuple[Receta, list[tuple[Ingrediente, Ingrediente]]]:
         """
         Actualiza una receta existente en la base de datos.
-        Elimina los ingredientes antiguos y los reemplaza con los nuevos.
+        Los ingredientes se comparan con los guardados por (producto_id, area_id): los que cambian
+        de cantidad se actualizan en su lugar y solo se insertan o eliminan los que se agregan o
+        quitan, de modo que los que siguen conservan su ID. Si un mismo producto y área aparece
+        varias veces, sus cantidades se suman. Devuelve la receta tal como quedó guardada junto con
+        los cambios de ingredientes como pares (anterior, nuevo) detallados, con None en el lado
+        que no existe; (None, []) si la receta no existe. Con confirmar=False la transacción queda abierta.
         """
         try:
             receta_db = self.db_session.query(db_models.Receta).get(receta.id)
             if not receta_db:
-                return None
+                return None, []
                 
             receta_db.nombre = receta.nombre
             receta_db.activa = receta.activa
+            receta_db.modificado_en = db_models.db.func.current_timestamp()
             
-            # Estrategia de actualización: eliminar y volver a crear ingredientes
-            self.db_session.query(db_models.Ingrediente).filter_by(receta_id=receta.id).delete()
-            
+            cantidades = {}
             for ingrediente in receta.ingredientes:
-                ingrediente_db = db_models.Ingrediente(
-                    receta_id=receta.id,
-                    producto_id=ingrediente.producto_id,
-                    area_id=ingrediente.area_id,
-                    cantidad=ingrediente.cantidad
-                )
-                self.db_session.add(ingrediente_db)
-                
-            self.db_session.commit()
+                clave = (str(ingrediente.producto_id), str(ingrediente.area_id))
+                cantidades[clave] = cantidades.get(clave, 0) + float(ingrediente.cantidad)
+
+            existentes = {}
+            cambios = []
+            for ingrediente_db in list(receta_db.ingredientes):
+                clave = (str(ingrediente_db.producto_id), str(ingrediente_db.area_id))
+                anterior = self._ingrediente_a_dominio(ingrediente_db, detallar=True)
+                if clave not in cantidades or clave in existentes:
+                    # La relación elimina en cascada los ingredientes que se quitan de la receta.
+                    receta_db.ingredientes.remove(ingrediente_db)
+                    cambios.append((anterior, None))
+                    continue
+                existentes[clave] = ingrediente_db
+                if ingrediente_db.cantidad != cantidades[clave]:
+                    ingrediente_db.cantidad = cantidades[clave]
+                    cambios.append((anterior, self._ingrediente_a_dominio(ingrediente_db, detallar=True)))
+
+            agregados = []
+            for (producto_id, area_id), cantidad in cantidades.items():
+                if (producto_id, area_id) not in existentes:
+                    ingrediente_db = db_models.Ingrediente(
+                        producto_id=producto_id,
+                        area_id=area_id,
+                        cantidad=cantidad
+                    )
+                    receta_db.ingredientes.append(ingrediente_db)
+                    agregados.append(ingrediente_db)
+
+            # Tras el flush, los agregados tienen ID y resuelven su producto y área.
+            self.db_session.flush()
+            cambios.extend((None, self._ingrediente_a_dominio(i, detallar=True)) for i in agregados)
+            self._confirmar(confirmar)
             
-            return receta
+            return self._a_dominio(receta_db), cambios
         except Exception as e:
             self.db_session.rollback()
             raise e
     
-    def eliminar(self, id: str) -> bool:
+    def eliminar(self, id: str, confirmar: bool = True) -> bool:
         """
         Elimina una receta de la base de datos por su ID.
-        La eliminación de ingredientes se maneja en cascada por la configuración de la BD.
+        La eliminación de ingredientes se maneja en cascada por la configuración de la BD. Con
+        confirmar=False la transacción queda abierta.
         """
         try:
             receta_db = self.db_session.query(db_models.Receta).get(id)
@@ -178,7 +308,7 @@ class SQLiteRecetaRepository(IRecetaRepository):
                 return False
                 
             self.db_session.delete(receta_db)
-            self.db_session.commit()
+            self._confirmar(confirmar)
             return True
         except Exception as e:
             self.db_session.rollback()
@@ -195,20 +325,77 @@ class SQLiteRecetaRepository(IRecetaRepository):
                 return None
             
             # Mapeo del modelo de base de datos a objeto de dominio
-            receta = Receta(
-                nombre=receta_db.nombre,
-                activa=receta_db.activa,
-                id=str(receta_db.id)
-            )
-            receta.ingredientes = [
-                Ingrediente(
-                    producto_id=str(ing.producto_id),
-                    area_id=str(ing.area_id),
-                    cantidad=ing.cantidad,
-                    id=str(ing.id),
-                    receta_id=str(ing.receta_id)
-                ) for ing in receta_db.ingredientes
-            ]
-            return receta
+            return self._a_dominio(receta_db)
         except Exception as e:
             raise e
+
+    def iterar_filas_exportacion(self, bloque: int = 1000):
+        """
+        Recorre el recetario con una sola consulta sobre recetas, ingredientes, productos y áreas,
+        leída por bloques. El orden es estable (receta y, dentro de ella, producto e ingrediente) para
+        que dos exportaciones del mismo recetario coincidan. Devuelve una tupla (receta, producto,
+        unidad de medida, cantidad, área) por ingrediente, y una con los datos del ingrediente en None
+        para cada receta sin ingredientes.
+        """
+        consulta = self.db_session.query(
+            db_models.Receta.nombre,
+            db_models.Producto.nombre,
+            db_models.Producto.unidad_medida,
+            db_models.Ingrediente.cantidad,
+            db_models.Area.nombre,
+            db_models.Ingrediente.id
+        ).outerjoin(
+            db_models.Ingrediente, db_models.Ingrediente.receta_id == db_models.Receta.id
+        ).outerjoin(
+            db_models.Producto, db_models.Producto.id == db_models.Ingrediente.producto_id
+        ).outerjoin(
+            db_models.Area, db_models.Area.id == db_models.Ingrediente.area_id
+        ).order_by(
+            db_models.Receta.nombre,
+            db_models.Receta.id,
+            db_models.Producto.nombre,
+            db_models.Ingrediente.id
+        ).yield_per(bloque)
+        for receta, producto, unidad_medida, cantidad, area, ingrediente_id in consulta:
+            if ingrediente_id is None:
+                yield receta, None, None, None, None
+            else:
+                yield (
+                    receta,
+                    producto if producto is not None else "Producto no encontrado",
+                    unidad_medida or "",
+                    cantidad,
+                    area if area is not None else "Área no encontrada"
+                )
+
+    def obtener_matriz_bom(self) -> MatrizBOM:
+        """
+        Obtiene la matriz BOM de todas las recetas, compilada con una única consulta.
+        La matriz se conserva en memoria hasta que alguna receta cambie.
+        """
+        matriz, version = self._leer_cache('_matriz_bom')
+        if matriz is None:
+            filas = self.db_session.query(
+                db_models.Receta.id,
+                db_models.Ingrediente.producto_id,
+                db_models.Ingrediente.area_id,
+                db_models.Ingrediente.cantidad
+            ).join(db_models.Ingrediente, db_models.Ingrediente.receta_id == db_models.Receta.id).all()
+            matriz = MatrizBOM.desde_ingredientes(
+                (str(receta_id), str(producto_id), str(area_id), cantidad) for receta_id, producto_id, area_id, cantidad in filas
+            )
+            self._guardar_cache('_matriz_bom', matriz, version)
+        return matriz
+
+    def obtener_indice_nombres(self) -> dict[str, str]:
+        """
+        Obtiene el índice {nombre normalizado: id de receta} con el que se resuelven los nombres de
+        receta de las ventas. Se construye con una consulta de dos columnas y se conserva en memoria
+        hasta que alguna receta cambie.
+        """
+        indice, version = self._leer_cache('_indice_nombres')
+        if indice is None:
+            filas = self.db_session.query(db_models.Receta.id, db_models.Receta.nombre).all()
+            indice = {normalizar_nombre(nombre): str(receta_id) for receta_id, nombre in filas}
+            self._guardar_cache('_indice_nombres', indice, version)
+        return indice
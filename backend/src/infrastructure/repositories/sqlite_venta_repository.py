@@ -1,4 +1,7 @@
 from datetime import datetime
+from sqlalchemy import func, or_, select, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from src.core.domain.receta import normalizar_nombre
 from src.core.domain.venta import Venta
 from src.application.use_cases.venta_use_cases import IVentaRepository
 from src.infrastructure.db import models as db_models
@@ -9,24 +12,71 @@ class SQLiteVentaRepository(IVentaRepository):
         """Inicializa el repositorio con una sesión de base de datos."""
         self.db_session = db_session
 
-    def crear(self, venta: Venta) -> Venta:
+    @staticmethod
+    def _a_dominio(venta_db) -> Venta:
+        """Mapea un modelo de venta de la base de datos a un objeto de dominio."""
+        return Venta(
+            receta_nombre=venta_db.receta_nombre,
+            cantidad=venta_db.cantidad,
+            fecha=venta_db.fecha.isoformat(),
+            id=str(venta_db.id),
+            receta_id=venta_db.receta_id
+        )
+
+    def _confirmar(self, confirmar: bool):
+        """
+        Confirma la transacción en curso o, con confirmar=False, solo envía los cambios a la base de
+        datos para que el paso siguiente (el ajuste del consumo diario) los confirme junto con los suyos.
+        """
+        if confirmar:
+            self.db_session.commit()
+        else:
+            self.db_session.flush()
+
+    def _acumular_diarias(self, movimientos):
+        """
+        Suma a ventas_diarias los movimientos (fecha, receta_id, cantidad) dentro de la transacción
+        en curso, sin confirmarla. Las ventas sin receta resuelta no se acumulan y los totales que
+        vuelven a cero se eliminan.
+        """
+        deltas = {}
+        for fecha, receta_id, cantidad in movimientos:
+            if receta_id:
+                deltas[(fecha, receta_id)] = deltas.get((fecha, receta_id), 0) + cantidad
+        filas = [
+            {"id": db_models.generate_uuid(), "fecha": fecha, "receta_id": receta_id, "cantidad_total": cantidad}
+            for (fecha, receta_id), cantidad in deltas.items()
+            if cantidad
+        ]
+        if not filas:
+            return
+
+        stmt = sqlite_insert(db_models.VentaDiaria.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['fecha', 'receta_id'],
+            set_={"cantidad_total": db_models.VentaDiaria.cantidad_total + stmt.excluded.cantidad_total}
+        )
+        self.db_session.execute(stmt, filas)
+        self.db_session.query(db_models.VentaDiaria).filter(
+            db_models.VentaDiaria.fecha.in_({fila["fecha"] for fila in filas}),
+            db_models.VentaDiaria.cantidad_total == 0
+        ).delete(synchronize_session=False)
+
+    def crear(self, venta: Venta, confirmar: bool = True) -> Venta:
         """Crea una nueva venta en la base de datos."""
         try:
             fecha_obj = datetime.strptime(venta.fecha, '%Y-%m-%d').date() if isinstance(venta.fecha, str) else venta.fecha
             venta_db = db_models.Venta(
                 receta_nombre=venta.receta_nombre,
+                receta_id=venta.receta_id,
                 cantidad=venta.cantidad,
                 fecha=fecha_obj
             )
             self.db_session.add(venta_db)
-            self.db_session.commit()
+            self._acumular_diarias([(fecha_obj, venta.receta_id, venta.cantidad)])
+            self._confirmar(confirmar)
             # Retorna el objeto de dominio con el ID asignado por la BD
-            return Venta(
-                receta_nombre=venta_db.receta_nombre,
-                cantidad=venta_db.cantidad,
-                fecha=venta_db.fecha.isoformat(),
-                id=str(venta_db.id)
-            )
+            return self._a_dominio(venta_db)
         except Exception as e:
             self.db_session.rollback()
             raise e
@@ -35,14 +85,40 @@ class SQLiteVentaRepository(IVentaRepository):
         """Obtiene todas las ventas de la base de datos."""
         ventas_db = self.db_session.query(db_models.Venta).all()
         # Mapea los resultados de la BD a objetos de dominio
-        return [
-            Venta(
-                receta_nombre=v.receta_nombre,
-                cantidad=v.cantidad,
-                fecha=v.fecha.isoformat(),
-                id=str(v.id)
-            ) for v in ventas_db
-        ]
+        return [self._a_dominio(v) for v in ventas_db]
+
+    def buscar(self, fecha: datetime.date = None, desde: datetime.date = None, hasta: datetime.date = None,
+               receta: str = None, limite: int = None, despues_de: tuple = None) -> list[Venta]:
+        """
+        Obtiene las ventas que cumplen los filtros, ordenadas por (fecha, id) de la más reciente a la
+        más antigua. Con despues_de=(fecha, id) devuelve la página siguiente a esa venta (paginación
+        por clave), que recorre el índice idx_venta_fecha sin usar OFFSET.
+        """
+        query = self._filtrar(self.db_session.query(db_models.Venta), fecha, desde, hasta, receta)
+        if despues_de:
+            query = query.filter(tuple_(db_models.Venta.fecha, db_models.Venta.id) < tuple_(*despues_de))
+        query = query.order_by(db_models.Venta.fecha.desc(), db_models.Venta.id.desc())
+        if limite:
+            query = query.limit(limite)
+        return [self._a_dominio(v) for v in query.all()]
+
+    def contar(self, fecha: datetime.date = None, desde: datetime.date = None, hasta: datetime.date = None,
+               receta: str = None) -> int:
+        """Cuenta las ventas que cumplen los filtros."""
+        query = self.db_session.query(func.count(db_models.Venta.id))
+        return self._filtrar(query, fecha, desde, hasta, receta).scalar()
+
+    def _filtrar(self, query, fecha, desde, hasta, receta):
+        """Aplica los filtros por fecha, rango de fechas y nombre de receta."""
+        if fecha:
+            query = query.filter(db_models.Venta.fecha == fecha)
+        if desde:
+            query = query.filter(db_models.Venta.fecha >= desde)
+        if hasta:
+            query = query.filter(db_models.Venta.fecha <= hasta)
+        if receta:
+            query = query.filter(db_models.Venta.receta_nombre.ilike(f"%{receta}%"))
+        return query
 
     def obtener_por_id(self, id: str) -> Venta:
         """Obtiene una venta por su ID."""
@@ -50,14 +126,9 @@ class SQLiteVentaRepository(IVentaRepository):
         if not venta_db:
             return None
         # Mapea el resultado a un objeto de dominio
-        return Venta(
-            receta_nombre=venta_db.receta_nombre,
-            cantidad=venta_db.cantidad,
-            fecha=venta_db.fecha.isoformat(),
-            id=str(venta_db.id)
-        )
+        return self._a_dominio(venta_db)
 
-    def actualizar(self, venta: Venta) -> Venta:
+    def actualizar(self, venta: Venta, confirmar: bool = True) -> Venta:
         """Actualiza una venta existente en la base de datos."""
         try:
             venta_db = self.db_session.query(db_models.Venta).get(venta.id)
@@ -65,40 +136,47 @@ class SQLiteVentaRepository(IVentaRepository):
                 return None
             
             fecha_obj = datetime.strptime(venta.fecha, '%Y-%m-%d').date() if isinstance(venta.fecha, str) else venta.fecha
+            self._acumular_diarias([
+                (venta_db.fecha, venta_db.receta_id, -venta_db.cantidad),
+                (fecha_obj, venta.receta_id, venta.cantidad)
+            ])
             venta_db.receta_nombre = venta.receta_nombre
+            venta_db.receta_id = venta.receta_id
             venta_db.cantidad = venta.cantidad
             venta_db.fecha = fecha_obj
-            self.db_session.commit()
+            self._confirmar(confirmar)
             # Retorna el objeto de dominio actualizado
-            return Venta(
-                receta_nombre=venta_db.receta_nombre,
-                cantidad=venta_db.cantidad,
-                fecha=venta_db.fecha.isoformat(),
-                id=str(venta_db.id)
-            )
+            return self._a_dominio(venta_db)
         except Exception as e:
             self.db_session.rollback()
             raise e
 
-    def eliminar(self, id: str) -> bool:
+    def eliminar(self, id: str, confirmar: bool = True) -> bool:
         """Elimina una venta de la base de datos por su ID."""
         try:
             venta_db = self.db_session.query(db_models.Venta).get(id)
             if not venta_db:
                 return False
             
+            self._acumular_diarias([(venta_db.fecha, venta_db.receta_id, -venta_db.cantidad)])
             self.db_session.delete(venta_db)
-            self.db_session.commit()
+            self._confirmar(confirmar)
             return True
         except Exception as e:
             self.db_session.rollback()
             raise e
 
-    def eliminar_multiples(self, ids: list[str]) -> bool:
+    def eliminar_multiples(self, ids: list[str], confirmar: bool = True) -> bool:
         """Elimina múltiples ventas de la base de datos por sus IDs."""
         try:
+            totales = self.db_session.query(
+                db_models.Venta.fecha,
+                db_models.Venta.receta_id,
+                func.sum(db_models.Venta.cantidad)
+            ).filter(db_models.Venta.id.in_(ids)).group_by(db_models.Venta.fecha, db_models.Venta.receta_id).all()
+            self._acumular_diarias((fecha, receta_id, -total) for fecha, receta_id, total in totales)
             self.db_session.query(db_models.Venta).filter(db_models.Venta.id.in_(ids)).delete(synchronize_session=False)
-            self.db_session.commit()
+            self._confirmar(confirmar)
             return True
         except Exception as e:
             self.db_session.rollback()
@@ -107,15 +185,160 @@ class SQLiteVentaRepository(IVentaRepository):
     def find_by_date(self, fecha: datetime.date) -> list[Venta]:
         """Obtiene todas las ventas para una fecha específica."""
         ventas_db = self.db_session.query(db_models.Venta).filter_by(fecha=fecha).all()
+        return [self._a_dominio(v) for v in ventas_db]
+
+    def obtener_por_ids(self, ids: list[str]) -> list[Venta]:
+        """Obtiene las ventas correspondientes a una lista de IDs."""
+        ventas_db = self.db_session.query(db_models.Venta).filter(db_models.Venta.id.in_(ids)).all()
+        return [self._a_dominio(v) for v in ventas_db]
+
+    def obtener_totales_por_fecha(self, receta_id: str) -> dict[datetime.date, int]:
+        """Obtiene la cantidad vendida de una receta en cada fecha con ventas, desde ventas_diarias."""
+        totales = self.db_session.query(
+            db_models.VentaDiaria.fecha,
+            db_models.VentaDiaria.cantidad_total
+        ).filter(db_models.VentaDiaria.receta_id == receta_id).all()
+        return {fecha: total for fecha, total in totales}
+
+    def vincular_recetas(self, indice_nombres: dict[str, str], confirmar: bool = True) -> tuple[int, set]:
+        """
+        Asigna receta a las ventas sin receta resuelta (o cuya receta ya no existe) a partir del
+        índice {nombre normalizado: id de receta}. Solo se normalizan los nombres distintos, no cada
+        venta. Devuelve el número de ventas vinculadas y el conjunto de sus fechas. Con
+        confirmar=False la transacción queda abierta.
+        """
+        sin_receta = or_(
+            db_models.Venta.receta_id.is_(None),
+            ~db_models.Venta.receta_id.in_(select(db_models.Receta.id))
+        )
+        nombres_por_receta = {}
+        for (receta_nombre,) in self.db_session.query(db_models.Venta.receta_nombre).filter(sin_receta).distinct():
+            receta_id = indice_nombres.get(normalizar_nombre(receta_nombre))
+            if receta_id:
+                nombres_por_receta.setdefault(receta_id, []).append(receta_nombre)
+        if not nombres_por_receta:
+            return 0, set()
+        try:
+            vinculadas = 0
+            fechas = set()
+            for receta_id, nombres in nombres_por_receta.items():
+                # Los totales diarios pasan de la receta anterior (si la había) a la nueva.
+                totales = self.db_session.query(
+                    db_models.Venta.fecha,
+                    db_models.Venta.receta_id,
+                    func.sum(db_models.Venta.cantidad)
+                ).filter(
+                    sin_receta, db_models.Venta.receta_nombre.in_(nombres)
+                ).group_by(db_models.Venta.fecha, db_models.Venta.receta_id).all()
+                fechas.update(fecha for fecha, _, _ in totales)
+                self._acumular_diarias(
+                    movimiento
+                    for fecha, receta_anterior, total in totales
+                    for movimiento in ((fecha, receta_anterior, -total), (fecha, receta_id, total))
+                )
+                vinculadas += self.db_session.query(db_models.Venta).filter(
+                    sin_receta, db_models.Venta.receta_nombre.in_(nombres)
+                ).update({db_models.Venta.receta_id: receta_id}, synchronize_session=False)
+            self._confirmar(confirmar)
+            return vinculadas, fechas
+        except Exception as e:
+            self.db_session.rollback()
+            raise e
+
+    def obtener_rango_fechas(self) -> tuple:
+        """Obtiene la primera y la última fecha con ventas registradas."""
+        return self.db_session.query(
+            func.min(db_models.Venta.fecha),
+            func.max(db_models.Venta.fecha)
+        ).one()
+
+    def obtener_totales_por_receta(self, fecha: datetime.date) -> dict[str, int]:
+        """Obtiene la cantidad vendida de cada receta resuelta en una fecha, indexada por ID de receta."""
+        totales = self.db_session.query(
+            db_models.VentaDiaria.receta_id,
+            db_models.VentaDiaria.cantidad_total
+        ).filter(db_models.VentaDiaria.fecha == fecha).all()
+        return {receta_id: total for receta_id, total in totales}
+
+    def resumen_diario(self, desde: datetime.date, hasta: datetime.date) -> list[dict]:
+        """
+        Obtiene el total vendido de cada receta por día en un rango de fechas, leído de
+        ventas_diarias. El nombre es el actual de la receta (None si fue eliminada).
+        """
+        filas = self.db_session.query(
+            db_models.VentaDiaria.fecha,
+            db_models.VentaDiaria.receta_id,
+            db_models.Receta.nombre,
+            db_models.VentaDiaria.cantidad_total
+        ).outerjoin(
+            db_models.Receta, db_models.Receta.id == db_models.VentaDiaria.receta_id
+        ).filter(
+            db_models.VentaDiaria.fecha >= desde, db_models.VentaDiaria.fecha <= hasta
+        ).order_by(db_models.VentaDiaria.fecha, db_models.Receta.nombre).all()
         return [
-            Venta(
-                receta_nombre=v.receta_nombre,
-                cantidad=v.cantidad,
-                fecha=v.fecha.isoformat(),
-                id=str(v.id)
-            ) for v in ventas_db
+            {"fecha": fecha.isoformat(), "receta_id": receta_id, "receta_nombre": nombre, "cantidad_total": total}
+            for fecha, receta_id, nombre, total in filas
         ]
 
+    def reconstruir_diarias(self) -> int:
+        """
+        Regenera por completo ventas_diarias agrupando la tabla de ventas. Devuelve el número de
+        totales diarios generados.
+        """
+        try:
+            totales = self.db_session.query(
+                db_models.Venta.fecha,
+                db_models.Venta.receta_id,
+                func.sum(db_models.Venta.cantidad)
+            ).filter(
+                db_models.Venta.receta_id.isnot(None)
+            ).group_by(db_models.Venta.fecha, db_models.Venta.receta_id).all()
+            self.db_session.query(db_models.VentaDiaria).delete(synchronize_session=False)
+            filas = [
+                {"id": db_models.generate_uuid(), "fecha": fecha, "receta_id": receta_id, "cantidad_total": total}
+                for fecha, receta_id, total in totales
+                if total
+            ]
+            if filas:
+                self.db_session.execute(db_models.VentaDiaria.__table__.insert(), filas)
+            self.db_session.commit()
+            return len(filas)
+        except Exception as e:
+            self.db_session.rollback()
+            raise e
+
+    def consumo_por_rango(self, desde: datetime.date, hasta: datetime.date, por_dia: bool = False,
+                          fechas: set = None) -> dict:
+        """
+        Calcula el consumo derivado de las ventas de un rango de fechas con una única agregación
+        ventas_diarias JOIN ingredientes por receta_id, que recorre un total por receta y día en
+        lugar de cada línea de venta. Si por_dia es True, el resultado se agrupa además por fecha.
+        Con fechas, solo se consideran esos días del rango.
+        """
+        clave_columnas = [db_models.Ingrediente.producto_id, db_models.Ingrediente.area_id]
+        if por_dia:
+            clave_columnas.insert(0, db_models.VentaDiaria.fecha)
+
+        query = self.db_session.query(
+            *clave_columnas,
+            func.sum(db_models.VentaDiaria.cantidad_total * db_models.Ingrediente.cantidad)
+        ).join(
+            db_models.Ingrediente, db_models.Ingrediente.receta_id == db_models.VentaDiaria.receta_id
+        ).filter(
+            db_models.VentaDiaria.fecha >= desde, db_models.VentaDiaria.fecha <= hasta
+        )
+        if fechas:
+            query = query.filter(db_models.VentaDiaria.fecha.in_(fechas))
+        filas = query.group_by(*clave_columnas).all()
+
+        if not por_dia:
+            return {f"{producto_id}|{area_id}": total for producto_id, area_id, total in filas}
+
+        consumo_por_dia = {}
+        for fecha, producto_id, area_id, total in filas:
+            consumo_por_dia.setdefault(fecha.isoformat(), {})[f"{producto_id}|{area_id}"] = total
+        return consumo_por_dia
+
     def crear_multiples(self, ventas: list[Venta]) -> list[Venta]:
         """Crea múltiples ventas en la base de datos de forma transaccional."""
         try:
@@ -124,12 +347,14 @@ class SQLiteVentaRepository(IVentaRepository):
                 fecha_obj = datetime.strptime(venta.fecha, '%Y-%m-%d').date() if isinstance(venta.fecha, str) else venta.fecha
                 venta_db = db_models.Venta(
                     receta_nombre=venta.receta_nombre,
+                    receta_id=venta.receta_id,
                     cantidad=venta.cantidad,
                     fecha=fecha_obj
                 )
                 ventas_db.append(venta_db)
             
             self.db_session.add_all(ventas_db)
+            self._acumular_diarias((v.fecha, v.receta_id, v.cantidad) for v in ventas_db)
             self.db_session.commit()
             
             # Asigna los IDs generados a las ventas de entrada
@@ -140,3 +365,119 @@ class SQLiteVentaRepository(IVentaRepository):
         except Exception as e:
             self.db_session.rollback()
             raise e
+
+    def insertar_lote(self, filas: list[dict], importacion_id: str = None, recetas_nuevas: list[dict] = None,
+                      confirmar: bool = True) -> int:
+        """
+        Inserta un lote de ventas con una sola sentencia executemany de SQLAlchemy Core, sin crear
+        objetos ORM, acumula sus totales en ventas_diarias y confirma la transacción (con
+        confirmar=False la deja abierta para quien llama). Con
+        importacion_id, las ventas quedan asociadas a esa importación y su contador de filas se
+        incrementa en la misma transacción. Las recetas_nuevas ({"id", "nombre"}) a las que se
+        refieren las ventas se insertan también en bloque dentro de esa transacción.
+        Devuelve el número de ventas insertadas.
+        """
+        if not filas:
+            return 0
+        try:
+            if recetas_nuevas:
+                self.db_session.execute(db_models.Receta.__table__.insert(), [
+                    {"id": receta["id"], "nombre": receta["nombre"], "activa": True} for receta in recetas_nuevas
+                ])
+            ventas = [
+                {
+                    "id": db_models.generate_uuid(),
+                    "receta_nombre": fila["receta_nombre"],
+                    "receta_id": fila.get("receta_id"),
+                    "cantidad": fila["cantidad"],
+                    "fecha": datetime.strptime(fila["fecha"], '%Y-%m-%d').date() if isinstance(fila["fecha"], str) else fila["fecha"],
+                    "importacion_id": importacion_id
+                }
+                for fila in filas
+            ]
+            self.db_session.execute(db_models.Venta.__table__.insert(), ventas)
+            self._acumular_diarias((v["fecha"], v["receta_id"], v["cantidad"]) for v in ventas)
+            if importacion_id:
+                self.db_session.query(db_models.ImportacionVentas).filter_by(id=importacion_id).update(
+                    {db_models.ImportacionVentas.filas: db_models.ImportacionVentas.filas + len(ventas)},
+                    synchronize_session=False
+                )
+            self._confirmar(confirmar)
+            return len(filas)
+        except Exception as e:
+            self.db_session.rollback()
+            raise e
+
+    @staticmethod
+    def _importacion_a_dict(importacion_db) -> dict:
+        """Mapea un registro de importación de la base de datos a un diccionario."""
+        return {
+            "id": str(importacion_db.id),
+            "hash_archivo": importacion_db.hash_archivo,
+            "nombre_archivo": importacion_db.nombre_archivo,
+            "fecha": importacion_db.fecha.isoformat() if importacion_db.fecha else None,
+            "filas": importacion_db.filas,
+            "creado_en": importacion_db.creado_en.isoformat() if importacion_db.creado_en else None
+        }
+
+    def registrar_importacion(self, hash_archivo: str, nombre_archivo: str, fecha: datetime.date,
+                              confirmar: bool = True) -> dict:
+        """
+        Registra el inicio de la importación de un archivo y devuelve el registro creado. Con
+        confirmar=False el registro se confirma junto con el primer lote de ventas, de modo que si
+        ese lote falla no queda una importación vacía que bloquee los reintentos.
+        """
+        try:
+            importacion_db = db_models.ImportacionVentas(
+                hash_archivo=hash_archivo,
+                nombre_archivo=nombre_archivo,
+                fecha=fecha,
+                filas=0
+            )
+            self.db_session.add(importacion_db)
+            self._confirmar(confirmar)
+            return self._importacion_a_dict(importacion_db)
+        except Exception as e:
+            self.db_session.rollback()
+            raise e
+
+    def buscar_importacion(self, hash_archivo: str) -> dict:
+        """Obtiene la importación más reciente de un archivo con ese contenido, o None."""
+        importacion_db = self.db_session.query(db_models.ImportacionVentas).filter_by(
+            hash_archivo=hash_archivo
+        ).order_by(db_models.ImportacionVentas.creado_en.desc()).first()
+        return self._importacion_a_dict(importacion_db) if importacion_db else None
+
+    def obtener_importaciones(self) -> list[dict]:
+        """Obtiene el registro de importaciones, de la más reciente a la más antigua."""
+        importaciones_db = self.db_session.query(db_models.ImportacionVentas).order_by(
+            db_models.ImportacionVentas.creado_en.desc()
+        ).all()
+        return [self._importacion_a_dict(i) for i in importaciones_db]
+
+    def eliminar_importacion(self, id: str, confirmar: bool = True) -> dict:
+        """
+        Deshace una importación: borra todas sus ventas con un único DELETE por importacion_id,
+        descuenta sus totales de ventas_diarias y elimina el registro. Devuelve el número de ventas
+        eliminadas y sus totales por (fecha, receta_id), o None si la importación no existe.
+        """
+        try:
+            importacion_db = self.db_session.query(db_models.ImportacionVentas).get(id)
+            if not importacion_db:
+                return None
+
+            totales = self.db_session.query(
+                db_models.Venta.fecha,
+                db_models.Venta.receta_id,
+                func.sum(db_models.Venta.cantidad)
+            ).filter(db_models.Venta.importacion_id == id).group_by(db_models.Venta.fecha, db_models.Venta.receta_id).all()
+            self._acumular_diarias((fecha, receta_id, -total) for fecha, receta_id, total in totales)
+            eliminadas = self.db_session.query(db_models.Venta).filter(
+                db_models.Venta.importacion_id == id
+            ).delete(synchronize_session=False)
+            self.db_session.delete(importacion_db)
+            self._confirmar(confirmar)
+            return {"ventas_eliminadas": eliminadas, "totales": totales}
+        except Exception as e:
+            self.db_session.rollback()
+            raise e
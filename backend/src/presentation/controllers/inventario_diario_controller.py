@@ -1,15 +1,25 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, send_file
 from dependency_injector.wiring import inject, Provide
 from datetime import datetime
 from src.infrastructure.container import Container
 from src.application.use_cases.inventario_diario_use_cases import (
     ObtenerEstadoInventarioDiarioUseCase,
+    ObtenerEstadoComparadoUseCase,
     CalcularConsumoUseCase,
+    CalcularConsumoRangoUseCase,
+    ReconstruirConsumoDiarioUseCase,
+    ObtenerSaldosActualesUseCase,
+    VerificarSaldosUseCase,
+    PropagarCierreInventarioUseCase,
     GuardarInventarioDiarioUseCase,
+    GuardarCambiosInventarioDiarioUseCase,
+    ConflictoVersionError,
     ObtenerModelosIPVUseCase,
     GuardarModeloIPVUseCase,
     ObtenerRegistrosIPVUseCase,
-    GenerarReporteIPVUseCase
+    GenerarReporteIPVUseCase,
+    GenerarReportePeriodoIPVUseCase,
+    ExportarReporteIPVExcel
 )
 
 # Blueprint para los endpoints del inventario diario.
@@ -36,11 +46,11 @@ def obtener_estado(
     except Exception as e:
         return jsonify({"error": f"Error inesperado: {e}"}), 500
 
-# Endpoint para calcular el consumo basado en las ventas del día.
-@inventario_diario_bp.route('/calcular-consumo', methods=['GET'])
+# Endpoint para obtener juntos el estado del inventario de una fecha y el del día anterior.
+@inventario_diario_bp.route('/estado-comparado', methods=['GET'])
 @inject
-def calcular_consumo(
-    use_case: CalcularConsumoUseCase = Provide[Container.calcular_consumo_uc]
+def obtener_estado_comparado(
+    use_case: ObtenerEstadoComparadoUseCase = Provide[Container.obtener_estado_comparado_uc]
 ):
     fecha_str = request.args.get('fecha')
     if not fecha_str:
@@ -48,13 +58,122 @@ def calcular_consumo(
 
     try:
         fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date()
-        consumo = use_case.execute(fecha)
+        estado = use_case.execute(fecha)
+        # Los comentarios se envían ya interpretados para que el cliente no tenga que parsearlos.
+        estado_dict = {
+            dia: {
+                area_nombre: [item.to_dict(incluir_comentarios=True) for item in items]
+                for area_nombre, items in areas.items()
+            }
+            for dia, areas in estado.items()
+        }
+        return jsonify(estado_dict), 200
+    except ValueError:
+        return jsonify({"error": "Formato de fecha inválido. Use YYYY-MM-DD"}), 400
+    except Exception as e:
+        return jsonify({"error": f"Error inesperado: {e}"}), 500
+
+# Endpoint para calcular el consumo basado en las ventas del día o de un rango de fechas.
+@inventario_diario_bp.route('/calcular-consumo', methods=['GET'])
+@inject
+def calcular_consumo(
+    use_case: CalcularConsumoUseCase = Provide[Container.calcular_consumo_uc],
+    rango_use_case: CalcularConsumoRangoUseCase = Provide[Container.calcular_consumo_rango_uc]
+):
+    fecha_str = request.args.get('fecha')
+    desde_str = request.args.get('desde')
+    hasta_str = request.args.get('hasta')
+    if not fecha_str and not (desde_str and hasta_str):
+        return jsonify({"error": "Se requiere el parámetro 'fecha' o los parámetros 'desde' y 'hasta'"}), 400
+
+    try:
+        if fecha_str:
+            fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date()
+            consumo = use_case.execute(fecha)
+        else:
+            desde = datetime.strptime(desde_str, '%Y-%m-%d').date()
+            hasta = datetime.strptime(hasta_str, '%Y-%m-%d').date()
+            if desde > hasta:
+                return jsonify({"error": "La fecha 'desde' no puede ser posterior a 'hasta'"}), 400
+            consumo = rango_use_case.execute(desde, hasta, por_dia=request.args.get('agrupar') == 'dia')
         return jsonify(consumo), 200
     except ValueError:
         return jsonify({"error": "Formato de fecha inválido. Use YYYY-MM-DD"}), 400
     except Exception as e:
         return jsonify({"error": f"Error inesperado: {e}"}), 500
 
+# Endpoint para regenerar el consumo diario materializado de un rango de fechas.
+@inventario_diario_bp.route('/consumo/reconstruir', methods=['POST'])
+@inject
+def reconstruir_consumo(
+    use_case: ReconstruirConsumoDiarioUseCase = Provide[Container.reconstruir_consumo_diario_uc]
+):
+    data = request.get_json(silent=True) or {}
+    try:
+        desde = datetime.strptime(data['desde'], '%Y-%m-%d').date() if data.get('desde') else None
+        hasta = datetime.strptime(data['hasta'], '%Y-%m-%d').date() if data.get('hasta') else None
+    except ValueError:
+        return jsonify({"error": "Formato de fecha inválido. Use YYYY-MM-DD"}), 400
+
+    try:
+        resultado = use_case.execute(desde, hasta)
+        return jsonify(resultado), 200
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Error al reconstruir el consumo: {e}"}), 500
+
+# Endpoint para consultar las existencias actuales, opcionalmente de una sola área.
+@inventario_diario_bp.route('/saldos', methods=['GET'])
+@inject
+def obtener_saldos(
+    use_case: ObtenerSaldosActualesUseCase = Provide[Container.obtener_saldos_actuales_uc]
+):
+    try:
+        saldos = use_case.execute(request.args.get('area_id'))
+        return jsonify(saldos), 200
+    except Exception as e:
+        return jsonify({"error": f"Error al obtener los saldos: {e}"}), 500
+
+# Endpoint para verificar la tabla de saldos contra el historial; con "reparar" la reconstruye.
+@inventario_diario_bp.route('/saldos/verificar', methods=['POST'])
+@inject
+def verificar_saldos(
+    use_case: VerificarSaldosUseCase = Provide[Container.verificar_saldos_uc]
+):
+    data = request.get_json(silent=True) or {}
+    try:
+        resultado = use_case.execute(bool(data.get('reparar', False)))
+        return jsonify(resultado), 200
+    except Exception as e:
+        return jsonify({"error": f"Error al verificar los saldos: {e}"}), 500
+
+# Endpoint para propagar el cierre de un día ya guardado a los días posteriores.
+# Sin "claves" se propagan todos los productos registrados en esa fecha.
+@inventario_diario_bp.route('/propagar', methods=['POST'])
+@inject
+def propagar_cierre(
+    use_case: PropagarCierreInventarioUseCase = Provide[Container.propagar_cierre_inventario_uc]
+):
+    data = request.get_json(silent=True) or {}
+    if not data.get('fecha'):
+        return jsonify({"error": "El parámetro 'fecha' es requerido"}), 400
+    try:
+        fecha = datetime.strptime(data['fecha'], '%Y-%m-%d').date()
+        claves = None
+        if data.get('claves') is not None:
+            claves = [(clave['area_id'], clave['producto_id']) for clave in data['claves']]
+    except ValueError:
+        return jsonify({"error": "Formato de fecha inválido. Use YYYY-MM-DD"}), 400
+    except (KeyError, TypeError):
+        return jsonify({"error": "Cada clave debe incluir 'area_id' y 'producto_id'"}), 400
+
+    try:
+        resultado = use_case.execute(fecha, claves)
+        return jsonify(resultado), 200
+    except Exception as e:
+        return jsonify({"error": f"Error al propagar el inventario: {e}"}), 500
+
 # Endpoint para guardar el registro completo del inventario diario.
 @inventario_diario_bp.route('/guardar', methods=['POST'])
 @inject
@@ -66,8 +185,36 @@ def guardar_inventario(
         return jsonify({"error": "Cuerpo de la solicitud vacío"}), 400
 
     try:
-        registros_guardados = use_case.execute(data)
-        return jsonify([r.to_dict() for r in registros_guardados]), 201
+        registros_guardados, resumen = use_case.execute(data)
+        return jsonify({
+            "registros": [r.to_dict() for r in registros_guardados],
+            "insertados": resumen["insertados"],
+            "actualizados": resumen["actualizados"],
+            "propagacion": resumen["propagacion"]
+        }), 201
+    except Exception as e:
+        return jsonify({"error": f"Error al guardar el inventario: {e}"}), 500
+
+# Endpoint para guardar únicamente las celdas modificadas, con control de versión por fila.
+@inventario_diario_bp.route('/guardar', methods=['PATCH'])
+@inject
+def guardar_cambios_inventario(
+    use_case: GuardarCambiosInventarioDiarioUseCase = Provide[Container.guardar_cambios_inventario_diario_uc]
+):
+    data = request.get_json()
+    if not data:
+        return jsonify({"error": "Cuerpo de la solicitud vacío"}), 400
+
+    try:
+        registros_actualizados = use_case.execute(data)
+        return jsonify([r.to_dict() for r in registros_actualizados]), 200
+    except ConflictoVersionError as ce:
+        return jsonify({
+            "error": str(ce),
+            "conflictos": [r.to_dict() for r in ce.conflictos]
+        }), 409
+    except (KeyError, ValueError) as e:
+        return jsonify({"error": f"Datos inválidos: {e}"}), 400
     except Exception as e:
         return jsonify({"error": f"Error al guardar el inventario: {e}"}), 500
 
@@ -111,15 +258,39 @@ def obtener_registros(
     except Exception as e:
         return jsonify({"error": f"Error al obtener los registros: {e}"}), 500
 
-# Endpoint para generar un reporte de IPV.
+# Endpoint para generar un reporte de IPV de una fecha o, con 'desde'/'hasta' o 'periodo' (semana, mes)
+# junto a 'fecha', el reporte acumulado de un periodo.
 @inventario_diario_bp.route('/reporte', methods=['GET'])
 @inject
 def generar_reporte(
-    use_case: GenerarReporteIPVUseCase = Provide[Container.generar_reporte_ipv_uc]
+    use_case: GenerarReporteIPVUseCase = Provide[Container.generar_reporte_ipv_uc],
+    periodo_use_case: GenerarReportePeriodoIPVUseCase = Provide[Container.generar_reporte_periodo_ipv_uc]
 ):
     fecha_str = request.args.get('fecha')
+    desde_str = request.args.get('desde')
+    hasta_str = request.args.get('hasta')
+    periodo = request.args.get('periodo')
+
+    if desde_str or hasta_str:
+        if not (desde_str and hasta_str):
+            return jsonify({"error": "Los parámetros 'desde' y 'hasta' deben indicarse juntos"}), 400
+        try:
+            desde = datetime.strptime(desde_str, '%Y-%m-%d').date()
+            hasta = datetime.strptime(hasta_str, '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({"error": "Formato de fecha inválido. Use YYYY-MM-DD"}), 400
+        return _reporte_periodo(periodo_use_case, desde, hasta)
+
     if not fecha_str:
         return jsonify({"error": "El parámetro 'fecha' es requerido"}), 400
+
+    if periodo:
+        try:
+            fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date()
+            desde, hasta = GenerarReportePeriodoIPVUseCase.rango_de_periodo(periodo, fecha)
+        except ValueError as ve:
+            return jsonify({"error": str(ve)}), 400
+        return _reporte_periodo(periodo_use_case, desde, hasta)
     
     try:
         fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date()
@@ -129,3 +300,47 @@ def generar_reporte(
         return jsonify({"error": str(ve)}), 404
     except Exception as e:
         return jsonify({"error": f"Error inesperado al generar el reporte: {e}"}), 500
+
+# Endpoint para exportar a Excel el reporte de IPV de una fecha o de un rango ('desde'/'hasta').
+@inventario_diario_bp.route('/reporte/export', methods=['GET'])
+@inject
+def exportar_reporte(
+    export_uc: ExportarReporteIPVExcel = Provide[Container.exportar_reporte_ipv_excel]
+):
+    fecha_str = request.args.get('fecha')
+    desde_str = request.args.get('desde') or fecha_str
+    hasta_str = request.args.get('hasta') or fecha_str
+    if not (desde_str and hasta_str):
+        return jsonify({"error": "Indique 'fecha' o los parámetros 'desde' y 'hasta'"}), 400
+    try:
+        desde = datetime.strptime(desde_str, '%Y-%m-%d').date()
+        hasta = datetime.strptime(hasta_str, '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({"error": "Formato de fecha inválido. Use YYYY-MM-DD"}), 400
+    if desde > hasta:
+        return jsonify({"error": "La fecha 'desde' no puede ser posterior a 'hasta'"}), 400
+
+    try:
+        excel_file = export_uc.execute(desde, hasta)
+        nombre = f"ipv_{desde.isoformat()}.xlsx" if desde == hasta else f"ipv_{desde.isoformat()}_{hasta.isoformat()}.xlsx"
+        return send_file(
+            excel_file,
+            as_attachment=True,
+            download_name=nombre,
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 404
+    except Exception as e:
+        return jsonify({"error": f"Error al exportar el reporte: {e}"}), 500
+
+def _reporte_periodo(use_case: GenerarReportePeriodoIPVUseCase, desde, hasta):
+    if desde > hasta:
+        return jsonify({"error": "La fecha 'desde' no puede ser posterior a 'hasta'"}), 400
+    try:
+        reporte_data = use_case.execute(desde, hasta)
+        return jsonify(reporte_data), 200
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 404
+    except Exception as e:
+        return jsonify({"error": f"Error inesperado al generar el reporte: {e}"}), 500
@@ -49,7 +49,8 @@ def obtener_recetas(obtener_uc: ObtenerRecetasUseCase = Provide[Container.obtene
     try:
         sort_by = request.args.get('sort_by', 'nombre')
         filter_by = request.args.get('filter_by', None)
-        recetas = obtener_uc.execute(sort_by=sort_by, filter_by=filter_by)
+        detallar = request.args.get('detalle', 'false').lower() in ('true', '1', 'si', 'sí')
+        recetas = obtener_uc.execute(sort_by=sort_by, filter_by=filter_by, detallar=detallar)
         return jsonify([r.to_dict() for r in recetas]), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 400
@@ -120,8 +121,8 @@ def import_recetas(
         return jsonify({"error": "No se seleccionó ningún archivo"}), 400
     
     try:
-        import_uc.execute(file)
-        return jsonify({"message": "Recetas importadas correctamente"}), 200
+        resumen = import_uc.execute(file)
+        return jsonify({"message": "Recetas importadas correctamente", **resumen}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
@@ -1,7 +1,11 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, send_file
 from dependency_injector.wiring import inject, Provide
+from datetime import datetime
 from src.infrastructure.container import Container
 from src.core.domain.venta import Venta
+from src.application.use_cases.venta_use_cases import (
+    ImportacionVentasError, ImportacionDuplicadaError, ImportacionVentasInterrumpidaError
+)
 
 # Creación del Blueprint para las rutas de ventas
 venta_bp = Blueprint('venta', __name__, url_prefix='/api/ventas/')
@@ -19,19 +23,85 @@ def crear_venta(
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
-# Ruta para obtener todas las ventas
+# Lee de la URL los filtros de ventas: fecha, desde, hasta (YYYY-MM-DD) y receta.
+def _leer_filtros(args) -> dict:
+    filtros = {}
+    for campo in ('fecha', 'desde', 'hasta'):
+        if args.get(campo):
+            try:
+                filtros[campo] = datetime.strptime(args[campo], '%Y-%m-%d').date()
+            except ValueError:
+                raise ValueError(f"Formato de fecha inválido en '{campo}'. Use YYYY-MM-DD")
+    if args.get('receta'):
+        filtros['receta'] = args['receta']
+    return filtros
+
+# Lee de la URL el tamaño de página 'limite'; un valor que no es entero es un error, no una lista completa.
+def _leer_limite(args) -> int:
+    if 'limite' not in args:
+        return None
+    try:
+        return int(args['limite'])
+    except ValueError:
+        raise ValueError("El límite debe ser un número entero positivo.")
+
+# Ruta para obtener las ventas. Admite filtros por fecha, rango y receta; con 'limite' devuelve
+# una página {"ventas", "siguiente_cursor"} y la siguiente se pide pasando 'cursor'.
 @venta_bp.route('/', methods=['GET'])
 @inject
 def obtener_ventas(
     obtener_uc=Provide[Container.obtener_ventas_uc]
 ):
     try:
-        ventas = obtener_uc.execute()
-        ventas_dict = [v.to_dict() for v in ventas]
-        return jsonify(ventas_dict), 200
+        filtros = _leer_filtros(request.args)
+        limite = _leer_limite(request.args)
+        resultado = obtener_uc.execute(filtros, limite, request.args.get('cursor'))
+        if limite is None:
+            return jsonify([v.to_dict() for v in resultado]), 200
+        return jsonify({
+            "ventas": [v.to_dict() for v in resultado["ventas"]],
+            "siguiente_cursor": resultado["siguiente_cursor"]
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+# Ruta para contar las ventas que cumplen los filtros
+@venta_bp.route('/total/', methods=['GET'])
+@inject
+def contar_ventas(
+    contar_uc=Provide[Container.contar_ventas_uc]
+):
+    try:
+        total = contar_uc.execute(_leer_filtros(request.args))
+        return jsonify({"total": total}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+# Ruta para obtener el total vendido de cada receta por día entre 'desde' y 'hasta' (YYYY-MM-DD)
+@venta_bp.route('/diarias/', methods=['GET'])
+@inject
+def obtener_ventas_diarias(
+    obtener_diarias_uc=Provide[Container.obtener_ventas_diarias_uc]
+):
+    try:
+        filtros = _leer_filtros(request.args)
+        if 'desde' not in filtros or 'hasta' not in filtros:
+            return jsonify({"error": "Los parámetros 'desde' y 'hasta' son requeridos"}), 400
+        return jsonify(obtener_diarias_uc.execute(filtros['desde'], filtros['hasta'])), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+# Ruta para regenerar los totales diarios por receta a partir de todas las ventas
+@venta_bp.route('/diarias/reconstruir/', methods=['POST'])
+@inject
+def reconstruir_ventas_diarias(
+    reconstruir_diarias_uc=Provide[Container.reconstruir_ventas_diarias_uc]
+):
+    try:
+        return jsonify(reconstruir_diarias_uc.execute()), 200
+    except Exception as e:
+        return jsonify({"error": f"Error al reconstruir las ventas diarias: {e}"}), 500
+
 # Ruta para obtener una venta por su ID
 @venta_bp.route('/<id>/', methods=['GET'])
 @inject
@@ -96,6 +166,18 @@ def eliminar_ventas_multiples(
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+# Lee del formulario 'reanudar_desde', el número de filas de datos ya importadas que se omiten.
+def _leer_reanudar_desde(form) -> int:
+    if not form.get('reanudar_desde'):
+        return 0
+    try:
+        reanudar_desde = int(form['reanudar_desde'])
+    except ValueError:
+        reanudar_desde = -1
+    if reanudar_desde < 0:
+        raise ValueError("'reanudar_desde' debe ser un número entero no negativo.")
+    return reanudar_desde
+
 # Ruta para importar ventas desde un archivo
 @venta_bp.route('/importar/', methods=['POST'])
 @inject
@@ -110,18 +192,99 @@ def importar_ventas(
         return jsonify({"error": "Nombre de archivo inválido"}), 400
         
     fecha = request.form.get('fecha')
+    try:
+        reanudar_desde = _leer_reanudar_desde(request.form)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    importar_validas = request.form.get('importar_validas', 'false').lower() in ('true', '1', 'si', 'sí')
+    forzar = request.form.get('forzar', 'false').lower() in ('true', '1', 'si', 'sí')
+    recalcular_consumo = request.form.get('recalcular_consumo', 'false').lower() in ('true', '1', 'si', 'sí')
     
     try:
-        if not file.filename.endswith(('.xlsx', '.xls')):
+        if not file.filename.lower().endswith(('.xlsx', '.xls', '.csv')):
             return jsonify({"error": "Formato de archivo no soportado"}), 400
             
-        ventas, nuevas_recetas = importar_uc.execute(file.stream, fecha)
+        resumen = importar_uc.execute(
+            file.stream, fecha, file.filename, reanudar_desde, importar_validas, forzar, recalcular_consumo
+        )
         return jsonify({
-            "message": f"Se importaron {len(ventas)} ventas correctamente",
-            "ventas": [v.to_dict() for v in ventas],
-            "nuevas_recetas": [r.to_dict() for r in nuevas_recetas]
+            "message": f"Se importaron {resumen['ventas_importadas']} ventas correctamente",
+            "importacion_id": resumen["importacion_id"],
+            "filas_leidas": resumen["filas_leidas"],
+            "ventas_importadas": resumen["ventas_importadas"],
+            "nuevas_recetas": [r.to_dict() for r in resumen["nuevas_recetas"]],
+            "errores": resumen["errores"],
+            "advertencias": resumen["advertencias"],
+            "dias": resumen["dias"],
+            "consumo_recalculado": resumen["consumo_recalculado"]
         }), 200
         
+    except ImportacionDuplicadaError as de:
+        return jsonify({"error": str(de), "importacion": de.importacion}), 409
+    except ImportacionVentasError as ie:
+        return jsonify({"error": str(ie), "errores": ie.errores, "reanudar_desde": ie.reanudar_desde}), 400
+    except ImportacionVentasInterrumpidaError as ie:
+        return jsonify({
+            "error": str(ie),
+            "reanudar_desde": ie.reanudar_desde,
+            "importacion_id": ie.importacion_id,
+            "ventas_importadas": ie.ventas_importadas
+        }), 500
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Error al procesar el archivo: {str(e)}"}), 500
+
+# Ruta para consultar el registro de importaciones de ventas
+@venta_bp.route('/importaciones/', methods=['GET'])
+@inject
+def obtener_importaciones_ventas(
+    obtener_importaciones_uc=Provide[Container.obtener_importaciones_ventas_uc]
+):
+    try:
+        return jsonify(obtener_importaciones_uc.execute()), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+# Ruta para deshacer una importación: elimina todas sus ventas y descuenta su consumo
+@venta_bp.route('/importaciones/<id>/', methods=['DELETE'])
+@inject
+def deshacer_importacion_ventas(
+    id,
+    deshacer_importacion_uc=Provide[Container.deshacer_importacion_ventas_uc]
+):
+    try:
+        resultado = deshacer_importacion_uc.execute(id)
+        if resultado is None:
+            return jsonify({"error": "Importación no encontrada"}), 404
+        return jsonify(resultado), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+# Ruta para validar un archivo de ventas sin importarlo. Devuelve el reporte de errores por fila
+# en JSON o, con formato=excel, como archivo Excel descargable.
+@venta_bp.route('/importar/validar/', methods=['POST'])
+@inject
+def validar_importacion_ventas(
+    validar_uc=Provide[Container.validar_importacion_ventas_uc]
+):
+    if 'file' not in request.files:
+        return jsonify({"error": "No se encontró el archivo"}), 400
+
+    file = request.files['file']
+    if not file.filename.lower().endswith(('.xlsx', '.xls', '.csv')):
+        return jsonify({"error": "Formato de archivo no soportado"}), 400
+
+    try:
+        reporte = validar_uc.execute(file.stream, file.filename, request.form.get('fecha'))
+        if request.args.get('formato', request.form.get('formato')) == 'excel':
+            return send_file(
+                validar_uc.exportar_errores(reporte["errores"], reporte["advertencias"]),
+                as_attachment=True,
+                download_name='errores_ventas.xlsx',
+                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            )
+        return jsonify(reporte), 200
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
     except Exception as e:
@@ -0,0 +1,56 @@
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+# Las pruebas importan la aplicación desde la carpeta backend. La aplicación que app.py crea al
+# importarse usa una base en memoria para no tocar inventario.db.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['DB_URI'] = 'sqlite://'
+
+from app import create_app
+from src.infrastructure.db.models import db
+from src.infrastructure.repositories.sqlite_receta_repository import SQLiteRecetaRepository
+
+
+# Aplicación con una base SQLite propia para cada prueba.
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DB_URI', f"sqlite:///{tmp_path / 'inventario.db'}")
+    # La matriz BOM y el índice de nombres se comparten entre instancias del repositorio.
+    SQLiteRecetaRepository._invalidar_matriz_bom()
+    aplicacion = create_app()
+    aplicacion.config['TESTING'] = True
+    yield aplicacion
+    with aplicacion.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+# Recoge las sentencias SQL que se ejecutan dentro del bloque with.
+@pytest.fixture
+def contar_consultas(app):
+    @contextmanager
+    def contar():
+        sentencias = []
+
+        def registrar(conn, cursor, sentencia, parametros, contexto, executemany):
+            sentencias.append(sentencia)
+
+        with app.app_context():
+            motor = db.engine
+        event.listen(motor, 'before_cursor_execute', registrar)
+        try:
+            yield sentencias
+        finally:
+            event.remove(motor, 'before_cursor_execute', registrar)
+
+    return contar
+
@@ -0,0 +1,74 @@
+import io
+
+from src.application.use_cases.venta_use_cases import ImportarVentasUseCase
+from src.infrastructure.repositories.sqlite_consumo_diario_repository import SQLiteConsumoDiarioRepository
+
+
+def _archivo_csv(filas: int) -> io.BytesIO:
+    contenido = "Nombre,Cantidad\n" + "".join(f"RECETA {i % 7},{i % 5 + 1}\n" for i in range(filas))
+    return io.BytesIO(contenido.encode('utf-8'))
+
+
+def _importar(client, **datos):
+    datos.setdefault('fecha', '2025-01-10')
+    datos['file'] = (_archivo_csv(12), 'ventas.csv')
+    return client.post('/api/ventas/importar/', data=datos, content_type='multipart/form-data')
+
+
+def test_fallo_del_primer_bloque_no_deja_importacion_registrada(client, monkeypatch):
+    aplicar_deltas = SQLiteConsumoDiarioRepository.aplicar_deltas
+
+    def fallar(self, deltas):
+        self.db_session.rollback()
+        raise RuntimeError("fallo simulado al aplicar el consumo")
+
+    monkeypatch.setattr(SQLiteConsumoDiarioRepository, 'aplicar_deltas', fallar)
+    respuesta = _importar(client)
+    assert respuesta.status_code == 500
+    assert client.get('/api/ventas/importaciones/').get_json() == []
+    assert client.get('/api/ventas/').get_json() == []
+
+    # Sin la importación vacía, el mismo archivo se puede volver a importar sin forzar.
+    monkeypatch.setattr(SQLiteConsumoDiarioRepository, 'aplicar_deltas', aplicar_deltas)
+    respuesta = _importar(client)
+    assert respuesta.status_code == 200, respuesta.get_json()
+    assert respuesta.get_json()['ventas_importadas'] == 12
+    importaciones = client.get('/api/ventas/importaciones/').get_json()
+    assert [i['filas'] for i in importaciones] == [12]
+
+    assert _importar(client).status_code == 409
+
+
+def test_importacion_interrumpida_informa_desde_donde_reanudar(client, monkeypatch):
+    monkeypatch.setattr(ImportarVentasUseCase, 'TAMANO_BLOQUE', 5)
+    aplicar_deltas = SQLiteConsumoDiarioRepository.aplicar_deltas
+    llamadas = []
+
+    def fallar_en_el_segundo_bloque(self, deltas):
+        llamadas.append(deltas)
+        if len(llamadas) == 2:
+            self.db_session.rollback()
+            raise RuntimeError("fallo simulado al aplicar el consumo")
+        aplicar_deltas(self, deltas)
+
+    monkeypatch.setattr(SQLiteConsumoDiarioRepository, 'aplicar_deltas', fallar_en_el_segundo_bloque)
+    respuesta = _importar(client)
+    assert respuesta.status_code == 500
+    datos = respuesta.get_json()
+    assert datos['reanudar_desde'] == 5
+    assert datos['ventas_importadas'] == 5
+    assert len(client.get('/api/ventas/').get_json()) == 5
+
+    monkeypatch.setattr(SQLiteConsumoDiarioRepository, 'aplicar_deltas', aplicar_deltas)
+    respuesta = _importar(client, reanudar_desde=str(datos['reanudar_desde']))
+    assert respuesta.status_code == 200, respuesta.get_json()
+    assert respuesta.get_json()['importacion_id'] == datos['importacion_id']
+    assert len(client.get('/api/ventas/').get_json()) == 12
+    assert [i['filas'] for i in client.get('/api/ventas/importaciones/').get_json()] == [12]
+
+
+def test_reanudar_desde_invalido_se_rechaza(client):
+    for valor in ('abc', '-1', '2.5'):
+        respuesta = _importar(client, reanudar_desde=valor)
+        assert respuesta.status_code == 400, valor
+    assert client.get('/api/ventas/').get_json() == []
@@ -0,0 +1,108 @@
+import uuid
+from datetime import date
+
+from src.infrastructure.db.models import db
+from src.infrastructure.repositories.sqlite_inventario_diario_repository import SQLiteInventarioDiarioRepository
+
+
+def _crear(client, ruta, datos):
+    respuesta = client.post(ruta, json=datos)
+    assert respuesta.status_code == 201, respuesta.get_json()
+    return respuesta.get_json()
+
+
+def _fila(fecha, area, producto, final_fisico, **campos):
+    return {
+        "id": str(uuid.uuid4()),
+        "fecha": fecha,
+        "area_id": area["id"],
+        "producto_id": producto["id"],
+        "inicio": 0,
+        "entradas": 10,
+        "consumo": 0,
+        "merma": 0,
+        "otras_salidas": 0,
+        "final_fisico": final_fisico,
+        **campos
+    }
+
+
+def _estado(client, fecha):
+    estado = client.get(f'/api/ipv/estado?fecha={fecha}').get_json()
+    return {fila["fecha"]: fila for filas in estado.values() for fila in filas}[fecha]
+
+
+def test_guardar_devuelve_las_filas_tal_como_quedaron(client):
+    area = _crear(client, '/api/areas/', {"nombre": "cocina"})
+    producto = _crear(client, '/api/productos/', {"nombre": "arroz", "unidad_medida": "kg"})
+
+    primera = _crear(client, '/api/ipv/guardar', [_fila('2025-01-10', area, producto, 8)])["registros"][0]
+    assert primera["version"] == 1
+
+    # El cliente vuelve a enviar la fila con un id nuevo: se actualiza la fila existente.
+    segunda = _crear(client, '/api/ipv/guardar', [_fila('2025-01-10', area, producto, 7)])["registros"][0]
+    assert segunda["id"] == primera["id"]
+    assert segunda["version"] == 2
+
+    respuesta = client.patch('/api/ipv/guardar', json=[{
+        "fecha": '2025-01-10', "area_id": area["id"], "producto_id": producto["id"],
+        "version": segunda["version"], "final_fisico": 6
+    }])
+    assert respuesta.status_code == 200, respuesta.get_json()
+    assert respuesta.get_json()[0]["version"] == 3
+
+
+def test_fallo_al_propagar_no_guarda_el_dia(client, monkeypatch):
+    area = _crear(client, '/api/areas/', {"nombre": "cocina"})
+    producto = _crear(client, '/api/productos/', {"nombre": "arroz", "unidad_medida": "kg"})
+    _crear(client, '/api/ipv/guardar', [_fila('2025-01-10', area, producto, 8)])
+    _crear(client, '/api/ipv/guardar', [_fila('2025-01-11', area, producto, 15, inicio=8)])
+
+    propagar_desde = SQLiteInventarioDiarioRepository.propagar_desde
+
+    def fallar(self, fecha, claves=None, confirmar=True):
+        self.db_session.rollback()
+        raise RuntimeError("fallo simulado al propagar")
+
+    monkeypatch.setattr(SQLiteInventarioDiarioRepository, 'propagar_desde', fallar)
+    respuesta = client.post('/api/ipv/guardar', json=[_fila('2025-01-10', area, producto, 5)])
+    assert respuesta.status_code == 500
+    respuesta = client.patch('/api/ipv/guardar', json=[{
+        "fecha": '2025-01-10', "area_id": area["id"], "producto_id": producto["id"],
+        "version": _estado(client, '2025-01-10')["version"], "final_fisico": 4
+    }])
+    assert respuesta.status_code == 500
+    assert _estado(client, '2025-01-10')["final_fisico"] == 8
+    assert _estado(client, '2025-01-11')["inicio"] == 8
+
+    monkeypatch.setattr(SQLiteInventarioDiarioRepository, 'propagar_desde', propagar_desde)
+    _crear(client, '/api/ipv/guardar', [_fila('2025-01-10', area, producto, 5)])
+    assert _estado(client, '2025-01-10')["final_fisico"] == 5
+    assert _estado(client, '2025-01-11')["inicio"] == 5
+
+
+def test_estado_y_reporte_leen_las_filas_en_una_sola_consulta(app, client, contar_consultas):
+    area = _crear(client, '/api/areas/', {"nombre": "cocina"})
+    productos = [
+        _crear(client, '/api/productos/', {"nombre": f"producto {i}", "unidad_medida": "kg"}) for i in range(40)
+    ]
+    _crear(client, '/api/ipv/guardar', [_fila('2025-01-10', area, p, 4) for p in productos[:2]])
+    _crear(client, '/api/ipv/guardar', [_fila('2025-01-11', area, p, 4) for p in productos])
+
+    with app.app_context():
+        repositorio = SQLiteInventarioDiarioRepository(db.session)
+        with contar_consultas() as sentencias:
+            registros = repositorio.find_by_date(date(2025, 1, 11))
+        assert len(sentencias) == 1
+        assert len(registros) == 40
+        assert {r.producto_nombre for r in registros} == {p["nombre"] for p in productos}
+
+    consultas = {}
+    for fecha in ('2025-01-10', '2025-01-11'):
+        with contar_consultas() as estado:
+            assert client.get(f'/api/ipv/estado?fecha={fecha}').status_code == 200
+        with contar_consultas() as reporte:
+            assert client.get(f'/api/ipv/reporte?fecha={fecha}').status_code == 200
+        consultas[fecha] = (len(estado), len(reporte))
+    # El número de consultas no depende de cuántas filas tenga el día.
+    assert consultas['2025-01-10'] == consultas['2025-01-11']
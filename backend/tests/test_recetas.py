@@ -0,0 +1,60 @@
+import pytest
+
+from src.infrastructure.db.models import db
+from src.infrastructure.repositories.sqlite_consumo_diario_repository import SQLiteConsumoDiarioRepository
+from src.infrastructure.repositories.sqlite_receta_repository import SQLiteRecetaRepository
+
+
+def _crear(client, ruta, datos):
+    respuesta = client.post(ruta, json=datos)
+    assert respuesta.status_code == 201, respuesta.get_json()
+    return respuesta.get_json()
+
+
+def test_fallo_al_aplicar_el_consumo_no_crea_la_receta(client, monkeypatch):
+    area = _crear(client, '/api/areas/', {"nombre": "cocina"})
+    producto = _crear(client, '/api/productos/', {"nombre": "arroz", "unidad_medida": "kg"})
+    venta = _crear(client, '/api/ventas/', {"receta_nombre": "plato", "cantidad": 3, "fecha": "2025-01-10"})
+    assert venta["receta_id"] is None
+    receta = {
+        "nombre": "plato",
+        "ingredientes": [{"producto_id": producto["id"], "area_id": area["id"], "cantidad": 0.2}]
+    }
+
+    aplicar_deltas = SQLiteConsumoDiarioRepository.aplicar_deltas
+
+    def fallar(self, deltas, confirmar=True):
+        self.db_session.rollback()
+        raise RuntimeError("fallo simulado al aplicar el consumo")
+
+    monkeypatch.setattr(SQLiteConsumoDiarioRepository, 'aplicar_deltas', fallar)
+    assert client.post('/api/recetas/', json=receta).status_code >= 400
+    assert client.get('/api/recetas/').get_json() == []
+    assert client.get(f"/api/ventas/{venta['id']}/").get_json()["receta_id"] is None
+
+    monkeypatch.setattr(SQLiteConsumoDiarioRepository, 'aplicar_deltas', aplicar_deltas)
+    creada = _crear(client, '/api/recetas/', receta)
+    assert client.get(f"/api/ventas/{venta['id']}/").get_json()["receta_id"] == creada["id"]
+    consumo = client.get('/api/ipv/calcular-consumo?fecha=2025-01-10').get_json()
+    assert consumo == {f"{producto['id']}|{area['id']}": pytest.approx(0.6)}
+
+
+def test_exportacion_ordena_los_ingredientes_de_cada_receta(app, client):
+    area = _crear(client, '/api/areas/', {"nombre": "cocina"})
+    productos = {
+        nombre: _crear(client, '/api/productos/', {"nombre": nombre, "unidad_medida": "kg"})
+        for nombre in ("sal", "arroz", "pollo")
+    }
+    _crear(client, '/api/recetas/', {
+        "nombre": "plato",
+        "ingredientes": [
+            {"producto_id": productos[nombre]["id"], "area_id": area["id"], "cantidad": 0.1}
+            for nombre in ("sal", "pollo", "arroz")
+        ]
+    })
+
+    with app.app_context():
+        filas = list(SQLiteRecetaRepository(db.session).iterar_filas_exportacion())
+    assert [(receta, producto) for receta, producto, *_ in filas] == [
+        ("PLATO", "ARROZ"), ("PLATO", "POLLO"), ("PLATO", "SAL")
+    ]
@@ -7,16 +7,37 @@ const ipvApi = {
     return apiClient.get(`/ipv/estado?fecha=${fecha}`);
   },
 
+  // Obtiene en una sola petición el estado de una fecha y el del día anterior.
+  getEstadoComparado: (fecha) => {
+    return apiClient.get(`/ipv/estado-comparado?fecha=${fecha}`);
+  },
+
   // Solicita el cálculo del consumo basado en las ventas de una fecha.
   calcularConsumo: (fecha) => {
     return apiClient.get(`/ipv/calcular-consumo?fecha=${fecha}`);
   },
 
+  // Calcula el consumo de un rango de fechas, total o agrupado por día.
+  calcularConsumoRango: (desde, hasta, porDia = false) => {
+    const agrupar = porDia ? '&agrupar=dia' : '';
+    return apiClient.get(`/ipv/calcular-consumo?desde=${desde}&hasta=${hasta}${agrupar}`);
+  },
+
   // Guarda el estado completo del inventario para una fecha.
   guardar: (data) => {
     return apiClient.post('/ipv/guardar', data);
   },
 
+  // Guarda solo las celdas modificadas; cada fila incluye la versión leída.
+  guardarCambios: (cambios) => {
+    return apiClient.patch('/ipv/guardar', cambios);
+  },
+
+  // Propaga el cierre de una fecha a los días posteriores ya guardados.
+  propagar: (fecha, claves = null) => {
+    return apiClient.post('/ipv/propagar', claves ? { fecha, claves } : { fecha });
+  },
+
   // Obtiene los modelos de IPV.
   getModelos: () => {
     return apiClient.get('/ipv/modelos');
@@ -35,6 +56,18 @@ const ipvApi = {
   // Genera un reporte de IPV para una fecha.
   generarReporte: (fecha) => {
     return apiClient.get(`/ipv/reporte?fecha=${fecha}`);
+  },
+
+  // Genera el reporte acumulado (faltantes, sobrantes y mermas) de un rango de fechas.
+  generarReportePeriodo: (desde, hasta) => {
+    return apiClient.get(`/ipv/reporte?desde=${desde}&hasta=${hasta}`);
+  },
+
+  // Descarga el reporte en Excel de una fecha (sin 'hasta') o de un rango.
+  exportarReporte: (desde, hasta = desde) => {
+    return apiClient.get(`/ipv/reporte/export?desde=${desde}&hasta=${hasta}`, {
+      responseType: 'blob',
+    });
   }
 };
 
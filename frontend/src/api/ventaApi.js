@@ -1,18 +1,47 @@
 import client from './client';
 
-export const getVentas = () => client.get('ventas/');
+export const getVentas = (params) => client.get('ventas/', { params });
+export const getTotalVentas = (params) => client.get('ventas/total/', { params });
 export const updateVenta = (id, data) => client.put(`ventas/${id}/`, data);
 export const deleteVenta = (id) => client.delete(`ventas/${id}/`);
 export const deleteVentas = (ids) => client.post('ventas/delete-multiple/', { ids });
-export const importVentas = (file, fecha) => {
+export const importVentas = (file, fecha, reanudarDesde = 0, importarValidas = false, forzar = false, recalcularConsumo = false) => {
     const formData = new FormData();
     formData.append('file', file);
     if (fecha) {
         formData.append('fecha', fecha);
     }
+    if (reanudarDesde) {
+        formData.append('reanudar_desde', reanudarDesde);
+    }
+    if (importarValidas) {
+        formData.append('importar_validas', 'true');
+    }
+    if (forzar) {
+        formData.append('forzar', 'true');
+    }
+    if (recalcularConsumo) {
+        formData.append('recalcular_consumo', 'true');
+    }
     return client.post('ventas/importar/', formData, {
         headers: {
             'Content-Type': 'multipart/form-data'
         }
     });
 };
+// Deshace una importación completa: elimina todas sus ventas y descuenta su consumo.
+export const deshacerImportacion = (id) => client.delete(`ventas/importaciones/${id}/`);
+// Descarga en Excel el reporte de errores por fila de un archivo de ventas.
+export const descargarErroresVentas = (file, fecha) => {
+    const formData = new FormData();
+    formData.append('file', file);
+    if (fecha) {
+        formData.append('fecha', fecha);
+    }
+    return client.post('ventas/importar/validar/?formato=excel', formData, {
+        headers: {
+            'Content-Type': 'multipart/form-data'
+        },
+        responseType: 'blob'
+    });
+};
@@ -31,36 +31,13 @@ export const useIPV = () => {
         setLoading(true);
         setError('');
 
-        const fechaParts = fechaACargar.split('-');
-        const fechaObj = new Date(fechaParts[0], fechaParts[1] - 1, fechaParts[2]);
-        fechaObj.setDate(fechaObj.getDate() - 1);
-        const fechaAnteriorString = fechaObj.toISOString().split('T')[0];
-
         try {
-            const [response, responseAnterior] = await Promise.all([
-                ipvApi.getEstado(fechaACargar),
-                ipvApi.getEstado(fechaAnteriorString).catch(e => { console.error(e); return null; })
-            ]);
-
-            const inventarioConComentariosParseados = response.data;
-            for (const areaNombre in inventarioConComentariosParseados) {
-                inventarioConComentariosParseados[areaNombre] = inventarioConComentariosParseados[areaNombre].map(item => {
-                    try {
-                        const comentarios = item.comentario ? JSON.parse(item.comentario) : {};
-                        return { ...item, comentarios };
-                    } catch (e) {
-                        return { ...item, comentarios: {} };
-                    }
-                });
-            }
-            setInventario(inventarioConComentariosParseados);
-
-            if (responseAnterior) {
-                setInventarioAnterior(responseAnterior.data);
-            } else {
-                setInventarioAnterior(null);
-            }
-            return inventarioConComentariosParseados;
+            // El servidor devuelve ambos días con los comentarios ya interpretados.
+            const response = await ipvApi.getEstadoComparado(fechaACargar);
+            const { actual, anterior } = response.data;
+            setInventario(actual);
+            setInventarioAnterior(anterior || null);
+            return actual;
         } catch (err) {
             setError('Error al cargar los datos del inventario.');
             console.error(err);
@@ -28,7 +28,8 @@ const RecetaList = () => {
   const cargarRecetas = async () => {
     try {
       setLoading(true);
-      const params = { sort_by: sortBy };
+      // Pide los nombres de producto y área de cada ingrediente para no descargar el catálogo.
+      const params = { sort_by: sortBy, detalle: true };
       if (filterBy) {
         params.filter_by = filterBy;
       }
@@ -185,6 +186,15 @@ const RecetaList = () => {
       {importResult && (
         <Alert variant="info" onClose={() => setImportResult(null)} dismissible>
           Importación completada: {importResult.importadas} recetas importadas, {importResult.omitidas} omitidas.
+          {importResult.productos_creados?.length > 0 && ` Productos nuevos: ${importResult.productos_creados.join(', ')}.`}
+          {importResult.areas_creadas?.length > 0 && ` Áreas nuevas: ${importResult.areas_creadas.join(', ')}.`}
+          {importResult.errores?.length > 0 && (
+            <ul className="mb-0 mt-2">
+              {importResult.errores.map((e) => (
+                <li key={e.fila}>Fila {e.fila} ({e.receta}): {e.errores.join(', ')}</li>
+              ))}
+            </ul>
+          )}
         </Alert>
       )}
 
@@ -235,7 +245,9 @@ const RecetaList = () => {
                     <Badge bg="secondary">Inactiva</Badge>
                   )}
                 </td>
-                <td>{receta.ingredientes.length} ingredientes</td>
+                <td title={receta.ingredientes.map(ing => `${ing.producto_nombre} (${ing.area_nombre}): ${ing.cantidad} ${ing.unidad_medida}`).join('\n')}>
+                  {receta.ingredientes.length} ingredientes
+                </td>
                 <td>
                   {/* Botones de acción para editar y eliminar */}
                   <Link 
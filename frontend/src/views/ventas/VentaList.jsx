@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { Table, Button, Container, Alert, Spinner, Form, Row, Col } from 'react-bootstrap';
-import { getVentas, updateVenta, deleteVenta, importVentas, deleteVentas } from '../../api/ventaApi';
+import { getVentas, updateVenta, deleteVenta, importVentas, deleteVentas, descargarErroresVentas, deshacerImportacion } from '../../api/ventaApi';
 
 // Componente principal para la gestión de ventas.
 const VentaList = () => {
@@ -26,49 +26,162 @@ const ImportarVentas = () => {
     const [fecha, setFecha] = useState('');
     const [loading, setLoading] = useState(false);
     const [error, setError] = useState('');
+    const [importarValidas, setImportarValidas] = useState(false);
+    const [recalcularConsumo, setRecalcularConsumo] = useState(false);
+    const [erroresFilas, setErroresFilas] = useState([]);
+    const [ultimaImportacion, setUltimaImportacion] = useState(null);
 
-    // Maneja la importación del archivo de ventas.
-    const handleImport = async () => {
-        if (!file || !fecha) {
-            alert("Por favor, seleccione un archivo y una fecha.");
+    // Maneja la importación del archivo de ventas. Si el archivo ya se importó, pide confirmación
+    // antes de volver a importarlo; si la importación se interrumpe, ofrece continuarla desde la
+    // primera fila que no se guardó.
+    const handleImport = async (forzar = false, reanudarDesde = 0) => {
+        if (!file) {
+            alert("Por favor, seleccione un archivo.");
             return;
         }
         setLoading(true);
         setError('');
+        setErroresFilas([]);
         try {
-            await importVentas(file, fecha);
-            alert('¡Ventas importadas con éxito!');
-            setFile(null);
-            setFecha('');
+            const response = await importVentas(file, fecha, reanudarDesde, importarValidas, forzar, recalcularConsumo);
+            const omitidas = response.data.errores?.length || 0;
+            const dias = response.data.dias || [];
+            const resumenDias = dias.length > 1 ? `\nSe importaron ventas de ${dias.length} días (${dias[0].fecha} a ${dias[dias.length - 1].fecha}).` : '';
+            const repetidas = response.data.advertencias?.length || 0;
+            alert((response.data.message || '¡Ventas importadas con éxito!') + resumenDias
+                + (omitidas ? `\n${omitidas} filas con errores no se importaron.` : '')
+                + (repetidas ? `\n${repetidas} líneas repetidas se importaron; revíselas en el reporte de validación.` : ''));
+            setErroresFilas(response.data.errores || []);
+            setUltimaImportacion(response.data.importacion_id || null);
+            if (!omitidas) {
+                setFile(null);
+                setFecha('');
+            }
         } catch (err) {
+            const data = err.response?.data;
+            if (err.response?.status === 409) {
+                setLoading(false);
+                if (window.confirm(`${data.error}.\n¿Desea importarlo de nuevo?`)) {
+                    handleImport(true);
+                }
+                return;
+            }
+            if (err.response?.status === 500 && data?.reanudar_desde !== undefined) {
+                setLoading(false);
+                if (window.confirm(`${data.error}\n\nYa se guardaron ${data.reanudar_desde} filas. ¿Desea continuar la importación desde la siguiente?`)) {
+                    handleImport(forzar, data.reanudar_desde);
+                }
+                return;
+            }
             setError('Error al importar las ventas');
-            alert(err.response?.data?.error || "Error al importar ventas");
+            setErroresFilas(data?.errores || []);
+            const reanudar = data?.reanudar_desde ? `\n\nLas primeras ${data.reanudar_desde} filas ya se importaron.` : '';
+            alert((data?.error || "Error al importar ventas") + reanudar);
         } finally {
             setLoading(false);
         }
     };
 
+    // Deshace la última importación realizada, eliminando todas sus ventas.
+    const handleDeshacer = async () => {
+        if (!window.confirm('¿Está seguro de que desea deshacer la última importación?')) {
+            return;
+        }
+        try {
+            const response = await deshacerImportacion(ultimaImportacion);
+            alert(`Se eliminaron ${response.data.ventas_eliminadas} ventas.`);
+            setUltimaImportacion(null);
+        } catch (err) {
+            setError('Error al deshacer la importación');
+        }
+    };
+
+    // Descarga el reporte de errores del archivo seleccionado.
+    const handleDescargarErrores = async () => {
+        try {
+            const response = await descargarErroresVentas(file, fecha);
+            const url = window.URL.createObjectURL(new Blob([response.data]));
+            const link = document.createElement('a');
+            link.href = url;
+            link.setAttribute('download', 'errores_ventas.xlsx');
+            document.body.appendChild(link);
+            link.click();
+            link.remove();
+        } catch (err) {
+            setError('Error al descargar el reporte de errores');
+        }
+    };
+
     return (
         <div>
-            <h2>Importar Ventas desde Excel</h2>
+            <h2>Importar Ventas desde Excel o CSV</h2>
             {error && <Alert variant="danger">{error}</Alert>}
             <Row>
                 <Col md={6}>
                     <Form.Group>
-                        <Form.Label>Archivo Excel</Form.Label>
-                        <Form.Control type="file" accept=".xlsx, .xls" onChange={(e) => setFile(e.target.files[0])} />
+                        <Form.Label>Archivo Excel o CSV</Form.Label>
+                        <Form.Control type="file" accept=".xlsx, .xls, .csv" onChange={(e) => setFile(e.target.files[0])} />
                     </Form.Group>
                 </Col>
                 <Col md={6}>
                     <Form.Group>
                         <Form.Label>Fecha de las Ventas</Form.Label>
                         <Form.Control type="date" value={fecha} onChange={(e) => setFecha(e.target.value)} />
+                        <Form.Text muted>
+                            Si el archivo tiene una columna Fecha, cada venta toma la fecha de su fila y esta fecha solo se usa para las celdas vacías.
+                        </Form.Text>
                     </Form.Group>
                 </Col>
             </Row>
-            <Button variant="secondary" onClick={handleImport} className="mt-3" disabled={!file || !fecha || loading}>
+            <Form.Check
+                type="checkbox"
+                className="mt-3"
+                label="Importar solo las filas válidas"
+                checked={importarValidas}
+                onChange={(e) => setImportarValidas(e.target.checked)}
+            />
+            <Form.Check
+                type="checkbox"
+                label="Recalcular el consumo de las fechas importadas"
+                checked={recalcularConsumo}
+                onChange={(e) => setRecalcularConsumo(e.target.checked)}
+            />
+            <Button variant="secondary" onClick={() => handleImport()} className="mt-3" disabled={!file || loading}>
                 {loading ? <><Spinner as="span" animation="border" size="sm" /> Importando...</> : 'Importar'}
             </Button>
+            {ultimaImportacion && (
+                <Button variant="outline-danger" onClick={handleDeshacer} className="mt-3 ms-2" disabled={loading}>
+                    Deshacer última importación
+                </Button>
+            )}
+            {erroresFilas.length > 0 && (
+                <div className="mt-3">
+                    <Alert variant="warning">
+                        {erroresFilas.length} filas con errores.
+                        <Button variant="link" onClick={handleDescargarErrores}>Descargar reporte de errores</Button>
+                    </Alert>
+                    <Table striped bordered size="sm">
+                        <thead>
+                            <tr>
+                                <th>Fila</th>
+                                <th>Nombre</th>
+                                <th>Cantidad</th>
+                                <th>Errores</th>
+                            </tr>
+                        </thead>
+                        <tbody>
+                            {erroresFilas.slice(0, 50).map(e => (
+                                <tr key={e.fila}>
+                                    <td>{e.fila}</td>
+                                    <td>{e.nombre}</td>
+                                    <td>{e.cantidad}</td>
+                                    <td>{e.errores.join('; ')}</td>
+                                </tr>
+                            ))}
+                        </tbody>
+                    </Table>
+                </div>
+            )}
         </div>
     );
 };
@@ -85,12 +198,12 @@ const ConsultarVentas = () => {
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState('');
 
-    // Carga las ventas al montar el componente.
+    // Carga desde el servidor solo las ventas de la fecha consultada.
     useEffect(() => {
         const fetchVentas = async () => {
             setLoading(true);
             try {
-                const response = await getVentas();
+                const response = await getVentas({ fecha: fechaConsulta });
                 setVentasOriginales(response.data);
             } catch (err) {
                 setError('Error al cargar las ventas');
@@ -99,7 +212,7 @@ const ConsultarVentas = () => {
             }
         };
         fetchVentas();
-    }, []);
+    }, [fechaConsulta]);
 
     // Filtra las ventas por fecha y nombre de receta.
     useEffect(() => {